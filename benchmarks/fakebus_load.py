@@ -0,0 +1,203 @@
+"""Fake bus load benchmark.
+
+Drives the JSON-RPC interface of a running hbussd connected to a fake bus,
+for example with synthetic devices, bus timing and injected faults set up
+in config/fakebus/fakebus.config. Reports the time until the master is
+operational, read throughput and latency with concurrent clients, and the
+master timeout and polling counters.
+
+Start the daemon right before the benchmark for a meaningful enumeration
+time.
+
+usage: python -m benchmarks.fakebus_load [--url URL] [-c CLIENTS]
+       [-d SECONDS] [--maxage MS]
+"""
+
+import argparse
+import itertools
+import json
+import statistics
+import threading
+import time
+import urllib.request
+
+from hbussd.hbus.constants import HbusObjectPermissions
+from hbussd.master.master import HbusMasterState
+
+
+class JSONRPCClient:
+    """Minimal JSON-RPC client."""
+
+    def __init__(self, url):
+        """Initialize.
+
+        @param url server URL
+        """
+        self.url = url
+        self._ids = itertools.count(1)
+
+    def call(self, method, *params):
+        """Call method.
+
+        @return result
+        """
+        request = json.dumps(
+            {"method": method, "params": params, "id": next(self._ids)}
+        ).encode()
+        with urllib.request.urlopen(
+            urllib.request.Request(
+                self.url,
+                request,
+                {"Content-Type": "application/json"},
+            )
+        ) as f:
+            response = json.load(f)
+
+        if response.get("error") is not None:
+            raise RuntimeError(response["error"])
+
+        return response["result"]
+
+
+def wait_operational(client, timeout):
+    """Wait for the master to finish enumeration.
+
+    @return seconds waited
+    """
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        try:
+            state = client.call("masterstate")["value"]
+            if state == HbusMasterState.hbusMasterOperational:
+                return time.monotonic() - start
+        except OSError:
+            # daemon still starting
+            pass
+        time.sleep(0.1)
+
+    raise RuntimeError("master not operational after {} s".format(timeout))
+
+
+def readable_objects(client):
+    """Get readable objects of all devices.
+
+    @return list of (address string, object number) tuples
+    """
+    objects = []
+    for uid in client.call("activeslavelist")["list"]:
+        address = client.call("slaveinformation", uid)["currentaddress"]
+        object_list = client.call("slaveobjectlist", uid)["list"]
+        for number, obj in enumerate(object_list, 1):
+            if obj["permissions"] & HbusObjectPermissions.READ:
+                objects.append((address, number))
+
+    return objects
+
+
+def load(url, objects, clients, duration, maxage):
+    """Read objects from concurrent clients.
+
+    @return list of (latency in ms, status) tuples
+    """
+    results = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(offset):
+        client = JSONRPCClient(url)
+        local = []
+        for index in itertools.count(offset):
+            if time.monotonic() >= deadline:
+                break
+
+            address, number = objects[index % len(objects)]
+            start = time.perf_counter()
+            try:
+                ret = client.call("readvalue", address, number, True, maxage)
+                status = ret.get("error", ret["status"])
+            except (OSError, RuntimeError):
+                status = "request_error"
+            local.append(((time.perf_counter() - start) * 1000, status))
+
+        with lock:
+            results.extend(local)
+
+    threads = [
+        threading.Thread(target=worker, args=(x * len(objects) // clients,))
+        for x in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--url", help="JSON-RPC server URL", default="http://localhost:7080"
+    )
+    parser.add_argument(
+        "-c", help="number of concurrent clients", default=4, type=int
+    )
+    parser.add_argument(
+        "-d", help="load duration in seconds", default=10, type=float
+    )
+    parser.add_argument(
+        "--maxage",
+        help="maximum age in ms of cached values, 0 to always read devices",
+        default=0,
+        type=int,
+    )
+    parser.add_argument(
+        "--timeout",
+        help="seconds to wait for enumeration",
+        default=120,
+        type=float,
+    )
+    args = parser.parse_args()
+
+    client = JSONRPCClient(args.url)
+
+    elapsed = wait_operational(client, args.timeout)
+    print("operational after {:.3f} s".format(elapsed))
+
+    objects = readable_objects(client)
+    devices = len({x[0] for x in objects})
+    print("{} devices, {} readable objects".format(devices, len(objects)))
+    if len(objects) == 0:
+        return
+
+    results = load(args.url, objects, args.c, args.d, args.maxage)
+    latencies = sorted(x[0] for x in results)
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    print(
+        "{} reads in {:.1f} s, {:.1f} reads/s".format(
+            len(results), args.d, len(results) / args.d
+        )
+    )
+    print(
+        "latency ms: median {:.2f}, p95 {:.2f}, max {:.2f}".format(
+            statistics.median(latencies),
+            latencies[int(len(latencies) * 0.95)],
+            latencies[-1],
+        )
+    )
+    print("results: {}".format(statuses))
+
+    metrics = client.call("metrics")["value"]
+    print(
+        "master timeouts: {}".format(metrics["bus"]["timeouts_by_command"])
+    )
+    print("master malformed frames: {}".format(metrics["bus"]["malformed"]))
+    print("polling: {}".format(metrics["polling"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Fake bus receive stress benchmark.
+
+Feeds a stream of master requests to the fake bus in fixed size chunks, so
+that chunks hold several frames and frames are split across chunks, and
+reports the number of requests handled per second. Devices are
+synthesized from the example device file and addressed directly, without
+enumeration, and answer immediately.
+
+Run from the repository root: the fake bus reads config/fakebus.
+
+usage: python -m benchmarks.fakebus_rx [-d DEVICES] [-f FRAMES] [-c CHUNK]
+       [-r REPEAT]
+"""
+
+import argparse
+import random
+import time
+
+from hbussd.fakebus.hbus_fb import FakeBusDeviceStatus, FakeBusSerialPort
+from hbussd.hbus.base import (
+    HbusDeviceAddress,
+    HbusInstruction,
+    HbusOperation,
+    pack_many,
+)
+from hbussd.hbus.constants import (
+    HBUSCOMMAND_GETCH,
+    HBUSCOMMAND_QUERY,
+    HBUSCOMMAND_SEARCH,
+)
+
+MASTER_ADDRESS = HbusDeviceAddress(0, 0)
+
+
+class CountingTransport:
+    """Transport counting frames written by the fake bus."""
+
+    def __init__(self):
+        """Initialize."""
+        self.frames = 0
+        self.bytes = 0
+
+    def write(self, data):
+        """Count frame."""
+        self.frames += 1
+        self.bytes += len(data)
+
+
+def build_fakebus(devices):
+    """Build fake bus with addressed synthetic devices.
+
+    @param devices number of devices
+    @return FakeBusSerialPort object and list of device addresses
+    """
+    port = FakeBusSerialPort()
+    port.config.set("fakebus", "synthetic_devices", str(devices))
+    port.config.set("fakebus", "synthetic_template", "devices/device.config")
+    port.build_synthetic_devices()
+
+    addresses = []
+    synthetic = [
+        x
+        for x in port.deviceList.values()
+        if x.deviceStatus == FakeBusDeviceStatus.deviceIdle
+    ]
+    for index, device in enumerate(synthetic):
+        device.hbusSlaveAddress = HbusDeviceAddress(0, index + 1)
+        device.deviceStatus = FakeBusDeviceStatus.deviceEnumerated
+        port.add_device(device)
+        addresses.append(device.hbusSlaveAddress)
+
+    port.transport = CountingTransport()
+
+    return port, addresses
+
+
+def synthesize_requests(addresses, count):
+    """Build a stream of pings, queries and reads.
+
+    @return byte stream
+    """
+    rng = random.Random(0)
+    operations = []
+    for _ in range(count):
+        address = rng.choice(addresses)
+        kind = rng.randrange(3)
+        if kind == 0:
+            instruction = HbusInstruction(HBUSCOMMAND_SEARCH)
+        elif kind == 1:
+            instruction = HbusInstruction(HBUSCOMMAND_QUERY, 1, [1])
+        else:
+            instruction = HbusInstruction(HBUSCOMMAND_GETCH, 1, [1])
+        operations.append(HbusOperation(instruction, address, MASTER_ADDRESS))
+
+    return pack_many(operations)
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-d", help="number of devices", default=32, type=int)
+    parser.add_argument(
+        "-f", help="requests in stream", default=10000, type=int
+    )
+    parser.add_argument("-c", help="chunk size in bytes", default=64, type=int)
+    parser.add_argument("-r", help="repetitions", default=10, type=int)
+    args = parser.parse_args()
+
+    port, addresses = build_fakebus(args.d)
+    stream = synthesize_requests(addresses, args.f)
+    chunks = [stream[i : i + args.c] for i in range(0, len(stream), args.c)]
+
+    start = time.perf_counter()
+    for _ in range(args.r):
+        for data in chunks:
+            port.dataReceived(data)
+    elapsed = time.perf_counter() - start
+
+    requests = args.f * args.r
+    print(
+        "{} requests, {} answers in {:.3f} s: {:.0f} requests/s".format(
+            requests,
+            port.transport.frames,
+            elapsed,
+            requests / elapsed,
+        )
+    )
+    if port.transport.frames != requests:
+        print(
+            "warning: {} requests unanswered".format(
+                requests - port.transport.frames
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Object value formatting benchmark.
+
+Formats values of common object types through the dispatch table of
+formatters used before object codecs, kept here as the baseline, and
+through compiled object codecs.
+
+usage: python -m benchmarks.formatting [-n COUNT]
+"""
+
+import argparse
+import random
+import struct
+import time
+from array import array
+
+from hbussd.hbus.constants import HBUS_UNITS
+from hbussd.hbus.slaves import HbusDeviceObject, HbusObjDataType
+
+
+def unpack_uint(data):
+    """Unpack unsigned integer, most significant byte first."""
+    x = [0]
+    while len(data) < 4:
+        x.extend(data)
+        data = x
+        x = [0]
+
+    return struct.unpack(">I", array("B", data))[0]
+
+
+def with_unit(value, extinfo):
+    """Append unit to formatted value."""
+    try:
+        unit = extinfo["UNIT"]
+        value = str(value) + " " + HBUS_UNITS[chr(unit[0])]
+    except Exception:
+        pass
+
+    return value
+
+
+def format_byte_hex(data, extinfo, size):
+    """Format bytes as hexadecimal numbers."""
+    return ", ".join(["%X" % x for x in data])
+
+
+def format_uint(data, extinfo, size):
+    """Format unsigned integer."""
+    return with_unit(str(unpack_uint(data)), extinfo)
+
+
+def format_lin_percent(data, extinfo, size):
+    """Format unsigned integer as percent of a linear scale."""
+    try:
+        min_val = unpack_uint(extinfo["MIN"])
+    except Exception:
+        min_val = 0
+
+    try:
+        max_val = unpack_uint(extinfo["MAX"])
+    except Exception:
+        max_val = 2 ** (8 * len(data)) - 1
+
+    value = unpack_uint(data)
+
+    return "%.2f%%" % (
+        (float(value - min_val) / float(max_val - min_val)) * 100
+    )
+
+
+class FixedPointFormatter:
+    """Fixed point formatter, configured by indexing with the point."""
+
+    point_loc = None
+
+    def __getitem__(self, key):
+        """Get formatter for a point location."""
+        self.point_loc = int(key)
+        return self.format_data
+
+    def format_data(self, data, extinfo, size):
+        """Format fixed point data, least significant byte first."""
+        data = data[::-1]
+        x = [0]
+        while len(data) < 4:
+            x.extend(data)
+            data = x
+            x = [0]
+
+        value = float(struct.unpack(">i", array("B", data))[0]) / (
+            10 ** float(self.point_loc)
+        )
+
+        return with_unit(value, extinfo)
+
+
+class IntFormatter:
+    """Signed integer formatter, most significant byte first."""
+
+    def __getitem__(self, key):
+        """Get formatter."""
+        return self.format_data
+
+    def format_data(self, data, extinfo, size):
+        """Format signed integer."""
+        value = int.from_bytes(bytes(data), "big", signed=True)
+
+        return str(with_unit(value, extinfo))
+
+
+# Formatters by data type and data type information
+DISPATCH = {
+    HbusObjDataType.type_byte: {
+        HbusObjDataType.dataTypeByteHex: format_byte_hex,
+    },
+    HbusObjDataType.dataTypeUnsignedInt: {
+        HbusObjDataType.dataTypeUintNone: format_uint,
+        HbusObjDataType.dataTypeUintLinPercent: format_lin_percent,
+    },
+    HbusObjDataType.dataTypeFixedPoint: FixedPointFormatter(),
+    HbusObjDataType.dataTypeInt: IntFormatter(),
+}
+
+
+def make_object(dtype, info, size, extinfo=None):
+    """Build device object."""
+    obj = HbusDeviceObject()
+    obj.objectDataType = dtype
+    obj.objectDataTypeInfo = info
+    obj.size = size
+    obj.objectExtendedInfo = extinfo
+
+    return obj
+
+
+def objects():
+    """Build objects of common types."""
+    return {
+        "byte hex": make_object(
+            HbusObjDataType.type_byte, HbusObjDataType.dataTypeByteHex, 2
+        ),
+        "uint with unit": make_object(
+            HbusObjDataType.dataTypeUnsignedInt,
+            HbusObjDataType.dataTypeUintNone,
+            2,
+            {"UNIT": [ord("V")]},
+        ),
+        "linear scale": make_object(
+            HbusObjDataType.dataTypeUnsignedInt,
+            HbusObjDataType.dataTypeUintLinPercent,
+            2,
+            {"MIN": [0, 10], "MAX": [3, 232]},
+        ),
+        "signed int": make_object(
+            HbusObjDataType.dataTypeInt, 0, 2, {"UNIT": [ord("d")]}
+        ),
+        "fixed point": make_object(
+            HbusObjDataType.dataTypeFixedPoint, 2, 4, {"UNIT": [ord("C")]}
+        ),
+    }
+
+
+def legacy(obj, data):
+    """Format value through dispatch table, as done before codecs."""
+    if obj.objectDataType not in list(DISPATCH.keys()):
+        return str(data)
+
+    if type(DISPATCH[obj.objectDataType]) == dict:
+        if obj.objectDataTypeInfo not in list(
+            DISPATCH[obj.objectDataType].keys()
+        ):
+            return str(data)
+
+    return DISPATCH[obj.objectDataType][obj.objectDataTypeInfo](
+        data=data, size=obj.size, extinfo=obj.objectExtendedInfo
+    )
+
+
+def measure(fn, values):
+    """Format values.
+
+    @return elapsed time
+    """
+    start = time.perf_counter()
+    for data in values:
+        fn(data)
+
+    return time.perf_counter() - start
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", help="values per type", default=100000, type=int)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for name, obj in objects().items():
+        values = [
+            [rng.randrange(256) for _ in range(obj.size)]
+            for _ in range(args.n)
+        ]
+
+        before = measure(lambda data: legacy(obj, data), values)
+        after = measure(obj.compile_codec().decode, values)
+
+        print(
+            "{:<16} dispatch {:.3f} s, codec {:.3f} s ({:.1f}x)".format(
+                name, before, after, before / after
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Frame decoder throughput benchmark.
+
+Replays a captured byte stream through HbusFrameDecoder. Without a capture
+file, a stream of typical enumeration and polling traffic is synthesized.
+
+usage: python -m benchmarks.framing [-c CHUNK] [-r REPEAT] [capture]
+"""
+
+import argparse
+import time
+
+from hbussd.hbus.base import HbusDeviceAddress, HbusInstruction, HbusOperation
+from hbussd.hbus.constants import (
+    HBUSCOMMAND_ACK,
+    HBUSCOMMAND_QUERY_RESP,
+    HBUSCOMMAND_RESPONSE,
+)
+from hbussd.hbus.framing import HbusFrameDecoder
+
+
+def synthesize_stream(devices=30):
+    """Build a byte stream with responses from several devices."""
+    master = HbusDeviceAddress(0, 0)
+    stream = b""
+    for dev in range(1, devices + 1):
+        source = HbusDeviceAddress(0, dev)
+        descr = "Object description"
+        # parameters carry address and size fields, as sent by devices
+        ops = [
+            HbusOperation(HbusInstruction(HBUSCOMMAND_ACK), master, source),
+            HbusOperation(
+                HbusInstruction(
+                    HBUSCOMMAND_QUERY_RESP,
+                    6 + len(descr),
+                    [1, 4 + len(descr), 1, 4, 0, len(descr), descr],
+                ),
+                master,
+                source,
+            ),
+            HbusOperation(
+                HbusInstruction(HBUSCOMMAND_RESPONSE, 6, [1, 4, 1, 2, 3, 4]),
+                master,
+                source,
+            ),
+        ]
+        for op in ops:
+            stream += op.get_packed()
+
+    return stream
+
+
+def run(stream, chunk, repeat):
+    """Feed stream to a decoder in chunks.
+
+    @return tuple with frame count and elapsed time
+    """
+    chunks = [stream[i : i + chunk] for i in range(0, len(stream), chunk)]
+    decoder = HbusFrameDecoder()
+    count = 0
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in chunks:
+            frames, error = decoder.feed(data)
+            count += len(frames)
+    elapsed = time.perf_counter() - start
+
+    return count, elapsed
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", nargs="?", help="raw byte stream file")
+    parser.add_argument("-c", help="chunk size in bytes", default=64, type=int)
+    parser.add_argument("-r", help="repetitions", default=200, type=int)
+    args = parser.parse_args()
+
+    if args.capture is not None:
+        with open(args.capture, "rb") as capture:
+            stream = capture.read()
+    else:
+        stream = synthesize_stream()
+
+    count, elapsed = run(stream, args.c, args.r)
+    size = len(stream) * args.r
+
+    print(
+        "{} frames, {} bytes in {:.3f} s: {:.0f} frames/s, {:.2f} MB/s".format(
+            count, size, elapsed, count / elapsed, size / elapsed / 1e6
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
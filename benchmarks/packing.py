@@ -0,0 +1,124 @@
+"""Frame packing benchmark.
+
+Packs common master commands by concatenating byte strings, as done before
+frames were packed into a buffer, one at a time into a buffer, and in
+bursts with pack_many.
+
+usage: python -m benchmarks.packing [-n COUNT] [-b BURST]
+"""
+
+import argparse
+import time
+
+from hbussd.hbus.base import (
+    HbusDeviceAddress,
+    HbusInstruction,
+    HbusOperation,
+    pack_many,
+)
+from hbussd.hbus.constants import (
+    HBUSCOMMAND_GETCH,
+    HBUSCOMMAND_SEARCH,
+    HBUSCOMMAND_SETCH,
+)
+
+
+def operations():
+    """Build operations of common commands."""
+    master = HbusDeviceAddress(0, 0)
+    device = HbusDeviceAddress(0, 1)
+
+    return {
+        "search": HbusOperation(
+            HbusInstruction(HBUSCOMMAND_SEARCH), device, master
+        ),
+        "getch": HbusOperation(
+            HbusInstruction(HBUSCOMMAND_GETCH, 1, [3]), device, master
+        ),
+        "setch": HbusOperation(
+            HbusInstruction(HBUSCOMMAND_SETCH, 6, [3, 4, 1, 2, 3, 4]),
+            device,
+            master,
+        ),
+    }
+
+
+def legacy(operation):
+    """Pack operation by concatenation, as done before buffers."""
+    header = (
+        bytes([operation.source.bus_number])
+        + bytes([operation.source.dev_number])
+        + bytes([operation.destination.bus_number])
+        + bytes([operation.destination.dev_number])
+    )
+
+    instruction = bytes([operation.instruction.command.cmd_byte])
+
+    terminator = b"\xFF"
+    if isinstance(operation.instruction.params, bytes):
+        return header + instruction + operation.instruction.params + terminator
+
+    for param in operation.instruction.params:
+
+        if isinstance(param, str):
+            instruction += param.encode("ascii")
+        elif isinstance(param, int):
+            instruction += bytes([param])
+        elif isinstance(param, bytes):
+            instruction += param
+        else:
+            raise TypeError("unsupported type: {}".format(type(param)))
+
+    return header + instruction + terminator
+
+
+def measure(fn, count):
+    """Call function repeatedly.
+
+    @return elapsed time
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+
+    return time.perf_counter() - start
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "-n", help="frames per command", default=100000, type=int
+    )
+    parser.add_argument("-b", help="frames per burst", default=8, type=int)
+    args = parser.parse_args()
+
+    buffer = bytearray()
+    for name, op in operations().items():
+        assert legacy(op) == op.get_packed()
+
+        before = measure(lambda: legacy(op), args.n)
+        after = measure(lambda: op.get_packed(buffer), args.n)
+
+        burst = [op] * args.b
+        joined = measure(
+            lambda: b"".join(x.get_packed() for x in burst), args.n // args.b
+        )
+        many = measure(lambda: pack_many(burst, buffer), args.n // args.b)
+
+        print(
+            "{:<8} concat {:.3f} s, buffer {:.3f} s ({:.1f}x), "
+            "burst join {:.3f} s, pack_many {:.3f} s ({:.1f}x)".format(
+                name,
+                before,
+                after,
+                before / after,
+                joined,
+                many,
+                joined / many,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Bus capture replay benchmark.
+
+Replays a capture recorded with the "capture" configuration option into
+fresh masters, with no serial port, on a simulated clock, and reports
+receive processing throughput and enumeration time on the capture clock.
+
+usage: python -m benchmarks.replay CAPTURE [-n RUNS] [--conf FILE]
+"""
+
+import argparse
+import json
+import logging
+import statistics
+
+from hbussd.master.capture import read_capture
+from hbussd.master.replay import HbusReplayDriver, HbusReplayMaster
+from twisted.internet.task import Clock
+
+
+def master_configuration(path):
+    """Build master configuration for replay."""
+    conf = {}
+    if path is not None:
+        with open(path) as f:
+            conf = json.load(f)
+
+    # never touch the bus or the network
+    for key in ("fakebus", "capture", "descriptor_cache"):
+        conf.pop(key, None)
+    conf["serial_port"] = "replay"
+    for bus in conf.get("busses", []):
+        bus.pop("fakebus", None)
+        bus["serial_port"] = "replay"
+    # the reactor does not run, sign in the calling thread
+    conf["crypto_pool_size"] = 0
+
+    return conf
+
+
+def run(args, records, conf):
+    """Replay capture repeatedly."""
+    results = []
+    for index in range(args.n):
+        master = HbusReplayMaster(None, conf_file=conf, clock=Clock())
+        driver = HbusReplayDriver(master, records)
+        stats = driver.run()
+        driver.stop()
+        results.append(stats)
+
+        print(
+            "run {}: {} frames, {:.3f} s processing, {:.0f} frames/s, "
+            "enumeration {}, {} stalls".format(
+                index + 1,
+                stats["frames"],
+                stats["processing_time"],
+                stats["frames_per_second"] or 0,
+                "n/a"
+                if stats["enumeration_time"] is None
+                else "{:.3f} s".format(stats["enumeration_time"]),
+                stats["stalls"],
+            )
+        )
+
+    rates = [x["frames_per_second"] or 0 for x in results]
+    print("median {:.0f} frames/s".format(statistics.median(rates)))
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="capture file")
+    parser.add_argument("-n", help="number of runs", default=5, type=int)
+    parser.add_argument("--conf", help="master configuration file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    records = read_capture(args.capture)
+    conf = master_configuration(args.conf)
+
+    run(args, records, conf)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Message signing latency benchmark.
+
+Compares per-signature latency of signing with key constants computed on
+every call, with constants precomputed once per key set and with cached
+signatures of a repeated message.
+
+usage: python -m benchmarks.signing [-n COUNT]
+"""
+
+import argparse
+import time
+
+from hbussd.hbus.constants import HBUS_SIGNATURE_SIZE
+from hbussd.hbus.crypto import RabinWilliamsSign
+from hbussd.master.master import HBUS_ASYMMETRIC_KEYS
+from hbussd.master.signing import HbusSigningService
+
+
+def messages(count):
+    """Build distinct SETCH-like messages."""
+    header = bytes([0, 0, 0, 1, 0x30, 1, 2])
+    return [header + i.to_bytes(4, "little") for i in range(count)]
+
+
+def measure(sign, msgs):
+    """Sign messages.
+
+    @return mean latency in ms
+    """
+    start = time.perf_counter()
+    for msg in msgs:
+        sign(msg)
+    elapsed = time.perf_counter() - start
+
+    return elapsed / len(msgs) * 1000
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", help="signatures", default=200, type=int)
+    args = parser.parse_args()
+
+    msgs = messages(args.n)
+    keys = HBUS_ASYMMETRIC_KEYS
+    service = HbusSigningService(keys, cache_size=0)
+    cached = HbusSigningService(keys)
+
+    results = [
+        (
+            "per-call constants",
+            measure(
+                lambda msg: RabinWilliamsSign(
+                    msg, keys.privatep, keys.privateq, HBUS_SIGNATURE_SIZE
+                ).getByteString(),
+                msgs,
+            ),
+        ),
+        ("precomputed constants", measure(service.sign, msgs)),
+        ("cached, repeated message", measure(cached.sign, msgs[:1] * args.n)),
+    ]
+
+    for name, latency in results:
+        print("{:<26} {:9.4f} ms/signature".format(name, latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,12 +14,15 @@ import struct
 from collections import deque
 
 from twisted.internet import reactor
-from twisted.internet.protocol import Protocol
+from twisted.internet.protocol import Factory, Protocol
 
-from ..hbus.base import HbusDeviceAddress, HbusInstruction, HbusOperation
+from ..hbus.base import (
+    HbusDeviceAddress,
+    HbusInstruction,
+    HbusOperation,
+    hbus_address,
+)
 from ..hbus.constants import (
-    HBUS_SACMDBYTELIST,
-    HBUS_SCMDBYTELIST,
     HBUSCOMMAND_ACK,
     HBUSCOMMAND_BUSLOCK,
     HBUSCOMMAND_BUSUNLOCK,
@@ -32,18 +35,17 @@ from ..hbus.constants import (
     HBUSCOMMAND_SEARCH,
     HBUSCOMMAND_SETCH,
     HBUSCOMMAND_SOFTRESET,
-    HBUSCOMMAND_STREAMR,
-    HBUSCOMMAND_STREAMW,
     HbusBusState,
     HbusObjectPermissions,
-    HbusRXState,
 )
+from ..hbus.framing import HbusDeviceFrameDecoder
 from ..hbus.slaves import (
     HbusDevice,
     HbusDeviceObject,
     HbusObjDataType,
     HbusObjLevel,
 )
+from .link import FakeBusLink
 
 # Configuration file options equivalence
 CONFIG_DATA_TYPE = {
@@ -74,8 +76,13 @@ CONFIG_LEVEL = {
     3: HbusObjLevel.level3,
 }
 
-FAKEBUS_MASTER_ADDRESS = HbusDeviceAddress(0, 0)
 SYS_CONFIG_PATH = "/etc/hbussd/fakebus"
+# Maximum number of devices addressed on one bus
+FAKEBUS_MAX_DEVICES = 32
+# TCP port of the fake bus of bus 0, bus n listens on the port n above
+FAKEBUS_TCP_PORT = 9090
+# Offset of device uids by bus number, keeps uids unique across busses
+FAKEBUS_UID_BUS_SHIFT = 24
 
 
 class FakeBusDeviceStatus:
@@ -190,12 +197,17 @@ class FakeBusSerialPort(Protocol):
     """Fake bus main class."""
 
     # Constructor, initializes
-    def __init__(self):
-        """Initialize."""
+    def __init__(self, bus=0):
+        """Initialize.
+
+        @param bus number of the emulated bus
+        """
         self.logger = logging.getLogger("hbussd.fakebus")
-        self.logger.debug("fakebus active")
-        self.dataBuffer = []
-        self.rxState = HbusRXState.SBID
+        self.logger.debug("fakebus active on bus %d", bus)
+        self.bus = bus
+        self.masterAddress = HbusDeviceAddress(bus, 0)
+        self.broadcastAddress = HbusDeviceAddress(bus, 255)
+        self.rxDecoder = HbusDeviceFrameDecoder()
         self.config = configparser.ConfigParser()
         self.deviceList = {}
         self.busAddrToUID = {}
@@ -214,6 +226,24 @@ class FakeBusSerialPort(Protocol):
 
         self.build_bus()
 
+        self.link = FakeBusLink(
+            self._write,
+            baudrate=self.config.getint("fakebus", "baudrate", fallback=0),
+            turnaround=self.config.getfloat(
+                "fakebus", "turnaround", fallback=0
+            ),
+            jitter=self.config.getfloat("fakebus", "jitter", fallback=0),
+            loss=self.config.getfloat("fakebus", "loss", fallback=0),
+            corruption=self.config.getfloat(
+                "fakebus", "corruption", fallback=0
+            ),
+            late=self.config.getfloat("fakebus", "late", fallback=0),
+            late_delay=self.config.getfloat(
+                "fakebus", "late_delay", fallback=1500
+            ),
+            seed=self.config.get("fakebus", "seed", fallback=None),
+        )
+
         self.busState = HbusBusState.FREE
         self.addressingDevice = None
         self.addressingQueue = deque()
@@ -222,129 +252,44 @@ class FakeBusSerialPort(Protocol):
         """Handle connection."""
         self.logger.debug("hbus master connected to fakebus")
 
-    # Data reception state machine, similar to master's
-    # @param data data chunk received
+    def connectionLost(self, reason):
+        """Handle disconnection."""
+        self.logger.debug(
+            "fakebus link statistics: %s", self.link.get_statistics()
+        )
+
+    def _write(self, data):
+        """Write data to the master."""
+        if self.transport is not None:
+            self.transport.write(data)
+
     def dataReceived(self, data):
-        """Receive data."""
-        for byte in data:
-
-            if self.rxState == HbusRXState.SBID:
-                self.dataBuffer.append(byte)
-                self.rxState = HbusRXState.SDID
-            elif self.rxState == HbusRXState.SDID:
-                self.dataBuffer.append(byte)
-                self.rxState = HbusRXState.TBID
-            elif self.rxState == HbusRXState.TBID:
-                self.dataBuffer.append(byte)
-                self.rxState = HbusRXState.TDID
-            elif self.rxState == HbusRXState.TDID:
-                self.dataBuffer.append(byte)
-                self.rxState = HbusRXState.CMD
-            elif self.rxState == HbusRXState.CMD:
-                self.dataBuffer.append(byte)
-                if byte in HBUS_SCMDBYTELIST:
-                    self.rxState = HbusRXState.STP
-                elif (
-                    byte == HBUSCOMMAND_SOFTRESET.cmd_byte
-                ):  # softreset is different, doesnt specify addr field
-                    self.rxState = HbusRXState.PSZ
-                else:
-                    self.rxState = HbusRXState.ADDR
-            elif self.rxState == HbusRXState.ADDR:
-                self.dataBuffer.append(byte)
-                if self.dataBuffer[4] in HBUS_SACMDBYTELIST:
-                    self.rxState = HbusRXState.STP
-                else:
-                    self.rxState = HbusRXState.PSZ
-            elif self.rxState == HbusRXState.PSZ:
-                self.lastParamSize = byte
-                self.dataBuffer.append(byte)
-                if (
-                    self.dataBuffer[4] == HBUSCOMMAND_STREAMW.cmd_byte
-                    or self.dataBuffer[4] == HBUSCOMMAND_STREAMR.cmd_byte
-                ):
-                    self.rxState = HbusRXState.STP
-                else:
-                    if byte > 0:
-                        self.rxState = HbusRXState.PRM
-                    else:
-                        self.rxState = HbusRXState.STP
-            elif self.rxState == HbusRXState.PRM:
-                # softreset has no addr field
-                # TODO: must update whole specification and force softreset
-                # command to have an addr field to avoid further problems
-                # TODO: undo this hack when modification is done
-                # start hack
-                if self.dataBuffer[4] == HBUSCOMMAND_SOFTRESET.cmd_byte:
-                    count = 5
-                else:
-                    count = 6
-                if len(self.dataBuffer) <= (count + self.lastParamSize):
-                    # end hack
-                    self.dataBuffer.append(byte)
-                else:
-                    if byte == 0xFF:
-                        self.dataBuffer.append(byte)
-                        # finished Packet
-
-                        self.rxState = HbusRXState.SBID
-                        self.parse_packet(self.dataBuffer)
-                        self.dataBuffer = []
-                        return
-                    else:
-                        # malformed packet, ignore
-                        self.rxState = HbusRXState.SBID
-                        self.logger.debug(
-                            "ignored malformed packet from master @PRM"
-                        )
-                        self.logger.debug(
-                            "info: expected to have received {} bytes".format(
-                                count + self.lastParamSize
-                            )
-                        )
-                        self.logger.debug(
-                            "packet size %d, dump: %s",
-                            len(self.dataBuffer),
-                            [hex(ord(x)) for x in self.dataBuffer],
-                        )
-                        self.dataBuffer = []
-                        return
-            elif self.rxState == HbusRXState.STP:
-                self.dataBuffer.append(byte)
-                if byte == 0xFF:
-                    # finished
-                    self.rxState = HbusRXState.SBID
-                    self.parse_packet(self.dataBuffer)
-                    self.dataBuffer = []
-                    return
-                else:
-                    # malformed packet, ignore
-                    self.rxState = HbusRXState.SBID
-                    self.logger.debug(
-                        "ignored malformed packet from master @STP"
-                    )
-                    self.logger.debug(
-                        "packet size %d dump: %s",
-                        len(self.dataBuffer),
-                        [hex(ord(x)) for x in self.dataBuffer],
-                    )
-                    self.dataBuffer = []
-                    return
-            else:
-                # unknown state!
-                self.logger.error("unknown state reached!")
-                raise IOError("fatal fakebus error")
-                self.rxState = HbusRXState.SBID
-                self.dataBuffer = []
-                return
+        """Receive data.
+
+        @param data data chunk received, may hold several frames and
+        partial frames
+        """
+        self.link.received(len(data))
+        frames, error = self.rxDecoder.feed(data)
+        for frame in frames:
+            self.parse_packet(frame)
+
+        if error is not None:
+            # malformed packet, ignore
+            self.logger.debug("ignored malformed packet from master")
+            self.logger.debug(
+                "packet size %d, dump: %s",
+                len(self.rxDecoder.error_dump),
+                [hex(x) for x in self.rxDecoder.error_dump],
+            )
 
     def parse_packet(self, packet):
         """Parse complete packet."""
         # psource = HbusDeviceAddress(packet[0], packet[1])
-        pdest = HbusDeviceAddress(packet[2], packet[3])
+        pdest = hbus_address(packet[2], packet[3])
 
-        # decode packets, respond on BUS 0
-        if packet[2] != 0 and packet[2] != 0xFF:
+        # decode packets, respond on own bus
+        if packet[2] != self.bus and packet[2] != 0xFF:
             return
 
         # check if bus is locked
@@ -353,7 +298,7 @@ class FakeBusSerialPort(Protocol):
         elif self.busState == HbusBusState.LOCKED_THIS:
             # look for special cases such as when receiving SEARCH or KEYSET
             # commands indicating attribution of an address
-            if self.addressingDevice is None:
+            if self.addressingDevice is not None:
                 if (
                     packet[4] == HBUSCOMMAND_GETCH.cmd_byte
                     and packet[5] == 0
@@ -369,8 +314,8 @@ class FakeBusSerialPort(Protocol):
 
                     self.send_packet(
                         HBUSCOMMAND_RESPONSE,
-                        FAKEBUS_MASTER_ADDRESS,
-                        HbusDeviceAddress(0, 255),
+                        self.masterAddress,
+                        self.broadcastAddress,
                         params,
                     )
                     self.deviceList[
@@ -462,8 +407,9 @@ class FakeBusSerialPort(Protocol):
             # ping some device
             self.send_packet(
                 HBUSCOMMAND_ACK,
-                FAKEBUS_MASTER_ADDRESS,
+                self.masterAddress,
                 self.deviceList[target_uid].hbusSlaveAddress,
+                faults=True,
             )
             return
         elif packet[4] == HBUSCOMMAND_QUERY.cmd_byte:
@@ -476,9 +422,10 @@ class FakeBusSerialPort(Protocol):
                 return
             self.send_packet(
                 HBUSCOMMAND_QUERY_RESP,
-                FAKEBUS_MASTER_ADDRESS,
+                self.masterAddress,
                 self.deviceList[target_uid].hbusSlaveAddress,
                 params,
+                faults=True,
             )
             return
         elif packet[4] == HBUSCOMMAND_GETCH.cmd_byte:
@@ -491,14 +438,19 @@ class FakeBusSerialPort(Protocol):
                 return
             self.send_packet(
                 HBUSCOMMAND_RESPONSE,
-                FAKEBUS_MASTER_ADDRESS,
+                self.masterAddress,
                 self.deviceList[target_uid].hbusSlaveAddress,
                 params,
+                faults=True,
             )
             return
 
-    def send_packet(self, command, dest, source, params=()):
-        """Send packet."""
+    def send_packet(self, command, dest, source, params=(), faults=False):
+        """Send packet.
+
+        @param faults packet answers the master and may be lost, corrupted
+        or delayed
+        """
         busop = HbusOperation(
             HbusInstruction(command, len(params), params), dest, source
         )
@@ -509,7 +461,7 @@ class FakeBusSerialPort(Protocol):
             self.busState = HbusBusState.FREE
 
         # self.logger.debug('writing: {}'.format(busop.get_string()))
-        self.transport.write(busop.get_packed())
+        self.link.send(busop.get_packed(), faults)
 
     # Process addressing of devices
     def address_next_dev(self):
@@ -531,8 +483,8 @@ class FakeBusSerialPort(Protocol):
             ].deviceStatus = FakeBusDeviceStatus.deviceAddressing2
             self.send_packet(
                 HBUSCOMMAND_BUSLOCK,
-                FAKEBUS_MASTER_ADDRESS,
-                HbusDeviceAddress(0, 255),
+                self.masterAddress,
+                self.broadcastAddress,
             )
 
             # done for now
@@ -544,7 +496,7 @@ class FakeBusSerialPort(Protocol):
             # do a busunlock
             self.send_packet(
                 HBUSCOMMAND_BUSUNLOCK,
-                FAKEBUS_MASTER_ADDRESS,
+                self.masterAddress,
                 self.deviceList[self.addressingDevice].hbusSlaveAddress,
             )
             self.deviceList[
@@ -574,24 +526,6 @@ class FakeBusSerialPort(Protocol):
             devconf = configparser.ConfigParser()
             devconf.read(devpath + devfile)
 
-            # detect static addressed device
-            static_addr = None
-            try:
-                static_addr = devconf.get("device", "static_addr")
-            except Exception:
-                pass
-
-            if static_addr is not None:
-                m = re.match(r"([0-9]+):([0-9]+)", static_addr.strip())
-
-                if m is not None:
-                    static_addr = HbusDeviceAddress(
-                        int(m.group(1)), int(m.group(2))
-                    )
-
-            device = FakeBusDevice(static_addr)
-
-            # start building device
             try:
                 if devconf.getboolean("device", "dont_read"):
                     self.logger.debug(
@@ -601,109 +535,183 @@ class FakeBusSerialPort(Protocol):
             except Exception:
                 pass
 
-            # UID
-            device.hbusSlaveUniqueDeviceInfo = int(
-                devconf.get("device", "uid"), 16
-            )
-            device.hbusSlaveDescription = devconf.get("device", "descr")
-            device.hbusSlaveObjectCount = devconf.getint(
-                "device", "object_count"
+            device = self.load_device(devconf)
+            if (
+                device.hbusSlaveAddress is not None
+                and device.hbusSlaveAddress.bus_number != self.bus
+            ):
+                # statically addressed on another bus
+                continue
+
+            self.add_device(device)
+
+        self.build_synthetic_devices()
+
+    def build_synthetic_devices(self):
+        """Add devices synthesized from a template device file.
+
+        Devices are copies of the template with unique ids counting up
+        from synthetic_uid and numbered descriptions. The template is
+        used even if it is marked dont_read.
+        """
+        count = self.config.getint("fakebus", "synthetic_devices", fallback=0)
+        if count <= 0:
+            return
+
+        template = os.path.join(
+            self.config_path, self.config.get("fakebus", "synthetic_template")
+        )
+        devconf = configparser.ConfigParser()
+        if not devconf.read(template):
+            self.logger.error("cannot read device template %s", template)
+            return
+
+        if count > FAKEBUS_MAX_DEVICES:
+            self.logger.warning(
+                "%d synthetic devices, only %d can be addressed per bus",
+                count,
+                FAKEBUS_MAX_DEVICES,
             )
-            device.hbusSlaveEndpointCount = devconf.getint(
-                "device", "endpoint_count"
+
+        base_uid = int(
+            self.config.get("fakebus", "synthetic_uid", fallback="0x10000"),
+            16,
+        )
+        for index in range(count):
+            device = self.load_device(devconf, static=False)
+            device.hbusSlaveUniqueDeviceInfo = (
+                base_uid + index + (self.bus << FAKEBUS_UID_BUS_SHIFT)
             )
-            device.hbusSlaveInterruptCount = devconf.getint(
-                "device", "int_count"
+            device.hbusSlaveDescription = "{}{}".format(
+                device.hbusSlaveDescription, index + 1
             )
+            self.add_device(device)
 
-            # capabilities, must generate flags
-            # TODO: generate flags for capabilities from configuration file
+    def add_device(self, device):
+        """Add device to bus.
 
-            # store addr->id correlation
-            if static_addr is not None:
-                self.busAddrToUID[
-                    static_addr.global_id
-                ] = device.hbusSlaveUniqueDeviceInfo
+        @param device FakeBusDevice object
+        """
+        # store addr->id correlation
+        if device.deviceStatus == FakeBusDeviceStatus.deviceEnumerated:
+            self.busAddrToUID[
+                device.hbusSlaveAddress.global_id
+            ] = device.hbusSlaveUniqueDeviceInfo
+
+        self.deviceList[device.hbusSlaveUniqueDeviceInfo] = device
+        self.logger.debug(
+            'fake device "'
+            + device.hbusSlaveDescription
+            + '" <'
+            + hex(device.hbusSlaveUniqueDeviceInfo)
+            + "> added"
+        )
 
-            for section in devconf.sections():
-                m = re.match(r"object([0-9]+)", section)
-                if m is None:
-                    continue
+    def load_device(self, devconf, static=True):
+        """Build device from its configuration.
 
-                obj = HbusDeviceObject()
+        @param devconf ConfigParser object of a device file
+        @param static use static address from configuration
+        @return FakeBusDevice object
+        """
+        # detect static addressed device
+        static_addr = None
+        try:
+            static_addr = devconf.get("device", "static_addr")
+        except Exception:
+            pass
 
-                # generate flags for objectPermissions
-                can_read = devconf.getboolean(section, "can_read")
-                can_write = devconf.getboolean(section, "can_write")
+        if static_addr is not None:
+            m = re.match(r"([0-9]+):([0-9]+)", static_addr.strip())
 
-                if can_read:
-                    if can_write:
-                        obj.permissions = HbusObjectPermissions.READ_WRITE
-                    else:
-                        obj.permissions = HbusObjectPermissions.READ
-                elif can_write:
-                    obj.permissions = HbusObjectPermissions.WRITE
-                else:
-                    # error!
-                    pass  # for now
-
-                obj.is_crypto = devconf.getboolean(section, "is_crypto")
-                obj.hidden = devconf.getboolean(section, "hidden")
-                obj.description = devconf.get(section, "descr")
-                size = devconf.getint(section, "size")
-                if size < 1 or size > 4:
-                    # invalid size
-                    self.logger.warning("invalid object size detected")
-                    if size < 1:
-                        obj.size = 1
-                    elif size > 4:
-                        obj.size = 4
-                else:
-                    obj.size = size
-
-                # must generate value from configfile
-                data_type = devconf.get(section, "data_type")
-                data_type_info = devconf.get(section, "data_type_info")
-                level = devconf.getint(section, "level")
-
-                try:
-                    obj.objectDataType = CONFIG_DATA_TYPE[data_type]
-                    if (
-                        obj.objectDataType
-                        != HbusObjDataType.dataTypeFixedPoint
-                    ):
-                        obj.objectDataTypeInfo = CONFIG_DATA_TYPE_INFO[
-                            data_type_info
-                        ]
-                    else:
-                        obj.objectDataTypeInfo = int(data_type_info)
-                    obj.objectLevel = CONFIG_LEVEL[level]
-                except Exception:
-                    # invalid data type
-                    obj.objectDataType = CONFIG_DATA_TYPE["U"]
-                    obj.objectDataTypeInfo = CONFIG_DATA_TYPE_INFO["u"]
-
-                # must interpret dummy return value in file
-                raw_value = devconf.get(section, "value")
-                obj.last_value = self.list_val_to_int(
-                    raw_value, obj.objectDataType
+            if m is not None:
+                static_addr = HbusDeviceAddress(
+                    int(m.group(1)), int(m.group(2))
                 )
 
-                # when finished
-                # add to obj list
-                device.hbusSlaveObjects[int(m.group(1))] = obj
+        device = FakeBusDevice(static_addr if static else None)
 
-            # when finished
-            # add to device list
-            self.deviceList[device.hbusSlaveUniqueDeviceInfo] = device
-            self.logger.debug(
-                'fake device "'
-                + device.hbusSlaveDescription
-                + '" <'
-                + hex(device.hbusSlaveUniqueDeviceInfo)
-                + "> added"
+        # UID
+        device.hbusSlaveUniqueDeviceInfo = int(
+            devconf.get("device", "uid"), 16
+        ) + (self.bus << FAKEBUS_UID_BUS_SHIFT)
+        device.hbusSlaveDescription = devconf.get("device", "descr")
+        device.hbusSlaveObjectCount = devconf.getint("device", "object_count")
+        device.hbusSlaveEndpointCount = devconf.getint(
+            "device", "endpoint_count"
+        )
+        device.hbusSlaveInterruptCount = devconf.getint("device", "int_count")
+
+        # capabilities, must generate flags
+        # TODO: generate flags for capabilities from configuration file
+
+        for section in devconf.sections():
+            m = re.match(r"object([0-9]+)", section)
+            if m is None:
+                continue
+
+            obj = HbusDeviceObject()
+
+            # generate flags for objectPermissions
+            can_read = devconf.getboolean(section, "can_read")
+            can_write = devconf.getboolean(section, "can_write")
+
+            if can_read:
+                if can_write:
+                    obj.permissions = HbusObjectPermissions.READ_WRITE
+                else:
+                    obj.permissions = HbusObjectPermissions.READ
+            elif can_write:
+                obj.permissions = HbusObjectPermissions.WRITE
+            else:
+                # error!
+                pass  # for now
+
+            obj.is_crypto = devconf.getboolean(section, "is_crypto")
+            obj.hidden = devconf.getboolean(section, "hidden")
+            obj.description = devconf.get(section, "descr")
+            size = devconf.getint(section, "size")
+            if size < 1 or size > 4:
+                # invalid size
+                self.logger.warning("invalid object size detected")
+                if size < 1:
+                    obj.size = 1
+                elif size > 4:
+                    obj.size = 4
+            else:
+                obj.size = size
+
+            # must generate value from configfile
+            data_type = devconf.get(section, "data_type")
+            data_type_info = devconf.get(section, "data_type_info")
+            level = devconf.getint(section, "level")
+
+            try:
+                obj.objectDataType = CONFIG_DATA_TYPE[data_type]
+                if obj.objectDataType != HbusObjDataType.dataTypeFixedPoint:
+                    obj.objectDataTypeInfo = CONFIG_DATA_TYPE_INFO[
+                        data_type_info
+                    ]
+                else:
+                    obj.objectDataTypeInfo = int(data_type_info)
+                obj.objectLevel = CONFIG_LEVEL[level]
+            except Exception:
+                # invalid data type
+                obj.objectDataType = CONFIG_DATA_TYPE["U"]
+                obj.objectDataTypeInfo = CONFIG_DATA_TYPE_INFO["u"]
+
+            # must interpret dummy return value in file
+            raw_value = devconf.get(section, "value")
+            obj.last_value = self.list_val_to_int(
+                raw_value, obj.objectDataType
             )
 
+            # when finished
+            # add to obj list
+            device.hbusSlaveObjects[int(m.group(1))] = obj
+
+        return device
+
     def list_val_to_int(self, value, valuetype):
         """Convert list value to an integer type."""
         if valuetype == HbusObjDataType.dataTypeInt:
@@ -729,3 +737,18 @@ class FakeBusSerialPort(Protocol):
                 return 0
         else:
             return 0
+
+
+class FakeBusFactory(Factory):
+    """Fake bus server of one bus."""
+
+    def __init__(self, bus=0):
+        """Initialize.
+
+        @param bus number of the emulated bus
+        """
+        self.bus = bus
+
+    def buildProtocol(self, addr):
+        """Build fake bus for a master connection."""
+        return FakeBusSerialPort(self.bus)
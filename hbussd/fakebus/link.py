@@ -0,0 +1,150 @@
+"""Fake bus link timing and fault model."""
+
+import random
+
+from twisted.internet import reactor
+
+# Bits per byte on the wire: start bit, 8 data bits and stop bit
+BITS_PER_BYTE = 10
+
+
+class FakeBusLink:
+    """Deliver device frames with bus timing and injected faults.
+
+    The bus is half duplex. A device answer starts when the frame it
+    answers has been transmitted and the device turnaround time has
+    elapsed, and never before the previous answer has ended. Each byte
+    takes BITS_PER_BYTE bit times at baudrate.
+
+    Answers to master requests may be lost, corrupted (one bit flipped) or
+    delivered late, after late_delay, so that the master times out.
+
+    With no baudrate, turnaround or faults, frames are written at once.
+    """
+
+    def __init__(
+        self,
+        write,
+        baudrate=0,
+        turnaround=0.0,
+        jitter=0.0,
+        loss=0.0,
+        corruption=0.0,
+        late=0.0,
+        late_delay=1500.0,
+        seed=None,
+    ):
+        """Initialize.
+
+        @param write function writing data to the master
+        @param baudrate bus baud rate, 0 for no byte timing
+        @param turnaround device turnaround time in ms
+        @param jitter maximum random turnaround increase in ms
+        @param loss probability of an answer being lost
+        @param corruption probability of an answer being corrupted
+        @param late probability of an answer being delivered late
+        @param late_delay delay of late answers in ms
+        @param seed random generator seed, for repeatable runs
+        """
+        self._write = write
+        self.baudrate = baudrate
+        self.turnaround = turnaround
+        self.jitter = jitter
+        self.loss = loss
+        self.corruption = corruption
+        self.late = late
+        self.late_delay = late_delay
+        self._random = random.Random(seed)
+
+        # time at which the bus is free again
+        self._busFree = 0.0
+
+        self.sent = 0
+        self.lost = 0
+        self.corrupted = 0
+        self.delayed = 0
+
+    @property
+    def byte_time(self):
+        """Get time taken by one byte in seconds."""
+        if self.baudrate <= 0:
+            return 0.0
+
+        return BITS_PER_BYTE / self.baudrate
+
+    @property
+    def immediate(self):
+        """Get whether frames are written at once."""
+        return (
+            self.baudrate <= 0
+            and self.turnaround <= 0
+            and self.jitter <= 0
+            and self.loss <= 0
+            and self.corruption <= 0
+            and self.late <= 0
+        )
+
+    def received(self, length):
+        """Account for data sent by the master occupying the bus.
+
+        @param length number of bytes received
+        """
+        now = reactor.seconds()  # @UndefinedVariable
+        self._busFree = max(self._busFree, now) + length * self.byte_time
+
+    def send(self, data, faults=False):
+        """Send frame to the master.
+
+        @param data frame bytes
+        @param faults frame is an answer to the master, in which faults may
+        be injected
+        """
+        self.sent += 1
+        if self.immediate:
+            self._write(data)
+            return
+
+        now = reactor.seconds()  # @UndefinedVariable
+        turnaround = self.turnaround
+        if self.jitter > 0:
+            turnaround += self._random.uniform(0, self.jitter)
+
+        start = max(self._busFree, now) + turnaround / 1000
+        end = start + len(data) * self.byte_time
+
+        if faults:
+            if self.loss > 0 and self._random.random() < self.loss:
+                self.lost += 1
+                return
+
+            if self.corruption > 0 and self._random.random() < self.corruption:
+                self.corrupted += 1
+                data = bytearray(data)
+                data[self._random.randrange(len(data))] ^= (
+                    1 << self._random.randrange(8)
+                )
+                data = bytes(data)
+
+            if self.late > 0 and self._random.random() < self.late:
+                # does not hold the bus while the master waits
+                self.delayed += 1
+                reactor.callLater(
+                    end - now + self.late_delay / 1000, self._write, data
+                )  # @UndefinedVariable
+                return
+
+        self._busFree = end
+        reactor.callLater(end - now, self._write, data)  # @UndefinedVariable
+
+    def get_statistics(self):
+        """Get link statistics.
+
+        @return dictionary with numbers of frames sent, lost, corrupted
+        and delayed
+        """
+        return {
+            "sent": self.sent,
+            "lost": self.lost,
+            "corrupted": self.corrupted,
+            "delayed": self.delayed,
+        }
@@ -6,13 +6,19 @@
 """
 
 import re
+import struct
 
 import hbussd.hbus.constants as hbusconst
 
+# Frame header: source bus and device, destination bus and device, command
+_HEADER = struct.Struct("5B")
+
 
 class HbusInstruction:
     """HBUS bus instructions (complete commands)."""
 
+    __slots__ = ("params", "param_size", "command")
+
     def __init__(self, command, paramSize=0, params=()):
         """Initialize.
 
@@ -20,20 +26,16 @@ class HbusInstruction:
         @param paramSize parameter size in bytes
         @param params parameters to be sent
         """
-        # Parameter list
-        self.params = []
-        # Parameter list size
-        self.param_size = 0
+        if command is None:
+            raise ValueError("Undefined error")
+        if hbusconst.HBUS_COMMANDTABLE[command.cmd_byte] != command:
+            raise ValueError("Invalid command: %d" % command.cmd_byte)
+
         # HBUS command
         self.command = command
-
-        if command not in hbusconst.HBUS_COMMANDLIST:
-            if command is None:
-                raise ValueError("Undefined error")
-            else:
-                raise ValueError("Invalid command: %d" % ord(command.cmd_byte))
-
+        # Parameter list size
         self.param_size = paramSize
+        # Parameter list
         self.params = params
 
         if (len(params)) > command.max_len:
@@ -72,7 +74,13 @@ class HbusInstruction:
 
 
 class HbusDeviceAddress:
-    """HBUS device addresses."""
+    """HBUS device addresses.
+
+    Addresses are not modified after creation, hbus_address returns
+    shared instances.
+    """
+
+    __slots__ = ("bus_number", "dev_number", "global_id")
 
     def __init__(self, busID, devID):
         """Initialize.
@@ -87,6 +95,8 @@ class HbusDeviceAddress:
         self.bus_number = busID
         # Device number in this bus
         self.dev_number = devID
+        # Global ID, busNumber*32 + deviceNumber
+        self.global_id = busID * 32 + devID
 
     def __repr__(self):
         """Get legible address representation.
@@ -111,14 +121,30 @@ class HbusDeviceAddress:
         """Get hash."""
         return hash((self.bus_number, self.dev_number))
 
-    @property
-    def global_id(self):
-        """Calculate global ID for an address.
 
-        Global IDs are calculated by doing ID = busNumber*32 + deviceNumber
-        @return address global ID
-        """
-        return self.bus_number * 32 + self.dev_number
+# Interned addresses indexed by bus number * 256 + device number
+_ADDRESS_TABLE = [None] * 65536
+
+
+def hbus_address(bus_number, dev_number):
+    """Get shared address object.
+
+    Avoids allocating addresses for every received frame.
+    @param bus_number bus number
+    @param dev_number device number
+    @return HBUS address object
+    """
+    if not (0 <= bus_number < 256 and 0 <= dev_number < 256):
+        return HbusDeviceAddress(bus_number, dev_number)
+
+    index = (bus_number << 8) | dev_number
+    address = _ADDRESS_TABLE[index]
+    if address is None:
+        address = _ADDRESS_TABLE[index] = HbusDeviceAddress(
+            bus_number, dev_number
+        )
+
+    return address
 
 
 def hbus_address_from_string(addr):
@@ -148,6 +174,8 @@ class HbusOperation:
     and message source and destination
     """
 
+    __slots__ = ("instruction", "destination", "source")
+
     def __init__(self, instruction, destination, source):
         """Initialize.
 
@@ -177,35 +205,67 @@ class HbusOperation:
             + str(self.instruction)
         )
 
-    def get_packed(self):
-        """Generate data string to be sent by master.
+    def pack_into(self, buffer):
+        """Append frame to be sent by master to a buffer.
 
-        @return data string to be sent to bus
+        @param buffer bytearray to which frame is appended
+        @return buffer
         TODO: automatically generate parameter size field which
         depends on command
         """
-        header = (
-            bytes([self.source.bus_number])
-            + bytes([self.source.dev_number])
-            + bytes([self.destination.bus_number])
-            + bytes([self.destination.dev_number])
+        buffer += _HEADER.pack(
+            self.source.bus_number,
+            self.source.dev_number,
+            self.destination.bus_number,
+            self.destination.dev_number,
+            self.instruction.command.cmd_byte,
         )
 
-        instruction = bytes([self.instruction.command.cmd_byte])
+        params = self.instruction.params
+        mark = len(buffer)
+        try:
+            # byte strings and lists of byte values
+            buffer.extend(params)
+        except TypeError:
+            del buffer[mark:]
+            for param in params:
+                if isinstance(param, str):
+                    buffer += param.encode("ascii")
+                elif isinstance(param, int):
+                    buffer.append(param)
+                elif isinstance(param, bytes):
+                    buffer += param
+                else:
+                    raise TypeError(
+                        "unsupported type: {}".format(type(param))
+                    )
+
+        buffer.append(0xFF)
+
+        return buffer
+
+    def get_packed(self, buffer=None):
+        """Generate data string to be sent by master.
+
+        @param buffer bytearray to be reused, cleared before packing
+        @return data string to be sent to bus
+        """
+        return pack_many((self,), buffer)
 
-        terminator = b"\xFF"
-        if isinstance(self.instruction.params, bytes):
-            return header + instruction + self.instruction.params + terminator
 
-        for param in self.instruction.params:
+def pack_many(operations, buffer=None):
+    """Pack several operations to be written at once.
+
+    @param operations iterable of HbusOperation objects
+    @param buffer bytearray to be reused, cleared before packing
+    @return data string to be sent to bus
+    """
+    if buffer is None:
+        buffer = bytearray()
+    else:
+        del buffer[:]
 
-            if isinstance(param, str):
-                instruction += param.encode("ascii")
-            elif isinstance(param, int):
-                instruction += bytes([param])
-            elif isinstance(param, bytes):
-                instruction += param
-            else:
-                raise TypeError("unsupported type: {}".format(type(param)))
+    for operation in operations:
+        operation.pack_into(buffer)
 
-        return header + instruction + terminator
+    return bytes(buffer)
@@ -0,0 +1,327 @@
+"""Compiled object value codecs.
+
+A codec is built once per device object, when its data type and extended
+information are known, so that formatting a value does not have to look up
+formatters, units or scale limits again.
+
+Signed integers are always sent most significant byte first; the object
+descriptor has no byte order information.
+"""
+
+import struct
+from math import log
+
+from hbussd.hbus.constants import HBUS_UNITS
+from hbussd.hbus.slaves import HbusObjDataType
+
+# struct formats for unsigned integers by size in bytes
+_UINT_FORMATS = {1: "B", 2: "H", 4: "I"}
+# struct formats for signed integers by size in bytes
+_INT_FORMATS = {1: "b", 2: "h", 4: "i"}
+
+
+def _int_decoder(size, byteorder, signed):
+    """Build function converting a byte list to an integer.
+
+    @param size value size in bytes
+    @param byteorder "big" or "little"
+    @param signed decode two's complement values
+    @return decoding function
+    """
+
+    def convert(data):
+        return int.from_bytes(bytes(data), byteorder, signed=signed)
+
+    fmt = (_INT_FORMATS if signed else _UINT_FORMATS).get(size)
+    if fmt is None:
+        return convert
+
+    unpack = struct.Struct((">" if byteorder == "big" else "<") + fmt).unpack
+
+    def decode(data):
+        if len(data) != size:
+            return convert(data)
+        return unpack(bytes(data))[0]
+
+    return decode
+
+
+def _uint_decoder(size, byteorder):
+    """Build function converting a byte list to an unsigned integer."""
+    return _int_decoder(size, byteorder, False)
+
+
+def _unit_suffix(extinfo):
+    """Get display suffix for unit in extended information."""
+    try:
+        return " " + HBUS_UNITS[chr(extinfo["UNIT"][0])]
+    except Exception:
+        return ""
+
+
+def _scale_limit(extinfo, key, default):
+    """Get scale limit from extended information."""
+    try:
+        return _uint_decoder(len(extinfo[key]), "big")(extinfo[key])
+    except Exception:
+        return default
+
+
+def _to_bytes(value, size):
+    """Split integer into a byte list, least significant byte first."""
+    return [(value >> (8 * i)) & 0xFF for i in range(size)]
+
+
+class HbusObjectCodec:
+    """Object value codec.
+
+    decode converts raw data received from a device to a formatted value,
+    encode converts a formatted value to raw data to be sent.
+    """
+
+    def __init__(self, size, extinfo):
+        """Initialize.
+
+        @param size object size in bytes
+        @param extinfo object extended information dictionary or None
+        """
+        self.size = size
+
+    def decode(self, data):
+        """Format raw data.
+
+        @param data byte list
+        @return formatted value
+        """
+        return str(data)
+
+    def encode(self, value):
+        """Convert formatted value to raw data.
+
+        @param value formatted value
+        @return byte list
+        """
+        return [0] * self.size
+
+
+class HbusByteCodec(HbusObjectCodec):
+    """Byte list displayed as numbers."""
+
+    # display format and parsing base by data type information
+    FORMATS = {
+        HbusObjDataType.dataTypeByteHex: ("%X", 16),
+        HbusObjDataType.dataTypeByteDec: ("%d", 10),
+        HbusObjDataType.dataTypeByteOct: ("%o", 8),
+        HbusObjDataType.dataTypeByteBin: ("0b{0:b}", 2),
+    }
+
+    def __init__(self, size, extinfo, info):
+        """Initialize.
+
+        @param info data type information
+        """
+        super().__init__(size, extinfo)
+        fmt, self.base = self.FORMATS[info]
+        if "{" in fmt:
+            self._format = fmt.format
+        else:
+            self._format = fmt.__mod__
+
+    def decode(self, data):
+        return ", ".join(map(self._format, data))
+
+    def encode(self, value):
+        return [int(x, self.base) for x in str(value).split(",")][: self.size]
+
+
+class HbusBoolCodec(HbusObjectCodec):
+    """Byte displayed as ON/OFF."""
+
+    def decode(self, data):
+        return "ON" if data[0] > 0 else "OFF"
+
+    def encode(self, value):
+        return [1] if value == "ON" else [0]
+
+
+class HbusUintCodec(HbusObjectCodec):
+    """Unsigned integer with optional unit."""
+
+    def __init__(self, size, extinfo):
+        super().__init__(size, extinfo)
+        self._decode = _uint_decoder(size, "big")
+        self.unit = _unit_suffix(extinfo)
+
+    def decode(self, data):
+        return str(self._decode(data)) + self.unit
+
+    def encode(self, value):
+        value = int(str(value).split(" ")[0])
+        return list(value.to_bytes(self.size, "big"))
+
+
+class HbusPercentCodec(HbusObjectCodec):
+    """Unsigned integer in the 0-100 range."""
+
+    def decode(self, data):
+        # a percentual value only needs one byte
+        return "{}%".format(data[0])
+
+    def encode(self, value):
+        return _to_bytes(min(int(value), 100), self.size)
+
+
+class HbusScaleCodec(HbusObjectCodec):
+    """Unsigned integer displayed as percent of a linear scale.
+
+    Scale limits are taken from the MIN and MAX hidden objects and default
+    to the full range of the object size. Values of an empty scale, with
+    MAX not above MIN, are displayed as 0%.
+    """
+
+    def __init__(self, size, extinfo):
+        super().__init__(size, extinfo)
+        self._decode = _uint_decoder(size, "big")
+        self.min_value = _scale_limit(extinfo, "MIN", 0)
+        self.max_value = _scale_limit(extinfo, "MAX", 2 ** (8 * size) - 1)
+        self.range = float(self.max_value - self.min_value)
+
+    def decode(self, data):
+        if self.range <= 0:
+            return "0.00%"
+
+        value = self._decode(data)
+        return "%.2f%%" % ((value - self.min_value) / self.range * 100)
+
+    def encode(self, value):
+        value = int(float(value) / 100.0 * max(self.range, 0) + self.min_value)
+        return _to_bytes(value, self.size)
+
+
+class HbusLogScaleCodec(HbusScaleCodec):
+    """Unsigned integer displayed as percent of a logarithmic scale."""
+
+    def __init__(self, size, extinfo):
+        super().__init__(size, extinfo)
+        # a scale with a single step has a null logarithm too
+        self.log_range = log(self.range) if self.range > 1 else 0.0
+
+    def decode(self, data):
+        if self.log_range == 0:
+            return "0.00%"
+
+        value = self._decode(data)
+        try:
+            percent = log(float(value - self.min_value)) / self.log_range
+        except Exception:
+            percent = 0
+
+        return "%.2f%%" % (percent * 100)
+
+    def encode(self, value):
+        value = int(
+            10 ** (float(value) / 100.0 * self.log_range) + self.min_value
+        )
+        return _to_bytes(value, self.size)
+
+
+class HbusTimeCodec(HbusObjectCodec):
+    """BCD time of day."""
+
+    def decode(self, data):
+        return "%2d:%2d:%2d,%2d" % (
+            data[0] & 0x0F,
+            (data[1] & 0x0F) + ((data[1] & 0xF0) >> 4) * 10,
+            (data[2] & 0x0F) + ((data[2] & 0xF0) >> 4) * 10,
+            (data[3] & 0x0F) + ((data[3] & 0xF0) >> 4) * 10,
+        )
+
+
+class HbusDateCodec(HbusObjectCodec):
+    """Date, not implemented."""
+
+    def decode(self, data):
+        return "?"
+
+
+class HbusIntCodec(HbusObjectCodec):
+    """Signed integer with optional unit, most significant byte first."""
+
+    def __init__(self, size, extinfo):
+        super().__init__(size, extinfo)
+        self._decode = _int_decoder(size, "big", True)
+        self.unit = _unit_suffix(extinfo)
+
+    def decode(self, data):
+        return str(self._decode(data)) + self.unit
+
+    def encode(self, value):
+        value = int(str(value).split(" ")[0])
+        return list(value.to_bytes(self.size, "big", signed=True))
+
+
+class HbusFixedPointCodec(HbusObjectCodec):
+    """Fixed point number with optional unit.
+
+    Devices send fixed point values least significant byte first. Values
+    shorter than 4 bytes are zero padded, only 4 byte values are signed.
+    """
+
+    def __init__(self, size, extinfo, point):
+        """Initialize.
+
+        @param point number of decimal places
+        """
+        super().__init__(size, extinfo)
+        self._decode = _int_decoder(size, "little", size >= 4)
+        self.scale = 10 ** float(point)
+        self.unit = _unit_suffix(extinfo)
+
+    def decode(self, data):
+        value = self._decode(data) / self.scale
+        if self.unit:
+            return str(value) + self.unit
+
+        return value
+
+    def encode(self, value):
+        value = float(str(value).split(" ")[0])
+        return _to_bytes(int(round(value * self.scale)), self.size)
+
+
+# Unsigned integer codecs by data type information
+_UINT_CODECS = {
+    HbusObjDataType.dataTypeUintNone: HbusUintCodec,
+    HbusObjDataType.dataTypeUintPercent: HbusPercentCodec,
+    HbusObjDataType.dataTypeUintLinPercent: HbusScaleCodec,
+    HbusObjDataType.dataTypeUintLogPercent: HbusLogScaleCodec,
+    HbusObjDataType.dataTypeUintTime: HbusTimeCodec,
+    HbusObjDataType.dataTypeUintDate: HbusDateCodec,
+}
+
+
+def build_codec(obj):
+    """Build codec for a device object.
+
+    @param obj HbusDeviceObject object
+    @return codec object
+    """
+    size = obj.size
+    extinfo = obj.objectExtendedInfo
+    info = obj.objectDataTypeInfo
+
+    if obj.objectDataType == HbusObjDataType.type_byte:
+        if info == HbusObjDataType.dataTypeByteBool:
+            return HbusBoolCodec(size, extinfo)
+        if info in HbusByteCodec.FORMATS:
+            return HbusByteCodec(size, extinfo, info)
+    elif obj.objectDataType == HbusObjDataType.dataTypeUnsignedInt:
+        if info in _UINT_CODECS:
+            return _UINT_CODECS[info](size, extinfo)
+    elif obj.objectDataType == HbusObjDataType.dataTypeFixedPoint:
+        return HbusFixedPointCodec(size, extinfo, int(info))
+    elif obj.objectDataType == HbusObjDataType.dataTypeInt:
+        return HbusIntCodec(size, extinfo)
+
+    # has no explicit format
+    return HbusObjectCodec(size, extinfo)
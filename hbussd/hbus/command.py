@@ -4,6 +4,8 @@
 class HbusCommand:
     """HBUS commands."""
 
+    __slots__ = ("cmd_byte", "min_len", "max_len", "desc_str")
+
     def __init__(self, value, minimumSize, maximumSize, descStr):
         """Initialize.
 
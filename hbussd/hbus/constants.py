@@ -202,6 +202,12 @@ HBUS_COMMANDLIST = (
     HBUSCOMMAND_KEYRESET,
 )
 
+# Commands indexed by command byte, None for unknown bytes
+HBUS_COMMANDTABLE = tuple(
+    next((x for x in HBUS_COMMANDLIST if x.cmd_byte == b), None)
+    for b in range(256)
+)
+
 # List of all commands IDs
 HBUS_COMMANDBYTELIST = [x.cmd_byte for x in HBUS_COMMANDLIST]
 
@@ -248,6 +254,31 @@ class HbusRXState:
     STP = 8
 
 
+class HbusMasterState:
+    """Device enumeration on a bus."""
+
+    hbusMasterStarting = 0
+    hbusMasterIdle = 1
+    hbusMasterSearching = 2
+    hbusMasterAddressing = 3
+    hbusMasterScanning = 4
+    hbusMasterOperational = 5
+    hbusMasterChecking = 6
+    hbusMasterInterrupted = 7
+
+    # States from least to most advanced
+    PROGRESS = (
+        hbusMasterStarting,
+        hbusMasterIdle,
+        hbusMasterSearching,
+        hbusMasterAddressing,
+        hbusMasterScanning,
+        hbusMasterInterrupted,
+        hbusMasterChecking,
+        hbusMasterOperational,
+    )
+
+
 # @}
 
 # @defgroup statusIndicators Status and properties indicators
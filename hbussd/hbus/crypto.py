@@ -56,7 +56,35 @@ class hbusSignature:
         return myList
 
 
-def RabinWilliamsSign(msg, p, q, size):
+class RabinWilliamsKey:
+    """Rabin-Williams private key with precomputed signing constants.
+
+    The exponents and CRT coefficients only depend on the key, building
+    this once per key set saves three modular exponentiations per
+    signature."""
+
+    def __init__(self, p, q):
+
+        self.p = p
+        self.q = q
+        self.n = p * q
+
+        self.u_exp = (q + 1) // 8
+        self.v_exp = (p - 3) // 8
+
+        self.q1 = pow(2, (3 * q - 5) // 8, q)
+        self.p1 = pow(2, (9 * p - 11) // 8, p)
+        self.pq1 = pow(q, p - 2, p)
+
+
+def RabinWilliamsSign(msg, p, q, size, key=None):
+
+    if key is None:
+        key = RabinWilliamsKey(p, q)
+
+    p = key.p
+    q = key.q
+    n = key.n
 
     while True:
         z = "".join(
@@ -69,39 +97,34 @@ def RabinWilliamsSign(msg, p, q, size):
 
         # calcula
 
-        U = pow(h, (q + 1) // 8, q)
+        U = pow(h, key.u_exp, q)
 
-        if (U ** 4 - h) % q:
+        if (pow(U, 4, q) - h) % q:
             e = -1
         else:
             e = 1
 
-        V = pow(e * h, (p - 3) // 8, p)
+        V = pow(e * h, key.v_exp, p)
 
-        if (V ** 4) * ((e * h) ** 2) - e * h:
+        if (pow(V, 4, p) * e * h - 1) % p:
             f = 2
         else:
             f = 1
 
-        q1 = pow(2, (3 * q - 5) // 8, q)
-        p1 = pow(2, (9 * p - 11) // 8, p)
-
         if f == 2:
-            W = (q1 * U) % q
-            X = (p1 * (V ** 3) * e * h) % p
+            W = (key.q1 * U) % q
+            X = (key.p1 * pow(V, 3, p) * e * h) % p
         else:
             W = U % q
-            X = ((V ** 3) * e * h) % p
-
-        pq1 = pow(q, p - 2, p)
+            X = (pow(V, 3, p) * e * h) % p
 
-        Y = W + q * ((pq1 * (X - W)) % p)
+        Y = W + q * ((key.pq1 * (X - W)) % p)
 
-        y = pow(Y, 2, p * q)
+        y = pow(Y, 2, n)
 
-        s = min(y, p * q - y)
+        s = min(y, n - y)
 
-        if (e * f * (s ** 2)) % (p * q) != h:
+        if (e * f * (s ** 2)) % n != h:
             logger.debug("Authentication problem")
         else:
             break
@@ -17,6 +17,10 @@ class HBUSTimeoutException(HbusException):
     """Timeout exception."""
 
 
+class HBUSQueueFullException(HBUSTimeoutException):
+    """Command dropped because outgoing queue is full."""
+
+
 class HBUSRetryInformation:
     """Retry information."""
 
@@ -0,0 +1,282 @@
+"""Buffer oriented HBUS frame decoding.
+
+@package hbus_framing
+@author Bruno Morais <brunosmmm@gmail.com>
+"""
+
+import hbussd.hbus.constants as hbusconst
+
+# Index of the command byte in a frame
+HBUS_FRAME_CMD_INDEX = 4
+# Index of the parameter size byte in a frame
+HBUS_FRAME_PSZ_INDEX = 6
+# Frame terminator byte
+HBUS_FRAME_TERMINATOR = 0xFF
+# Parameter size fields above this value are clamped
+HBUS_FRAME_MAX_PSZ = 64
+
+
+def _cmd_table(commands):
+    """Build a 256 entry membership table for command bytes.
+
+    @param commands iterable of HbusCommand objects
+    @return bytes object indexed by command byte
+    """
+    table = bytearray(256)
+    for cmd in commands:
+        table[cmd.cmd_byte] = 1
+
+    return bytes(table)
+
+
+def _address_table():
+    """Build a 256 entry table of valid device numbers.
+
+    @return bytes object indexed by device number
+    """
+    table = bytearray(256)
+    for dev in range(0, 33):
+        table[dev] = 1
+    table[hbusconst.HBUS_BROADCAST_ADDRESS] = 1
+
+    return bytes(table)
+
+
+class HbusFrameError:
+    """Frame decoding errors."""
+
+    # Invalid device number in source or target address
+    INVALID_ADDRESS = "Invalid address in received packet"
+    # Frame not terminated by 0xFF
+    TERMINATION = "malformed packet, termination error"
+
+
+class HbusFrameDecoder:
+    """Split a received byte stream into complete HBUS frames.
+
+    Frame boundaries are calculated from the command and parameter size
+    fields, so whole chunks are processed at once instead of walking a
+    state machine byte by byte. The framing rules (and the handling of
+    malformed packets) are the same as the master's former RX state machine:
+    on an error the partial frame and the remainder of the chunk are
+    discarded and the decoder goes back to idle.
+    """
+
+    # Commands that are followed directly by the terminator
+    SHORT_COMMANDS = _cmd_table(
+        (
+            hbusconst.HBUSCOMMAND_ACK,
+            hbusconst.HBUSCOMMAND_SEARCH,
+            hbusconst.HBUSCOMMAND_BUSLOCK,
+            hbusconst.HBUSCOMMAND_BUSUNLOCK,
+            hbusconst.HBUSCOMMAND_SOFTRESET,
+        )
+    )
+    # Commands carrying an address byte but no parameter size
+    ADDRESS_COMMANDS = _cmd_table(
+        (
+            hbusconst.HBUSCOMMAND_GETCH,
+            hbusconst.HBUSCOMMAND_QUERY,
+            hbusconst.HBUSCOMMAND_QUERY_EP,
+            hbusconst.HBUSCOMMAND_QUERY_INT,
+        )
+    )
+    # Commands whose parameter size field does not announce parameters
+    STREAM_COMMANDS = _cmd_table(
+        (hbusconst.HBUSCOMMAND_STREAMW, hbusconst.HBUSCOMMAND_STREAMR)
+    )
+    # Commands with a parameter size but no address byte
+    NO_ADDRESS_COMMANDS = _cmd_table(())
+
+    VALID_ADDRESSES = _address_table()
+    # Parameter size fields above this value are clamped
+    MAX_PSZ = HBUS_FRAME_MAX_PSZ
+
+    def __init__(self):
+        """Initialize."""
+        # partial frame carried over between chunks
+        self._buffer = bytearray()
+        # contents of the last malformed packet, for debugging
+        self.error_dump = []
+
+    @property
+    def idle(self):
+        """Check if no partial frame is buffered."""
+        return not self._buffer
+
+    @property
+    def buffered(self):
+        """Get partial frame contents.
+
+        @return list of bytes received so far
+        """
+        return list(self._buffer)
+
+    @property
+    def state(self):
+        """Get equivalent RX state for the buffered partial frame.
+
+        @return HbusRXState value
+        """
+        size = len(self._buffer)
+        if size < HBUS_FRAME_CMD_INDEX + 1:
+            return size
+
+        cmd = self._buffer[HBUS_FRAME_CMD_INDEX]
+        if self.SHORT_COMMANDS[cmd]:
+            return hbusconst.HbusRXState.STP
+        if self.NO_ADDRESS_COMMANDS[cmd]:
+            if size == HBUS_FRAME_CMD_INDEX + 1:
+                return hbusconst.HbusRXState.PSZ
+            if self._buffer[HBUS_FRAME_CMD_INDEX + 1] == 0:
+                return hbusconst.HbusRXState.STP
+            return hbusconst.HbusRXState.PRM
+        if size == HBUS_FRAME_CMD_INDEX + 1:
+            return hbusconst.HbusRXState.ADDR
+        if self.ADDRESS_COMMANDS[cmd]:
+            return hbusconst.HbusRXState.STP
+        if size == HBUS_FRAME_PSZ_INDEX:
+            return hbusconst.HbusRXState.PSZ
+        if (
+            self.STREAM_COMMANDS[cmd]
+            or self._buffer[HBUS_FRAME_PSZ_INDEX] == 0
+        ):
+            return hbusconst.HbusRXState.STP
+
+        return hbusconst.HbusRXState.PRM
+
+    def reset(self):
+        """Discard partial frame."""
+        self._buffer.clear()
+
+    def _frame_size(self, buf, start):
+        """Calculate the size of a frame whose parameter size is known.
+
+        @param buf buffer holding the frame
+        @param start frame start offset
+        @return complete frame size including terminator
+        """
+        if self.STREAM_COMMANDS[buf[start + HBUS_FRAME_CMD_INDEX]]:
+            return HBUS_FRAME_PSZ_INDEX + 2
+
+        psz = buf[start + HBUS_FRAME_PSZ_INDEX]
+        if psz > HBUS_FRAME_MAX_PSZ:
+            psz = HBUS_FRAME_MAX_PSZ
+
+        return HBUS_FRAME_PSZ_INDEX + 2 + psz
+
+    def feed(self, data):
+        """Process a chunk of received data.
+
+        @param data received bytes
+        @return tuple with list of complete frames and error string or None
+        """
+        buf = self._buffer
+        buf += data
+        view = memoryview(buf)
+        frames = []
+        valid = self.VALID_ADDRESSES
+        max_psz = self.MAX_PSZ
+        size = len(buf)
+        pos = 0
+        error = None
+
+        try:
+            while pos < size:
+                avail = size - pos
+
+                # source and target device numbers
+                if avail > 1 and not valid[buf[pos + 1]]:
+                    error = HbusFrameError.INVALID_ADDRESS
+                    end = pos + 2
+                    break
+                if avail > 3 and not valid[buf[pos + 3]]:
+                    error = HbusFrameError.INVALID_ADDRESS
+                    end = pos + 4
+                    break
+                if avail <= HBUS_FRAME_CMD_INDEX:
+                    break
+
+                cmd = buf[pos + HBUS_FRAME_CMD_INDEX]
+                if self.SHORT_COMMANDS[cmd]:
+                    need = HBUS_FRAME_CMD_INDEX + 2
+                elif self.ADDRESS_COMMANDS[cmd]:
+                    need = HBUS_FRAME_CMD_INDEX + 3
+                elif avail <= HBUS_FRAME_PSZ_INDEX:
+                    break
+                else:
+                    need = self._frame_size(buf, pos)
+
+                if avail < need:
+                    break
+
+                end = pos + need
+                if buf[end - 1] != HBUS_FRAME_TERMINATOR:
+                    error = HbusFrameError.TERMINATION
+                    break
+
+                frame = bytes(view[pos:end])
+                if (
+                    need > HBUS_FRAME_CMD_INDEX + 3
+                    and frame[HBUS_FRAME_PSZ_INDEX] > max_psz
+                    and not self.STREAM_COMMANDS[cmd]
+                ):
+                    # store clamped parameter size, as received
+                    frame = (
+                        frame[:HBUS_FRAME_PSZ_INDEX]
+                        + bytes([max_psz])
+                        + frame[HBUS_FRAME_PSZ_INDEX + 1 :]
+                    )
+                frames.append(frame)
+                pos = end
+        finally:
+            view.release()
+
+        if error is not None:
+            # drop partial frame and whatever is left of this chunk
+            self.error_dump = list(buf[pos:end])
+            buf.clear()
+        else:
+            del buf[:pos]
+
+        return frames, error
+
+
+class HbusDeviceFrameDecoder(HbusFrameDecoder):
+    """Split the byte stream sent by the master into frames.
+
+    Frames sent by the master follow the rules devices apply: SOFTRESET
+    carries its parameter size right after the command byte, commands
+    taking a single parameter carry only an address byte, and parameter
+    sizes are not clamped, since signatures are longer than frames sent by
+    devices.
+    """
+
+    SHORT_COMMANDS = _cmd_table(
+        x for x in hbusconst.HBUS_COMMANDLIST if x.max_len == 0
+    )
+    ADDRESS_COMMANDS = _cmd_table(
+        x for x in hbusconst.HBUS_COMMANDLIST if x.max_len == 1
+    )
+    NO_ADDRESS_COMMANDS = _cmd_table((hbusconst.HBUSCOMMAND_SOFTRESET,))
+
+    # devices do not check addresses, frames to others are ignored later
+    VALID_ADDRESSES = b"\x01" * 256
+    MAX_PSZ = 0xFF
+
+    def _frame_size(self, buf, start):
+        """Calculate the size of a frame whose parameter size is known.
+
+        @param buf buffer holding the frame
+        @param start frame start offset
+        @return complete frame size including terminator
+        """
+        cmd = buf[start + HBUS_FRAME_CMD_INDEX]
+        if self.STREAM_COMMANDS[cmd]:
+            return HBUS_FRAME_PSZ_INDEX + 2
+
+        if self.NO_ADDRESS_COMMANDS[cmd]:
+            psz = buf[start + HBUS_FRAME_CMD_INDEX + 1]
+            return HBUS_FRAME_CMD_INDEX + 3 + psz
+
+        return HBUS_FRAME_PSZ_INDEX + 2 + buf[start + HBUS_FRAME_PSZ_INDEX]
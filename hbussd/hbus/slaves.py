@@ -1,10 +1,4 @@
 """Data structures and functions related to device data."""
-import struct
-from array import array
-from math import log
-
-from hbussd.hbus.datahandlers import HbusFixPHandler, HbusIntHandler
-from hbussd.hbus.constants import HBUS_UNITS
 
 
 class HbusObjLevel:
@@ -58,313 +52,6 @@ class HbusObjDataType:
     # Raw unsigned integer
     dataTypeUintNone = 0x00
 
-    @staticmethod
-    def unpack_uint(data):
-        """Unpack received data string.
-
-        @param data Data string received from device
-        @return value parsed as unsigned integer
-        """
-        x = [0]
-        while len(data) < 4:
-            x.extend(data)
-            data = x
-            x = [0]
-
-        byte_list = array("B", data)
-
-        return struct.unpack(">I", byte_list)[0]
-
-    @staticmethod
-    def format_byte_bool(data, extinfo, size, decode=False):
-        """Parse data as boolean.
-
-        @param data received data
-        @param extinfo dummy parameter
-        @param size dummy parameter
-        @param decode indicates if decoding or encoding data
-        @return formatted string
-        """
-        if decode:
-            if data == "ON":
-                return [1]
-
-            return [0]
-
-        if data[0] > 0:
-            return "ON"
-        else:
-            return "OFF"
-
-    @staticmethod
-    def format_byte_hex(data, extinfo, size, decode=False):
-        """Parse data as a hexadecimal number.
-
-        @param data received data
-        @param extinfo dummy parameter
-        @param size data size in bytes
-        @param decode indicates if decoding or encoding data
-        @return formatted string
-        """
-        if decode:
-            return [0 * x for x in range(0, size)]
-
-        return ", ".join(["%X" % x for x in data])
-
-    @staticmethod
-    def format_byte_dec(data, extinfo, size, decode=False):
-        """Parse data as a decimal number.
-
-        @param data received data
-        @param extinfo dummy parameter
-        @param size data size in bytes
-        @param decode indicates if decoding or encoding data
-        @return formatted string
-        """
-        if decode:
-            return [0 * x for x in range(0, size)]
-
-        return ", ".join(["%d" % x for x in data])
-
-    @staticmethod
-    def format_byte_oct(data, extinfo, size, decode=False):
-        """Parse data as an octal number.
-
-        @param data received data
-        @param extinfo dummy parameter
-        @param size data size in bytes
-        @param decode indicates if decoding or encoding data
-        @return formatted string
-        """
-        if decode:
-            return [0 * x for x in range(0, size)]
-
-        return ", ".join(["%o" % x for x in data])
-
-    @staticmethod
-    def format_byte_bin(data, extinfo, size, decode=False):
-        """Parse data as a binary number.
-
-        @param data received data
-        @param extinfo dummy parameter
-        @param size data size in bytes
-        @param decode indicates if decoding or encoding data
-        @return formatted string
-        """
-        if decode:
-            return [0 * x for x in range(0, size)]
-
-        return ", ".join(["0b{0:b}".format(x) for x in data])
-
-    @classmethod
-    def format_uint(cls, data, extinfo, size, decode=False):
-        """Parse data as raw unsigned integer.
-
-        Allows the use of units
-        @param data received data
-        @param extinfo extended object property list
-        @param size data size in bytes
-        @param decode indicates if decoding or encoding data
-        @return formatted string
-        """
-        if decode:
-            return [ord(x) for x in struct.pack(">I", data)[size:]]
-
-        value = str(cls.unpack_uint(data))
-
-        try:
-            unit = extinfo["UNIT"]
-            value = str(value) + " " + HBUS_UNITS[chr(unit[0])]
-        except Exception:
-            pass
-
-        return value
-
-    @staticmethod
-    def format_percent(data, extinfo, size, decode=False):
-        """Parse data as percent (0-100).
-
-        @param data received data
-        @param extinfo dummy parameter
-        @param size dummy parameter
-        @param decode indicates if decoding or encoding data
-        @return formatted string
-        """
-        if decode:
-
-            data = int(data)
-            if data > 100:
-                data = 100
-
-            output = []
-            for i in range(0, size):
-                output.append((data & (0xFF << i * 8)) >> i * 8)
-
-            return output
-
-        # basically ignore size because a percentual value is 0 < val < 100,
-        # which only needs one byte
-        if isinstance(data, list):
-            data = data[0]
-
-        return "{}%".format(data)
-
-    @classmethod
-    def format_lin_percent(cls, data, extinfo, size, decode=False):
-        """Parse data as a value in a linear scale.
-
-        @param data received data
-        @param extinfo extended object property list
-        @param size dummy parameter
-        @param decode indicates if decoding or encoding data
-        @return formatted string
-        """
-        try:
-            # Try to set the minimum value for the scale based on the presence
-            # of the hidden object MIN
-            min_val = cls.unpack_uint(extinfo["MIN"])
-        except Exception:
-            min_val = 0
-
-        if decode:
-
-            try:
-                # Same as the minimum value, extracts maximum value from hidden
-                # object MAX if present
-                max_val = cls.unpack_uint(extinfo["MAX"])
-            except Exception:
-                max_val = 2 ** (8 * size) - 1
-
-            # Normalizes value to a percent (0-100) scale
-            value = int((float(data) / 100.0) * (max_val - min_val) + min_val)
-
-            output = []
-            for i in range(0, size):
-                output.append((value & (0xFF << i * 8)) >> i * 8)
-
-            return value
-
-        if data is None:
-            return "?"
-
-        # This is encoding, retrieve information and calculate
-        try:
-            max_val = cls.unpack_uint(extinfo["MAX"])
-        except Exception:
-            max_val = 2 ** (8 * len(data)) - 1
-
-        value = cls.unpack_uint(data)
-
-        # Maps a percentual value to the object native linear scale
-        return "%.2f%%" % (
-            (float(value - min_val) / float(max_val - min_val)) * 100
-        )
-
-    @classmethod
-    def format_log_percent(cls, data, extinfo, size, decode=False):
-        """Parse data as a value in a logarithmic scale.
-
-        @param data received data
-        @param extinfo extended object property list
-        @param size dummy parameter
-        @param decode indicates if decoding or encoding data
-        @return formatted string
-        """
-        # Similar to the linear scale processing
-        try:
-            min_val = cls.unpack_uint(extinfo["MIN"])
-        except Exception:
-            min_val = 0
-
-        if decode:
-
-            try:
-                max_val = cls.unpack_uint(extinfo["MAX"])
-            except Exception:
-                max_val = 2 ** (8 * size) - 1
-
-            # Maps log scale value to a percent (0-100) scale
-            value = int(
-                10 ** ((float(data) / 100.0) * log(max_val - min_val))
-                + min_val
-            )
-
-            output = []
-            for i in range(0, size):
-                output.append((value & (0xFF << i * 8)) >> i * 8)
-
-            return output
-
-        if data is None:
-            return "?"
-
-        # This is the encoding portion
-        try:
-            max_val = cls.unpack_uint(extinfo["MAX"])
-        except Exception:
-            max_val = 2 ** (8 * len(data)) - 1
-
-        value = cls.unpack_uint(data)
-
-        # Maps value to object native scale
-        try:
-            percent = (
-                log(float(value - min_val)) / log(float(max_val - min_val))
-            ) * 100
-        except Exception:
-            percent = 0
-
-        return "%.2f%%" % percent
-
-    @staticmethod
-    def format_time(data, extinfo, size, decode=False):
-        """Parse data as time format.
-
-        @param data received data
-        @param extinfo dummy parameter
-        @param size dummy parameter
-        @param decode indicates if encoding or decoding data
-        @return formatted string
-        """
-        if decode:
-            return [0 * x for x in range(0, size)]
-
-        tenth_sec = (data[3] & 0xF0) >> 4
-        milli_sec = data[3] & 0x0F
-
-        seconds = data[2] & 0x0F
-        tens_sec = data[2] & 0xF0
-
-        minutes = data[1] & 0x0F
-        tens = (data[1] & 0xF0) >> 4
-
-        hours24 = data[0] & 0x0F
-
-        return "%2d:%2d:%2d,%2d" % (
-            hours24,
-            minutes + tens * 10,
-            seconds + tens_sec * 10,
-            milli_sec + tenth_sec * 10,
-        )
-
-        # TODO: missing encode portion
-
-    @staticmethod
-    def format_date(data, extinfo, size, decode=False):
-        """Parse data as date format.
-
-        @param data received data
-        @param extinfo dummy parameter
-        @param size dummy parameter
-        @param decode indicates if encoding or decoding data
-        @return formatted string
-        """
-        # TODO: implement this parser
-        if decode:
-            return [0 * x for x in range(0, size)]
-
-        return "?"
-
 
 # Data type and display string association dictionary
 HBUS_DTYPE_NAMES = {
@@ -374,27 +61,6 @@ HBUS_DTYPE_NAMES = {
     HbusObjDataType.dataTypeFixedPoint: "Fixed point",
 }
 
-# Extended data types decoding dictionary
-HBUS_DTYPE_OPTIONS = {
-    HbusObjDataType.type_byte: {
-        HbusObjDataType.dataTypeByteHex: HbusObjDataType.format_byte_hex,
-        HbusObjDataType.dataTypeByteDec: HbusObjDataType.format_byte_dec,
-        HbusObjDataType.dataTypeByteOct: HbusObjDataType.format_byte_oct,
-        HbusObjDataType.dataTypeByteBin: HbusObjDataType.format_byte_bin,
-        HbusObjDataType.dataTypeByteBool: HbusObjDataType.format_byte_bool,
-    },
-    HbusObjDataType.dataTypeUnsignedInt: {
-        HbusObjDataType.dataTypeUintNone: HbusObjDataType.format_uint,
-        HbusObjDataType.dataTypeUintPercent: HbusObjDataType.format_percent,
-        HbusObjDataType.dataTypeUintLinPercent: HbusObjDataType.format_lin_percent,
-        HbusObjDataType.dataTypeUintLogPercent: HbusObjDataType.format_log_percent,
-        HbusObjDataType.dataTypeUintTime: HbusObjDataType.format_time,
-        HbusObjDataType.dataTypeUintDate: HbusObjDataType.format_date,
-    },
-    HbusObjDataType.dataTypeFixedPoint: HbusFixPHandler(),
-    HbusObjDataType.dataTypeInt: HbusIntHandler(),
-}
-
 
 class HbusDeviceObjExtInfo:
     """Device object extended information."""
@@ -425,6 +91,15 @@ class HbusDeviceObject:
     size = 0
     # Object's last known value
     last_value = None
+    # Time at which last value was received, reactor time in seconds
+    last_update = None
+    # Maximum age of last value for it to be used instead of reading the
+    # device, in ms, master default if None
+    max_age = None
+    # Time at which last write was sent, reactor time in seconds
+    last_write = None
+    # Minimum time between writes, in ms, master default if None
+    min_write_interval = None
 
     # Object data type
     objectDataType = 0
@@ -435,6 +110,18 @@ class HbusDeviceObject:
     # Object extended information
     objectExtendedInfo = None
 
+    # Compiled value codec, built from data type and extended information
+    codec = None
+
+    # Builds value codec, must be called again when data type or extended
+    # information change
+    # @return codec object
+    def compile_codec(self):
+        from hbussd.hbus.codecs import build_codec
+
+        self.codec = build_codec(self)
+        return self.codec
+
     # Gets a formatted output for object's value
     # @return formatted string for display
     def getFormattedValue(self):
@@ -442,26 +129,11 @@ class HbusDeviceObject:
         if self.last_value is None:
             return None
 
-        if self.objectDataType not in list(HBUS_DTYPE_OPTIONS.keys()):
-
-            return str(self.last_value)  # has no explicit format
-
-        # analyzes extended information
-        if type(HBUS_DTYPE_OPTIONS[self.objectDataType]) == dict:
+        codec = self.codec
+        if codec is None:
+            codec = self.compile_codec()
 
-            if self.objectDataTypeInfo not in list(
-                HBUS_DTYPE_OPTIONS[self.objectDataType].keys()
-            ):
-
-                return str(self.last_value)  # has no explicit format
-
-        return HBUS_DTYPE_OPTIONS[self.objectDataType][
-            self.objectDataTypeInfo
-        ](
-            data=self.last_value,
-            size=self.size,
-            extinfo=self.objectExtendedInfo,
-        )
+        return codec.decode(self.last_value)
 
     # Object string representation
     # @return descriptive string for logging
@@ -550,6 +222,16 @@ class HbusDevice:
     # Total ping failures that resulted in device eviction from bus
     pingFailures = 0
 
+    # Ping round trip time statistics, in ms
+    # Last measured round trip time
+    pingRTT = None
+    # Smoothed round trip time
+    pingRTTAverage = None
+    # Round trip time variation
+    pingRTTVariance = None
+    # Answered ping count
+    pingCount = 0
+
     # String representation for serialization
     # @return internal data in a string dictionary
     def __repr__(self):
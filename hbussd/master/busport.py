@@ -0,0 +1,217 @@
+"""Bus attached to the master."""
+
+import logging
+
+from hbussd.hbus.base import HbusDeviceAddress, pack_many
+from hbussd.hbus.constants import HbusBusState, HbusMasterState, HbusRXState
+from hbussd.hbus.framing import HbusFrameDecoder
+from hbussd.master.commandqueue import HbusCommandQueue
+from twisted.internet import reactor
+
+
+class HbusBusPort:
+    """Connection to one bus and its framing, queueing and addressing state.
+
+    Each bus has its own receive decoder and watchdog, outgoing command
+    queue released at the end of its frames, lock state and enumeration
+    progress, so busses are reset, searched and scanned in parallel.
+    Devices and the API are shared by the master.
+
+    Frames sent while received data is processed are packed together and
+    written at once when processing ends.
+    """
+
+    def __init__(
+        self,
+        bus,
+        parse_frame,
+        frame_error,
+        write,
+        serial_port=None,
+        baudrate=100000,
+        fake=False,
+        rx_timeout=200,
+        clock=reactor,
+    ):
+        """Initialize.
+
+        @param bus bus number
+        @param parse_frame callable handling a complete frame, called with
+        the frame and this port
+        @param frame_error callable counting a discarded frame, called with
+        the error name
+        @param write callable writing packed frames, called with the data
+        and this port
+        @param serial_port serial port device path
+        @param baudrate serial port baud rate
+        @param fake bus is a fake bus
+        @param rx_timeout inter-byte receive timeout in ms
+        @param clock IReactorTime provider, the reactor by default
+        """
+        self.bus = bus
+        # master address on this bus
+        self.address = HbusDeviceAddress(bus, 0)
+        self.serial_port = serial_port
+        self.baudrate = baudrate
+        self.fake = fake
+        self.rx_timeout = rx_timeout
+        self._parse_frame = parse_frame
+        self._frame_error = frame_error
+        self._write = write
+        self.clock = clock
+        self.logger = logging.getLogger("hbussd.busport")
+
+        # connection object, set when the port is created
+        self.serial = None
+        self.connected = False
+        # device reset being signed
+        self.resetting = False
+
+        self.rxDecoder = HbusFrameDecoder()
+        self.hbusRxState = HbusRXState.SBID
+        self.RXTimeout = None
+        self.rxLastData = 0
+        # commands waiting for the end of a frame being received
+        self.outgoingCommands = HbusCommandQueue(clock)
+        # frames waiting to be written and buffer they are packed into
+        self.txReady = []
+        self.txBuffer = bytearray()
+        # received data being processed, writes are held
+        self._receiving = False
+
+        self.hbusBusState = HbusBusState.FREE
+        self.hbusBusLockedWith = None
+
+        # enumeration state, HbusMasterState value
+        self.state = HbusMasterState.hbusMasterStarting
+        # clock time at which device scanning started
+        self.scanStarted = None
+
+        # addressing state
+        self.registeredSlaveCount = 0
+        self.nextSlaveCapabilities = None
+        self.nextSlaveUID = None
+
+        self.rxBytes = 0
+        self.txBytes = 0
+
+    def __repr__(self):
+        """Get representation."""
+        return "<bus {}>".format(self.bus)
+
+    @property
+    def busy(self):
+        """Check if a frame is being received."""
+        return self.hbusRxState != HbusRXState.SBID
+
+    def new_data(self, data):
+        """Process received data.
+
+        @param data received bytes
+        """
+        self.rxBytes += len(data)
+        self.rxLastData = self.clock.seconds()
+
+        frames, error = self.rxDecoder.feed(data)
+
+        self._receiving = True
+        try:
+            for frame in frames:
+                self.frame_end()
+                self._parse_frame(frame, self)
+        finally:
+            self._receiving = False
+            self.flush()
+
+        if error is not None:
+            self._frame_error(error)
+            self.logger.debug(error)
+            self.logger.debug(
+                "packet dump: %s", [hex(x) for x in self.rxDecoder.error_dump]
+            )
+            self.enter_idle()
+            return
+
+        if self.rxDecoder.idle is False:
+            self.hbusRxState = self.rxDecoder.state
+            # a single watchdog covers the whole frame
+            if self.RXTimeout is None:
+                self.RXTimeout = self.clock.callLater(
+                    self.rx_timeout / 1000, self._rx_watchdog
+                )
+
+    def send(self, operation):
+        """Write frame, held while received data is processed.
+
+        @param operation HbusOperation object
+        """
+        self.txReady.append(operation)
+
+        if self._receiving is False:
+            self.flush()
+
+    def flush(self):
+        """Write frames waiting to be sent."""
+        if len(self.txReady) == 0:
+            return
+
+        data = pack_many(self.txReady, self.txBuffer)
+        del self.txReady[:]
+
+        self.txBytes += len(data)
+        self._write(data, self)
+
+    def enter_idle(self):
+        """Discard partial frame and release the bus."""
+        self.rxDecoder.reset()
+
+        self.frame_end()
+
+    def frame_end(self):
+        """Release the bus after a frame was received or discarded."""
+        self.hbusRxState = HbusRXState.SBID
+
+        if len(self.outgoingCommands) > 0:
+            d = self.outgoingCommands.pop()
+            d.callback(None)
+
+    def _rx_watchdog(self):
+        """Check inter-byte receive deadline."""
+        self.RXTimeout = None
+
+        if self.rxDecoder.idle:
+            return
+
+        remaining = (
+            self.rxLastData
+            + self.rx_timeout / 1000
+            - self.clock.seconds()
+        )
+        if remaining > 0:
+            # data arrived since the watchdog was armed
+            self.RXTimeout = self.clock.callLater(remaining, self._rx_watchdog)
+            return
+
+        self._serial_timeout()
+
+    def _serial_timeout(self):
+        """Flag timeout in communication."""
+        self.logger.warning("Packet receive timeout on bus %d", self.bus)
+        self._frame_error("rx_timeout")
+        self.logger.debug("packet dump: %s", self.rxDecoder.buffered)
+
+        self.enter_idle()
+
+    def get_statistics(self):
+        """Get bus statistics.
+
+        @return dictionary with byte counts, queued commands and queue
+        statistics by class
+        """
+        return {
+            "connected": self.connected,
+            "rx_bytes": self.rxBytes,
+            "tx_bytes": self.txBytes,
+            "outgoing": len(self.outgoingCommands),
+            "command_queue": self.outgoingCommands.get_statistics(),
+        }
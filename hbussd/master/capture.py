@@ -0,0 +1,107 @@
+"""Bus traffic capture.
+
+A capture file starts with CAPTURE_MAGIC, followed by one record per
+chunk of data received or written by the master: a header with the
+direction, the bus number, the time elapsed since the previous record in
+microseconds and the data length, then the data itself. Files of the
+first format version have no bus number, all of their traffic is on bus 0.
+"""
+
+import struct
+import time
+
+# Capture file signature and format version
+CAPTURE_MAGIC = b"HBCAP\x02"
+# Signature of first version files
+_CAPTURE_MAGIC_V1 = b"HBCAP\x01"
+# Data received by the master
+CAPTURE_RX = 0
+# Data written by the master
+CAPTURE_TX = 1
+
+# direction, bus, time since previous record in us, data length
+_RECORD = struct.Struct("<BBIH")
+# direction, time since previous record in us, data length
+_RECORD_V1 = struct.Struct("<BIH")
+_MAX_DELTA = 0xFFFFFFFF
+_MAX_LENGTH = 0xFFFF
+
+
+class HbusCaptureWriter:
+    """Record bus traffic to a capture file."""
+
+    def __init__(self, path, clock=time.monotonic):
+        """Initialize.
+
+        @param path capture file path, overwritten
+        @param clock function returning current time in seconds
+        """
+        self._clock = clock
+        self._file = open(path, "wb")
+        self._file.write(CAPTURE_MAGIC)
+        self._last = None
+
+    def record(self, direction, data, bus=0):
+        """Add record.
+
+        @param direction CAPTURE_RX or CAPTURE_TX
+        @param data bytes received or written
+        @param bus bus number
+        """
+        if self._file is None:
+            return
+
+        now = self._clock()
+        if self._last is None:
+            delta = 0
+        else:
+            delta = min(int((now - self._last) * 1000000), _MAX_DELTA)
+        self._last = now
+
+        for start in range(0, len(data), _MAX_LENGTH):
+            chunk = data[start : start + _MAX_LENGTH]
+            self._file.write(_RECORD.pack(direction, bus, delta, len(chunk)))
+            self._file.write(chunk)
+            delta = 0
+
+    def close(self):
+        """Flush and close capture file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_capture(path):
+    """Read capture file.
+
+    @param path capture file path
+    @return list of (time since first record in seconds, bus, direction,
+    data) tuples
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if data.startswith(CAPTURE_MAGIC):
+        record = _RECORD
+    elif data.startswith(_CAPTURE_MAGIC_V1):
+        record = _RECORD_V1
+    else:
+        raise ValueError("not a capture file: {}".format(path))
+
+    records = []
+    offset = len(CAPTURE_MAGIC)
+    now = 0
+    while offset + record.size <= len(data):
+        if record is _RECORD:
+            direction, bus, delta, length = record.unpack_from(data, offset)
+        else:
+            bus = 0
+            direction, delta, length = record.unpack_from(data, offset)
+        offset += record.size
+        now += delta
+        records.append(
+            (now / 1000000, bus, direction, data[offset : offset + length])
+        )
+        offset += length
+
+    return records
@@ -0,0 +1,163 @@
+"""Outgoing command scheduling."""
+
+from collections import OrderedDict, deque
+
+from twisted.internet import reactor
+
+
+class HbusCommandPriority:
+    """Outgoing command priority classes, lower values are sent first."""
+
+    # Writes requested by users
+    WRITE = 0
+    # Reads requested by users
+    READ = 1
+    # Background object polling
+    POLL = 2
+    # Liveness checks
+    PING = 3
+    # Device detection and enumeration
+    ENUMERATION = 4
+
+    # Class names for statistics
+    NAMES = {
+        WRITE: "write",
+        READ: "read",
+        POLL: "poll",
+        PING: "ping",
+        ENUMERATION: "enumeration",
+    }
+
+
+class HbusCommandQueue:
+    """Commands waiting for the bus.
+
+    Commands are released by priority class. Within a class, devices take
+    turns so that a long run of commands to one device does not delay the
+    others. Each class can have a depth limit and keeps queueing delay
+    statistics.
+    """
+
+    # Default maximum number of queued commands per class, None for no limit
+    DEFAULT_LIMIT = None
+
+    # Delay average gain
+    DELAY_ALPHA = 0.125
+
+    def __init__(self, clock=reactor):
+        """Initialize.
+
+        @param clock IReactorTime provider, the reactor by default
+        """
+        self.clock = clock
+        # priority -> maximum queued commands, None for no limit
+        self.limits = {
+            x: self.DEFAULT_LIMIT for x in HbusCommandPriority.NAMES
+        }
+
+        # priority -> OrderedDict of device id -> deque of (item, time)
+        # devices are moved to the end after their turn
+        self._queues = {x: OrderedDict() for x in HbusCommandPriority.NAMES}
+        self._depth = {x: 0 for x in HbusCommandPriority.NAMES}
+
+        # priority -> statistics
+        self._stats = {
+            x: {
+                "queued": 0,
+                "dropped": 0,
+                "max_depth": 0,
+                "delay": None,
+                "delay_average": None,
+                "delay_max": 0,
+            }
+            for x in HbusCommandPriority.NAMES
+        }
+
+    def __len__(self):
+        """Get number of queued commands."""
+        return sum(self._depth.values())
+
+    def push(self, item, device, priority, force=False):
+        """Queue command.
+
+        @param item object released by pop
+        @param device destination device address
+        @param priority HbusCommandPriority class
+        @param force queue even if the class queue is full
+        @return False if the class queue is full and item was not queued
+        """
+        stats = self._stats[priority]
+        limit = self.limits.get(priority)
+        if (
+            force is False
+            and limit is not None
+            and self._depth[priority] >= limit
+        ):
+            stats["dropped"] += 1
+            return False
+
+        queues = self._queues[priority]
+        queue = queues.get(device.global_id)
+        if queue is None:
+            queue = queues[device.global_id] = deque()
+
+        queue.append((item, self.clock.seconds()))
+
+        self._depth[priority] += 1
+        stats["queued"] += 1
+        stats["max_depth"] = max(stats["max_depth"], self._depth[priority])
+
+        return True
+
+    def pop(self):
+        """Get next command to be sent.
+
+        @return queued item
+        """
+        for priority, queues in self._queues.items():
+            if len(queues) == 0:
+                continue
+
+            device, queue = next(iter(queues.items()))
+            item, queued = queue.popleft()
+            if queue:
+                # give other devices a turn
+                queues.move_to_end(device)
+            else:
+                del queues[device]
+
+            self._depth[priority] -= 1
+            now = self.clock.seconds()
+            self._update_delay(priority, (now - queued) * 1000)
+
+            return item
+
+        raise IndexError("pop from empty command queue")
+
+    def _update_delay(self, priority, delay):
+        """Update queueing delay statistics.
+
+        @param priority HbusCommandPriority class
+        @param delay time spent in queue in ms
+        """
+        stats = self._stats[priority]
+        stats["delay"] = delay
+        stats["delay_max"] = max(stats["delay_max"], delay)
+        if stats["delay_average"] is None:
+            stats["delay_average"] = delay
+        else:
+            stats["delay_average"] += self.DELAY_ALPHA * (
+                delay - stats["delay_average"]
+            )
+
+    def get_statistics(self):
+        """Get queue statistics.
+
+        @return dictionary of statistics by class name, delays in ms
+        """
+        ret = {}
+        for priority, name in HbusCommandPriority.NAMES.items():
+            ret[name] = dict(self._stats[priority])
+            ret[name]["depth"] = self._depth[priority]
+
+        return ret
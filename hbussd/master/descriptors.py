@@ -0,0 +1,207 @@
+"""Persistent device descriptor cache."""
+
+import json
+import logging
+import os
+
+from hbussd.hbus.slaves import HbusDeviceObject, HbusEndpoint, HbusInterrupt
+
+# Cache file format version, bump when layout changes
+HBUS_DESCRIPTOR_CACHE_VERSION = 1
+
+# Device object attributes kept in cache
+OBJECT_FIELDS = (
+    "permissions",
+    "is_crypto",
+    "hidden",
+    "description",
+    "size",
+    "objectDataType",
+    "objectDataTypeInfo",
+    "objectLevel",
+)
+# Device endpoint attributes kept in cache
+ENDPOINT_FIELDS = (
+    "endpointDirection",
+    "endpointBlockSize",
+    "endpointDescription",
+)
+# Device interrupt attributes kept in cache
+INTERRUPT_FIELDS = ("interruptFlags", "interruptDescription")
+
+
+def _dump(items, fields):
+    """Convert descriptor dictionary to a serializable form."""
+    return {
+        str(number): {field: getattr(item, field) for field in fields}
+        for number, item in items.items()
+    }
+
+
+def _load(items, cls):
+    """Build descriptor dictionary from its serialized form."""
+    ret = {}
+    for number, fields in items.items():
+        item = cls()
+        for field, value in fields.items():
+            setattr(item, field, value)
+        ret[int(number)] = item
+
+    return ret
+
+
+class HbusDescriptorCache:
+    """Object, endpoint and interrupt descriptors of known devices.
+
+    Entries are keyed by device UID and are only used when the object,
+    endpoint and interrupt counts reported by the device match the cached
+    ones, otherwise they are dropped and the device is scanned again.
+    """
+
+    def __init__(self, path):
+        """Initialize.
+
+        @param path cache file path
+        """
+        self.path = path
+        self.logger = logging.getLogger("hbussd.devcache")
+
+        # uid -> cached descriptors
+        self._entries = {}
+        # flags unsaved changes
+        self._dirty = False
+
+        self.load()
+
+    @staticmethod
+    def _key(uid):
+        return "{:08x}".format(uid)
+
+    def __len__(self):
+        """Get number of cached devices."""
+        return len(self._entries)
+
+    def load(self):
+        """Load cache contents from disk."""
+        self._entries = {}
+        self._dirty = False
+
+        try:
+            with open(self.path) as f:
+                contents = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            self.logger.warning(
+                "could not read descriptor cache %s, ignoring", self.path
+            )
+            return
+
+        if contents.get("version") != HBUS_DESCRIPTOR_CACHE_VERSION:
+            self.logger.info("descriptor cache format changed, discarding")
+            return
+
+        self._entries = contents.get("devices", {})
+        self.logger.debug(
+            "loaded %d device descriptors from %s", len(self), self.path
+        )
+
+    def save(self):
+        """Write cache contents to disk if modified."""
+        if self._dirty is False:
+            return
+
+        contents = {
+            "version": HBUS_DESCRIPTOR_CACHE_VERSION,
+            "devices": self._entries,
+        }
+
+        tmp = self.path + ".tmp"
+        try:
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(contents, f)
+            # never leave a truncated cache behind
+            os.replace(tmp, self.path)
+        except OSError as ex:
+            self.logger.warning("could not write descriptor cache: %s", ex)
+            return
+
+        self._dirty = False
+
+    def store(self, slave):
+        """Store descriptors of a completely scanned device.
+
+        @param slave HbusDevice object, before hidden objects are sorted out
+        """
+        entry = {
+            "description": slave.hbusSlaveDescription,
+            "object_count": slave.hbusSlaveObjectCount,
+            "endpoint_count": slave.hbusSlaveEndpointCount,
+            "interrupt_count": slave.hbusSlaveInterruptCount,
+            "capabilities": slave.hbusSlaveCapabilities,
+            "objects": _dump(slave.hbusSlaveObjects, OBJECT_FIELDS),
+            "endpoints": _dump(slave.hbusSlaveEndpoints, ENDPOINT_FIELDS),
+            "interrupts": _dump(slave.hbusSlaveInterrupts, INTERRUPT_FIELDS),
+        }
+
+        key = self._key(slave.hbusSlaveUniqueDeviceInfo)
+        if self._entries.get(key) != entry:
+            self._entries[key] = entry
+            self._dirty = True
+
+    def restore(self, slave):
+        """Fill in descriptors of a device from cache.
+
+        Device UID and counts must already be known.
+        @param slave HbusDevice object
+        @return True if descriptors were restored
+        """
+        key = self._key(slave.hbusSlaveUniqueDeviceInfo)
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+
+        if (
+            entry["object_count"] != slave.hbusSlaveObjectCount
+            or entry["endpoint_count"] != slave.hbusSlaveEndpointCount
+            or entry["interrupt_count"] != slave.hbusSlaveInterruptCount
+            or entry["capabilities"] != slave.hbusSlaveCapabilities
+        ):
+            self.logger.debug("cached descriptors of <%s> are stale", key)
+            self.invalidate(slave.hbusSlaveUniqueDeviceInfo)
+            return False
+
+        try:
+            objects = _load(entry["objects"], HbusDeviceObject)
+            endpoints = _load(entry["endpoints"], HbusEndpoint)
+            interrupts = _load(entry["interrupts"], HbusInterrupt)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            self.logger.warning("corrupted descriptor cache entry <%s>", key)
+            self.invalidate(slave.hbusSlaveUniqueDeviceInfo)
+            return False
+
+        slave.hbusSlaveObjects = objects
+        slave.hbusSlaveEndpoints = endpoints
+        slave.hbusSlaveInterrupts = interrupts
+
+        return True
+
+    def invalidate(self, uid=None):
+        """Drop cached descriptors.
+
+        @param uid device UID, drops all devices if None
+        @return number of entries dropped
+        """
+        if uid is None:
+            count = len(self._entries)
+            self._entries = {}
+        else:
+            count = 1 if self._entries.pop(self._key(uid), None) else 0
+
+        if count > 0:
+            self._dirty = True
+
+        return count
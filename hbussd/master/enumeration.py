@@ -0,0 +1,211 @@
+"""Device enumeration scheduling."""
+
+from collections import OrderedDict, deque
+
+from hbussd.hbus.exceptions import HBUSTimeoutException
+from hbussd.master.commandqueue import HbusCommandPriority
+from twisted.internet import defer, reactor
+
+
+class HbusScanScheduler:
+    """Interleave descriptor queries of devices being enumerated.
+
+    Queries to a single device are issued in sequence, the next one going
+    out as soon as the previous one is answered or times out. Queries to
+    different devices are interleaved in round robin order, with a limit on
+    how many may be awaiting an answer at the same time on each bus, so
+    that busses are scanned independently. A device is done
+    when it has nothing queued or in flight after one of its queries
+    finished, and a scan ends when all of its devices are done, whatever
+    other scans are in progress.
+    """
+
+    def __init__(
+        self, push_command, start_device, max_outstanding=1, clock=reactor
+    ):
+        """Initialize.
+
+        @param push_command callable used to send commands
+        @param start_device callable that queues a device's first query
+        @param max_outstanding maximum number of unanswered queries per bus
+        @param clock IReactorTime provider, the reactor by default
+        """
+        self.clock = clock
+        self._push_command = push_command
+        self._start_device = start_device
+        self.max_outstanding = max_outstanding
+
+        # address -> deque of queued queries, in round robin order
+        self._queued = OrderedDict()
+        # devices with a query awaiting an answer
+        self._busy = set()
+        # bus number -> number of queries awaiting an answer
+        self._outstanding = {}
+        # devices being scanned
+        self._scanning = set()
+        # (devices not done yet, Deferred) of scans in progress
+        self._waiting = []
+
+        # scan start time
+        self.started = None
+        # duration of the last complete scan in seconds
+        self.elapsed = None
+
+    @property
+    def active(self):
+        """Check if a scan is in progress."""
+        return len(self._scanning) > 0
+
+    def scan(self, addresses):
+        """Scan devices.
+
+        Devices already being scanned are not scanned again.
+        @param addresses list of device addresses
+        @return Deferred fired when these devices have been scanned
+        """
+        d = defer.Deferred()
+
+        if self.active is False:
+            self.started = self.clock.seconds()
+
+        for address in addresses:
+            if address in self._scanning:
+                continue
+            self._scanning.add(address)
+            self._start_device(address)
+
+        pending = self._scanning.intersection(addresses)
+        if len(pending) > 0:
+            self._waiting.append((pending, d))
+        else:
+            # nothing to scan
+            if self.active is False:
+                self.elapsed = 0
+            d.callback(None)
+
+        return d
+
+    def request(
+        self,
+        command,
+        address,
+        params=(),
+        callBack=None,
+        callBackParams=None,
+        timeoutCallBack=None,
+    ):
+        """Queue a query to a device being scanned.
+
+        The callback is called as in HbusMaster._push_command, timeout
+        callbacks are called with the failure and the device address.
+        """
+        try:
+            self._queued[address].append(
+                (command, params, callBack, callBackParams, timeoutCallBack)
+            )
+        except KeyError:
+            self._queued[address] = deque(
+                [(command, params, callBack, callBackParams, timeoutCallBack)]
+            )
+
+        self._pump()
+
+    def _pump(self):
+        """Issue queued queries while below the outstanding limit."""
+        while True:
+            for address, queue in self._queued.items():
+                if (
+                    address not in self._busy
+                    and self._outstanding.get(address.bus_number, 0)
+                    < self.max_outstanding
+                ):
+                    break
+            else:
+                return
+
+            (
+                command,
+                params,
+                callBack,
+                callBackParams,
+                timeoutCallBack,
+            ) = queue.popleft()
+            if queue:
+                # give other devices a turn
+                self._queued.move_to_end(address)
+            else:
+                del self._queued[address]
+
+            self._busy.add(address)
+            self._outstanding[address.bus_number] = (
+                self._outstanding.get(address.bus_number, 0) + 1
+            )
+            self._push_command(
+                command,
+                address,
+                params=params,
+                callBack=self._response,
+                callBackParams=(address, callBack, callBackParams),
+                timeoutCallBack=self._timeout,
+                timeoutCallBackParams=(address, timeoutCallBack),
+                priority=HbusCommandPriority.ENUMERATION,
+            )
+
+    def _response(self, data):
+        """Handle answer to a query."""
+        (address, callBack, callBackParams), params = data
+        self._release(address)
+
+        try:
+            if callBack is not None:
+                callBack((callBackParams, params))
+        finally:
+            self._query_end(address)
+
+    def _timeout(self, failure):
+        """Handle query timeout."""
+        if failure.check(HBUSTimeoutException) is None:
+            return failure
+
+        address, timeoutCallBack = failure.value.args[0]
+        self._release(address)
+
+        try:
+            if timeoutCallBack is not None:
+                timeoutCallBack(failure, address)
+        finally:
+            self._query_end(address)
+
+    def _release(self, address):
+        """Free outstanding query slot of a device."""
+        if address in self._busy:
+            self._busy.discard(address)
+            self._outstanding[address.bus_number] -= 1
+
+    def _query_end(self, address):
+        """Issue next queries and detect devices that are done."""
+        done = address not in self._queued and address not in self._busy
+        if done:
+            self._scanning.discard(address)
+
+        self._pump()
+
+        if done:
+            if self.active is False:
+                self.elapsed = self.clock.seconds() - self.started
+            self._finish(address)
+
+    def _finish(self, address):
+        """Fire deferreds of scans ended by a device being done."""
+        ended = []
+        for pending, d in self._waiting:
+            pending.discard(address)
+            if len(pending) == 0:
+                ended.append(d)
+
+        if len(ended) == 0:
+            return
+
+        self._waiting = [x for x in self._waiting if len(x[0]) > 0]
+        for d in ended:
+            d.callback(None)
@@ -5,6 +5,8 @@
 from txjsonrpc.web import jsonrpc
 from hbussd.master.serializers import HbusSlaveSerializer, HbusObjectSerializer
 from hbussd.hbus.base import hbus_address_from_string
+from hbussd.hbus.constants import HbusObjectPermissions
+from hbussd.hbus.exceptions import HBUSTimeoutException
 from hbussd.master.master import HbusMasterState
 import logging
 
@@ -34,6 +36,35 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
 
         return state
 
+    # Finds an object from request parameters
+    # @param address device address string
+    # @param number object number
+    # @return tuple with address, object and error data to be JSON
+    # structured, which is None if the object was found
+    def _find_object(self, address, number):
+        try:
+            addr = hbus_address_from_string(address)
+        except ValueError:
+            return (
+                None,
+                None,
+                {"status": "error", "error": "malformed address"},
+            )
+
+        slave = self.master.registry.get(addr)
+
+        if slave is None:
+
+            # device does not exist
+            return None, None, {"status": "error", "error": "invalid_device"}
+
+        if int(number) not in slave.hbusSlaveObjects:
+
+            # object does not exist
+            return None, None, {"status": "error", "error": "invalid_object"}
+
+        return addr, slave.hbusSlaveObjects[int(number)], None
+
     # Gets a list of the busses currently active
     # @return data to be JSON structured
     def jsonrpc_activebusses(self):
@@ -41,7 +72,7 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
             return {"status": "error", "error": "not_available"}
         return {
             "status": "ok",
-            "list": self.master.getInformationData().activeBusses,
+            "list": self.master.get_information_data().activeBusses,
         }
 
     # Gets the current active device count
@@ -52,7 +83,7 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
             return {"status": "error", "error": "not_available"}
         return {
             "status": "ok",
-            "list": self.master.getInformationData().activeSlaveCount,
+            "list": self.master.get_information_data().activeSlaveCount,
         }
 
     # Gets a list of the UIDs from all currently active devices
@@ -63,7 +94,7 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
             return {"status": "error", "error": "not_available"}
         slaveList = [
             x.hbusSlaveUniqueDeviceInfo
-            for x in list(self.master.detectedSlaveList.values())
+            for x in list(self.master.registry.devices.values())
         ]
 
         return {"status": "ok", "list": slaveList}
@@ -75,13 +106,11 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
     def jsonrpc_slaveinformation(self, uid):
         if self._is_operational() is False:
             return {"status": "error", "error": "not_available"}
-        address = self.master.find_device_by_uid(uid)
+        slave = self.master.registry.find_by_uid(int(uid))
 
-        if address is None:
+        if slave is None:
             return {"status": "error", "error": "invalid_uid"}
 
-        slave = self.master.detectedSlaveList[address.global_id]
-
         ret = HbusSlaveSerializer(slave).getDict()
         ret["status"] = "ok"
 
@@ -94,13 +123,11 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
     def jsonrpc_slaveobjectlist(self, slaveuid):
         if self._is_operational() is False:
             return {"status": "error", "error": "not_available"}
-        address = self.master.find_device_by_uid(slaveuid)
+        slave = self.master.registry.find_by_uid(int(slaveuid))
 
-        if address is None:
+        if slave is None:
             return {"status": "error", "error": "invalid_uid"}
 
-        slave = self.master.detectedSlaveList[address.global_id]
-
         objectList = [
             HbusObjectSerializer(x).getDict()
             for x in list(slave.hbusSlaveObjects.values())
@@ -116,12 +143,9 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
         if self._is_operational() is False:
             return {"status": "error", "error": "not_available"}
         if int(bus) == 255:
-            slaveList = list(self.hbusMaster.detectedSlaveList.values())
+            slaveList = list(self.master.registry.devices.values())
         else:
-            slaveList = []
-            for slave in list(self.hbusMaster.detectedSlaveList.values()):
-                if slave.hbusSlaveAddress.bus_number == int(bus):
-                    slaveList.append(slave)
+            slaveList = self.master.registry.on_bus(int(bus))
 
         returnList = [x.hbusSlaveUniqueDeviceInfo for x in slaveList]
 
@@ -130,45 +154,130 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
     # Reads value from an object
     # @param address device address
     # @param number object number
+    # @param formatted return formatted value instead of raw data
+    # @param maxage maximum age in ms of a cached value that may be returned
+    # instead of reading the device, server default if not given
+    # @return deferred data to be JSON structured
+
+    def jsonrpc_readvalue(self, address, number, formatted=True, maxage=None):
+        if self._is_operational() is False:
+            return {"status": "error", "error": "not_available"}
+
+        addr, obj, error = self._find_object(address, number)
+        if error is not None:
+            return error
+
+        d = self.master.read_object(addr, int(number), maxage)
+        d.addCallbacks(
+            self._read_value_callback,
+            self._read_value_errback,
+            callbackArgs=(obj, formatted),
+        )
+
+        # answered when the device responds
+        return d
+
+    # Data read finished callback
+    # @param data raw data read
+    # @param obj device object read
+    # @param formatted format value
     # @return data to be JSON structured
 
-    def jsonrpc_readobject(self, address, number):
+    def _read_value_callback(self, data, obj, formatted):
+        if formatted:
+            value = obj.getFormattedValue()
+        else:
+            value = list(data)
+
+        return {"status": "ok", "value": value}
+
+    # Data read failure callback
+    # @param failure failure information
+    # @return data to be JSON structured
+
+    def _read_value_errback(self, failure):
+        if failure.check(HBUSTimeoutException) is not None:
+            return {"status": "error", "error": "read_timeout"}
+        if failure.check(IOError) is not None:
+            return {"status": "write_only"}
+
+        return failure
+
+    # Reads values from several objects at once
+    # @param objects list of [address, object number] pairs
+    # @param formatted return formatted values instead of raw data
+    # @param maxage maximum age in ms of cached values, see readvalue
+    # @return deferred data to be JSON structured, with one result per
+    # requested object, in request order
+
+    def jsonrpc_readobjects(self, objects, formatted=True, maxage=None):
         if self._is_operational() is False:
             return {"status": "error", "error": "not_available"}
-        # for now, make sure that we are not doing anything else (waiting)
-        if self.read_finished is False:
-            return {"status": "error", "error": "busy"}
 
-        addr = hbus_address_from_string(address)
+        results = []
+        reads = []
+        for address, number in objects:
+            addr, obj, error = self._find_object(address, number)
+            if error is not None:
+                results.append(error)
+                continue
 
-        if not addr.global_id in list(self.master.detectedSlaveList.keys()):
+            results.append(None)
+            reads.append((len(results) - 1, addr, int(number), obj))
 
-            # device does not exist
-            return {"status": "error", "error": "invalid_device"}
+        d = self.master.read_objects([(x[1], x[2]) for x in reads], maxage)
+        d.addCallback(self._read_objects_callback, results, reads, formatted)
 
-        if not int(number) in list(
-            self.master.detectedSlaveList[
-                addr.global_id
-            ].hbusSlaveObjects.keys()
-        ):
+        return d
 
-            # object does not exist
-            return {"status": "error", "error": "invalid_object"}
+    # Batch read finished callback
+    # @param data list of read results
+    # @param results partial results to be filled in
+    # @param reads read requests that were issued
+    # @param formatted format values
+    # @return data to be JSON structured
 
-        try:
-            self.master.readSlaveObject(
-                addr,
-                int(number),
-                self._read_object_callback,
-                self._read_object_timeout_callback,
-            )
-        except IOError:
+    def _read_objects_callback(self, data, results, reads, formatted):
+        for (success, value), (index, _, _, obj) in zip(data, reads):
+            if success:
+                results[index] = self._read_value_callback(
+                    value, obj, formatted
+                )
+            else:
+                results[index] = self._read_value_errback(value)
+
+        return {"status": "ok", "list": results}
+
+    # Reads value from an object, result must be polled with readfinished
+    # and retrievelastdata. Kept for compatibility, see readvalue
+    # @param address device address
+    # @param number object number
+    # @return data to be JSON structured
+
+    def jsonrpc_readobject(self, address, number):
+        if self._is_operational() is False:
+            return {"status": "error", "error": "not_available"}
+        # for now, make sure that we are not doing anything else (waiting)
+        if self.read_finished is False:
+            return {"status": "error", "error": "busy"}
+
+        addr, obj, error = self._find_object(address, number)
+        if error is not None:
+            return error
+
+        if obj.permissions == HbusObjectPermissions.WRITE:
             return {"status": "write_only"}
 
         self.waiting_for_read = True
         self.read_slave_addr = addr
         self.read_slave_object = number
         self.read_finished = False
+
+        d = self.master.read_object(addr, int(number))
+        d.addCallbacks(
+            self._read_object_callback, self._read_object_timeout_callback
+        )
+
         return {
             "status": "deferred"
         }  # deffered, use readfinished and retrievelastdata to receive
@@ -198,20 +307,20 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
 
         self.waiting_for_read = False
 
+        if isinstance(self.read_data, dict):
+            # read failed
+            return self.read_data
+
         if formatted:
             # get slave
-            addr = self.read_slave_addr
-            if addr.bus_number == 254:
-                s = self.master.virtualDeviceList[addr.global_id]
-            else:
-                s = self.master.detectedSlaveList[addr.global_id]
+            s = self.master.registry.get(self.read_slave_addr)
 
             # send formatted data
             ret_data = s.hbusSlaveObjects[
                 int(self.read_slave_object)
             ].getFormattedValue()
         else:
-            ret_data = [ord(x) for x in self.read_data]
+            ret_data = list(self.read_data)
 
         return {"status": "ok", "value": ret_data}
 
@@ -224,7 +333,7 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
 
     # Data read timeout callback
 
-    def _read_object_timeout_callback(self, data):
+    def _read_object_timeout_callback(self, failure):
         self.read_finished = True
         self.read_data = {"status": "error", "error": "read_timeout"}
 
@@ -236,27 +345,11 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
     def jsonrpc_writeobject(self, address, number, value):
         if self._is_operational() is False:
             return {"status": "error", "error": "not_available"}
-        try:
-            addr = hbus_address_from_string(address)
-        except ValueError:
-            return {"status": "error", "error": "malformed address"}
-
-        if not addr.global_id in list(self.master.detectedSlaveList.keys()):
+        addr, obj, error = self._find_object(address, number)
+        if error is not None:
+            return error
 
-            # device does not exist
-            return {"status": "error", "error": "invalid_device"}
-
-        if not int(number) in list(
-            self.master.detectedSlaveList[
-                addr.global_id
-            ].hbusSlaveObjects.keys()
-        ):
-
-            # object does not exist
-            return {"status": "error", "error": "invalid_object"}
-
-        # value formatting IS MISSING
-        if self.master.writeSlaveObject(addr, int(number), int(value)):
+        if self.master.slave_object_write_fmt(addr, int(number), value):
             return {"status": "ok"}
 
         return {"status": "error", "error": "read_only"}
@@ -266,5 +359,47 @@ class HBUSJSONServer(jsonrpc.JSONRPC):
             return {"status": "error", "error": "not_available"}
         self.master.slave_verify()
 
+    # Drops cached device descriptors, forcing a complete scan
+    # @param uid device's UID, all devices if not given
+    # @return data to be JSON structured
+    def jsonrpc_invalidatedescriptors(self, uid=None):
+        if uid is not None:
+            uid = int(uid)
+
+        return {
+            "status": "ok",
+            "value": self.master.invalidate_descriptor_cache(uid),
+        }
+
+    # Gets object write statistics, including writes combined with newer
+    # ones
+    # @return data to be JSON structured
+    def jsonrpc_writestats(self):
+        return {"status": "ok", "value": self.master.get_write_statistics()}
+
+    # Gets outgoing command queue statistics by priority class, including
+    # queueing delays
+    # @return data to be JSON structured
+    def jsonrpc_queuestats(self):
+        return {
+            "status": "ok",
+            "value": {
+                bus: stats["command_queue"]
+                for bus, stats in self.master.get_bus_statistics().items()
+            },
+        }
+
+    # Gets message signing statistics, including how long authenticated
+    # writes waited for a crypto worker
+    # @return data to be JSON structured
+    def jsonrpc_signingstats(self):
+        return {"status": "ok", "value": self.master.signer.get_statistics()}
+
+    # Gets master metrics: bus traffic, answer latencies, timeouts,
+    # malformed frames, queue depths and subsystem statistics
+    # @return data to be JSON structured
+    def jsonrpc_metrics(self):
+        return {"status": "ok", "value": self.master.get_metrics()}
+
     def jsonrpc_masterstate(self):
         return {"status": "ok", "value": self.master.masterState}
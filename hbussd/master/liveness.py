@@ -0,0 +1,211 @@
+"""Device liveness checking."""
+
+from collections import deque
+
+from hbussd.hbus.constants import HBUSCOMMAND_SEARCH
+from hbussd.hbus.exceptions import HBUSTimeoutException
+from hbussd.master.commandqueue import HbusCommandPriority
+from twisted.internet import defer, reactor
+
+
+class HbusLivenessMonitor:
+    """Ping devices with bounded concurrency and adaptive timeouts.
+
+    Pings of a sweep are started at evenly spaced instants over a time
+    window, at most max_outstanding of them awaiting an answer at the same
+    time. The timeout of each ping is derived from the round trip times
+    previously measured for that device, in the same way TCP calculates its
+    retransmission timeout, so dead devices no longer stall a sweep for the
+    worst case timeout.
+    """
+
+    # Timeout used for devices without round trip time measurements, in ms
+    DEFAULT_TIMEOUT = 3000
+    # Lower bound of adaptive timeouts, in ms
+    MIN_TIMEOUT = 100
+    # Upper bound of adaptive timeouts, in ms
+    MAX_TIMEOUT = 3000
+
+    # Smoothed round trip time gain
+    RTT_ALPHA = 0.125
+    # Round trip time variation gain
+    RTT_BETA = 0.25
+
+    def __init__(
+        self, push_command, find_device, pong, pong_fail, clock=reactor
+    ):
+        """Initialize.
+
+        @param push_command callable used to send commands
+        @param find_device callable returning a device object or None
+        @param pong called with device address when a device answers
+        @param pong_fail called with device address when a ping times out
+        @param clock IReactorTime provider, the reactor by default
+        """
+        self.clock = clock
+        self._push_command = push_command
+        self._find_device = find_device
+        self._pong = pong
+        self._pong_fail = pong_fail
+
+        # maximum number of unanswered pings
+        self.max_outstanding = 1
+
+        # addresses waiting to be pinged
+        self._queued = deque()
+        # address -> ping start time, then write time once written
+        self._busy = {}
+        # deferreds waiting for the current sweep to end
+        self._waiting = []
+
+        # next ping start time and spacing between pings
+        self._next = 0
+        self._spacing = 0
+        self._pumpCall = None
+
+    @property
+    def active(self):
+        """Check if a sweep is in progress."""
+        return len(self._queued) > 0 or len(self._busy) > 0
+
+    def ping_timeout(self, address):
+        """Calculate ping timeout for a device.
+
+        @param address device address
+        @return timeout in ms
+        """
+        device = self._find_device(address)
+        if device is None or device.pingRTTAverage is None:
+            return self.DEFAULT_TIMEOUT
+
+        timeout = device.pingRTTAverage + 4 * device.pingRTTVariance
+
+        return int(min(max(timeout, self.MIN_TIMEOUT), self.MAX_TIMEOUT))
+
+    def sweep(self, addresses, window=0):
+        """Ping devices.
+
+        Devices are added to the current sweep if one is in progress.
+        @param addresses list of device addresses
+        @param window time over which pings are spread, in seconds
+        @return Deferred fired when all devices have been pinged
+        """
+        d = defer.Deferred()
+        self._waiting.append(d)
+
+        addresses = [
+            x
+            for x in addresses
+            if x not in self._busy and x not in self._queued
+        ]
+
+        if self.active is False:
+            self._next = self.clock.seconds()
+            self._spacing = window / len(addresses) if addresses else 0
+
+        self._queued.extend(addresses)
+        self._pump()
+
+        return d
+
+    def _scheduled_pump(self):
+        """Start pings when their time has come."""
+        self._pumpCall = None
+        self._pump()
+
+    def _pump(self):
+        """Start queued pings that are due."""
+        while len(self._queued) > 0 and len(self._busy) < self.max_outstanding:
+            now = self.clock.seconds()
+            if now < self._next:
+                if self._pumpCall is None:
+                    self._pumpCall = self.clock.callLater(
+                        self._next - now, self._scheduled_pump
+                    )
+                return
+
+            self._next = max(self._next + self._spacing, now)
+
+            address = self._queued.popleft()
+            self._busy[address] = now
+            self._push_command(
+                HBUSCOMMAND_SEARCH,
+                address,
+                callBack=self._response,
+                callBackParams=address,
+                timeout=self.ping_timeout(address),
+                timeoutCallBack=self._timeout,
+                timeoutCallBackParams=address,
+                priority=HbusCommandPriority.PING,
+            )
+
+        if self.active is False:
+            self._finish()
+
+    def ping_sent(self, address):
+        """Handle ping written to the bus.
+
+        Round trip times are measured from here, not including the time the
+        ping spent waiting for the bus.
+        @param address device address
+        """
+        if address in self._busy:
+            self._busy[address] = self.clock.seconds()
+
+    def _update_rtt(self, address, rtt):
+        """Update round trip time statistics of a device.
+
+        @param address device address
+        @param rtt measured round trip time in ms
+        """
+        device = self._find_device(address)
+        if device is None:
+            return
+
+        device.pingRTT = rtt
+        device.pingCount += 1
+
+        if device.pingRTTAverage is None:
+            device.pingRTTAverage = rtt
+            device.pingRTTVariance = rtt / 2
+        else:
+            device.pingRTTVariance += self.RTT_BETA * (
+                abs(device.pingRTTAverage - rtt) - device.pingRTTVariance
+            )
+            device.pingRTTAverage += self.RTT_ALPHA * (
+                rtt - device.pingRTTAverage
+            )
+
+    def _response(self, data):
+        """Handle ping answer."""
+        address = data[0]
+        start = self._busy.pop(address, None)
+
+        try:
+            if start is not None:
+                now = self.clock.seconds()
+                self._update_rtt(address, (now - start) * 1000)
+            self._pong(address)
+        finally:
+            self._pump()
+
+    def _timeout(self, failure):
+        """Handle ping timeout."""
+        if failure.check(HBUSTimeoutException) is None:
+            return failure
+
+        address = failure.value.args[0]
+        self._busy.pop(address, None)
+
+        try:
+            self._pong_fail(address)
+        finally:
+            self._pump()
+
+    def _finish(self):
+        """Fire deferreds waiting for sweep end."""
+        waiting = self._waiting
+        self._waiting = []
+
+        for d in waiting:
+            d.callback(None)
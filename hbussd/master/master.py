@@ -6,23 +6,41 @@ import time
 from collections import deque
 from datetime import datetime
 
-import hbussd.hbus.crypto
-from hbussd.fakebus import hbus_fb
-from hbussd.hbus.base import HbusDeviceAddress, HbusInstruction, HbusOperation
+from hbussd.hbus.base import (
+    HbusDeviceAddress,
+    HbusInstruction,
+    HbusOperation,
+    hbus_address,
+)
 from hbussd.hbus.constants import *
 from hbussd.hbus.evt import HbusMasterEvent, HbusMasterEventType
-from hbussd.hbus.exceptions import HBUSTimeoutException
+from hbussd.hbus.exceptions import (
+    HBUSQueueFullException,
+    HBUSTimeoutException,
+)
 from hbussd.hbus.slaves import (
-    HBUS_DTYPE_OPTIONS,
     HbusDevice,
     HbusDeviceObject,
     HbusEndpoint,
     HbusInterrupt,
     HbusObjDataType,
 )
+from hbussd.master.capture import (
+    CAPTURE_RX,
+    CAPTURE_TX,
+    HbusCaptureWriter,
+)
+from hbussd.master.busport import HbusBusPort
+from hbussd.master.commandqueue import HbusCommandPriority
+from hbussd.master.descriptors import HbusDescriptorCache
+from hbussd.master.enumeration import HbusScanScheduler
+from hbussd.master.liveness import HbusLivenessMonitor
+from hbussd.master.metrics import HbusMetrics
+from hbussd.master.polling import HbusPollingScheduler
+from hbussd.master.registry import HbusDeviceRegistry
+from hbussd.master.signing import HbusSigningService
 from hbussd.plugins import HbusPluginManager
 from twisted.internet import defer, reactor
-from twisted.internet.protocol import Factory
 
 BROADCAST_BUS = 255
 VIRTUAL_BUS = 254
@@ -75,19 +93,6 @@ q = 6098281643811954875603244188115354615838590421828877746249463982072696362628
 HBUS_ASYMMETRIC_KEYS = HbusKeySet(p, q)
 
 
-class HbusMasterState:
-    """HBUS master states."""
-
-    hbusMasterStarting = 0
-    hbusMasterIdle = 1
-    hbusMasterSearching = 2
-    hbusMasterAddressing = 3
-    hbusMasterScanning = 4
-    hbusMasterOperational = 5
-    hbusMasterChecking = 6
-    hbusMasterInterrupted = 7
-
-
 class HbusPendingAnswer:
     """Pending answer system using deferreds."""
 
@@ -100,12 +105,15 @@ class HbusPendingAnswer:
         actionParameters=None,
         timeoutAction=None,
         timeoutActionParameters=None,
+        clock=reactor,
     ):
         """Initialize."""
         self.command = command
         self.source = source
         self.timeout = timeout
         self.now = datetime.now()
+        # clock time at which answer started being expected
+        self.sent = clock.seconds()
 
         self.dCallback = callBackDefer
         # self.dCallback = defer.Deferred()
@@ -140,6 +148,76 @@ class HbusPendingAnswer:
             self._timeout_handler.cancel()
 
 
+class HbusPendingAnswerTable:
+    """Pending answers indexed by source address and expected command."""
+
+    def __init__(self):
+        """Initialize."""
+        # (source, command) -> deque of HbusPendingAnswer, oldest first
+        self._pending = {}
+        self._count = 0
+        # highest number of simultaneous pending answers seen
+        self.max_depth = 0
+
+    def __len__(self):
+        """Get number of pending answers."""
+        return self._count
+
+    def append(self, pending):
+        """Add pending answer.
+
+        @param pending HbusPendingAnswer object
+        """
+        key = (pending.source, pending.command)
+        try:
+            self._pending[key].append(pending)
+        except KeyError:
+            self._pending[key] = deque([pending])
+
+        self._count += 1
+        if self._count > self.max_depth:
+            self.max_depth = self._count
+
+    def pop_match(self, source, command):
+        """Remove and return the oldest answer expected from a device.
+
+        @param source address of device that sent the answer
+        @param command received command
+        @return HbusPendingAnswer object or None
+        """
+        key = (source, command)
+        queue = self._pending.get(key)
+        if queue is None:
+            return None
+
+        pending = queue.popleft()
+        if not queue:
+            del self._pending[key]
+
+        self._count -= 1
+        return pending
+
+    def remove(self, pending):
+        """Remove pending answer, if present.
+
+        @param pending HbusPendingAnswer object
+        """
+        key = (pending.source, pending.command)
+        queue = self._pending.get(key)
+        if queue is None:
+            return
+
+        try:
+            queue.remove(pending)
+        except ValueError:
+            return
+
+        if not queue:
+            del self._pending[key]
+
+        self._count -= 1
+
+
 class HbusMasterInformationData:
     """Master information."""
 
@@ -154,33 +232,17 @@ class HbusMaster:
 
     pluginManager = None
 
-    hbusSerialRxTimeout = 100
-
-    hbusBusState = HbusBusState.FREE
-    hbusBusLockedWith = None
-    hbusRxState = HbusRXState.SBID
+    # inter-byte receive timeout in milliseconds
+    hbusSerialRxTimeout = 200
 
-    communicationBuffer = []
     SearchTimer = None
 
-    expectedResponseQueue = deque()
-
     awaitingFreeBus = deque()
 
-    outgoingCommands = deque()
-
-    removeQueue = []
-
-    detectedSlaveList = {}
-    virtualDeviceList = {}
-
     staticSlaveList = []
 
-    registeredSlaveCount = 0
     virtualSlaveCount = 0
 
-    masterState = HbusMasterState.hbusMasterStarting
-
     commandDelay = datetime.now()
 
     hbusDeviceSearchTimer = datetime.now()
@@ -189,31 +251,83 @@ class HbusMaster:
 
     autoSearch = True
 
-    nextSlaveCapabilities = None
-    nextSlaveUID = None
-
     hbusDeviceScanningTimeout = False
 
-    rxBytes = 0
-    txBytes = 0
+    # Bus states in which devices are being searched for
+    _SEARCH_STATES = (
+        HbusMasterState.hbusMasterSearching,
+        HbusMasterState.hbusMasterChecking,
+        HbusMasterState.hbusMasterAddressing,
+    )
 
-    def __init__(self, port, baudrate=100000, busno=0, conf_file=None):
-        """Initialize."""
+    # Fraction of the polling interval over which pings are spread
+    pingSpread = 0.5
+
+    # Default maximum age of object values served without reading the
+    # device, in ms, 0 disables
+    valueMaxAge = 0
 
-        def fake_bus():
-            f = Factory()
-            f.protocol = hbus_fb.FakeBusSerialPort
-            reactor.listenTCP(9090, f)
+    # Default minimum time between writes to the same object, in ms, 0
+    # disables; writes requested in the meantime are combined
+    writeMinInterval = 0
 
-            self.serial_create(fake=True)
+    # Bus traffic recorder, HbusCaptureWriter object or None
+    capture = None
 
-        def system_start():
-            # system started event
-            event = HbusMasterEvent(HbusMasterEventType.eventStarted)
-            self.pluginManager.m_evt_broadcast(event)
+    def __init__(
+        self, port, baudrate=100000, busno=0, conf_file=None, clock=reactor
+    ):
+        """Initialize.
+
+        @param clock IReactorTime provider of all master timers, the reactor
+        by default
+        """
 
+        self.clock = clock
         self.serialBaud = baudrate
-        self.hbusMasterAddr = HbusDeviceAddress(busno, 0)
+        # bus number -> HbusBusPort object, in configuration order
+        self.ports = {}
+        # maximum queued commands per HbusCommandPriority class
+        self.queueLimits = {}
+        self.expectedResponseQueue = HbusPendingAnswerTable()
+        self.metrics = HbusMetrics(clock=clock)
+        self.clock.callLater(0, self.metrics.start)
+        self.scanScheduler = HbusScanScheduler(
+            self._push_command, self._slave_read_basic, clock=clock
+        )
+        self.descriptorCache = None
+        # a bus was scanned since the master was last operational
+        self.operationalPending = False
+        # called when searching all busses ended
+        self.detectSlavesEnded = None
+        self.registry = HbusDeviceRegistry()
+        self.livenessMonitor = HbusLivenessMonitor(
+            self._push_command,
+            self.registry.get,
+            self._slave_pong,
+            self._slave_pong_fail,
+            clock=clock,
+        )
+        self.signer = HbusSigningService(HBUS_ASYMMETRIC_KEYS)
+        # authenticated writes waiting for their signatures, in order
+        self.pendingSignedWrites = deque()
+        # (global id, object number) -> callbacks waiting for a read
+        self.pendingReads = {}
+        # (global id, object number) -> [address, number, value] of writes
+        # not sent yet
+        self.pendingWrites = {}
+        self.writesRequested = 0
+        self.writesSent = 0
+        self.writesCoalesced = 0
+        self.writesDelayed = 0
+        self.pollingScheduler = HbusPollingScheduler(
+            self._poll_object, self.registry.get, clock=clock
+        )
+        # polling intervals in ms: default, by object level and by
+        # (uid, object number)
+        self.pollInterval = 0
+        self.pollLevelIntervals = {}
+        self.pollObjectIntervals = {}
 
         self.logger = logging.getLogger("hbussd.hbusmaster")
         self.pluginManager = HbusPluginManager("./plugins", self)
@@ -223,9 +337,19 @@ class HbusMaster:
         self.conf_param = {}
         self._load_configuration(conf_file)
 
-        if port is None and "serial_port" not in self.conf_param:
+        if "busses" in self.conf_param:
+            # list of {"bus", "serial_port", "baudrate", "fakebus"}, the
+            # first bus is the main bus
+            for bus in self.conf_param["busses"]:
+                self.add_port(
+                    int(bus["bus"]),
+                    bus.get("serial_port"),
+                    int(bus.get("baudrate", baudrate)),
+                    bus.get("fakebus", False) is True,
+                )
+        elif port is None and "serial_port" not in self.conf_param:
             # create fakebus system
-            fake_bus()
+            self.add_port(busno, fake=True)
         else:
             if (
                 "fakebus" in self.conf_param
@@ -235,16 +359,84 @@ class HbusMaster:
                     "conflicting options in configuration"
                     " file: fakebus/serial_port"
                 )
-                fake_bus()
-                system_start()
-                return
-            if port is None:
-                self.serialPort = self.conf_param["serial_port"]
+                self.add_port(busno, fake=True)
             else:
-                self.serialPort = port
-            self.serial_create(fake=False)
+                if port is None:
+                    port = self.conf_param["serial_port"]
+                self.add_port(busno, port, baudrate)
+
+        if len(self.ports) == 0:
+            raise ValueError("no bus configured")
+
+        # main bus
+        self.mainPort = next(iter(self.ports.values()))
+        self.hbusMasterAddr = self.mainPort.address
+
+        for bus_port in self.ports.values():
+            self.serial_create(bus_port)
+
+        # system started event
+        event = HbusMasterEvent(HbusMasterEventType.eventStarted)
+        self.pluginManager.m_evt_broadcast(event)
+
+    def add_port(self, bus, serial_port=None, baudrate=100000, fake=False):
+        """Attach a bus.
+
+        @param bus bus number
+        @param serial_port serial port device path
+        @param baudrate serial port baud rate
+        @param fake bus is a fake bus
+        @return HbusBusPort object
+        """
+        if bus in self.ports:
+            raise ValueError("bus {} configured twice".format(bus))
+        if serial_port is None and fake is False:
+            raise ValueError("no serial port for bus {}".format(bus))
+
+        bus_port = HbusBusPort(
+            bus,
+            self._parse_received_data,
+            self.metrics.frame_error,
+            self._port_write,
+            serial_port=serial_port,
+            baudrate=baudrate,
+            fake=fake,
+            rx_timeout=self.hbusSerialRxTimeout,
+            clock=self.clock,
+        )
+        bus_port.outgoingCommands.limits.update(self.queueLimits)
+        self.ports[bus] = bus_port
+
+        return bus_port
+
+    def _port_for(self, address):
+        """Get port of the bus of an address.
+
+        @param address device address
+        @return HbusBusPort object, the main bus port for unknown busses
+        """
+        return self.ports.get(address.bus_number, self.mainPort)
+
+    @property
+    def masterState(self):
+        """Get enumeration state of the least advanced bus."""
+        if len(self.ports) == 0:
+            return HbusMasterState.hbusMasterStarting
+
+        return min(
+            (x.state for x in self.ports.values()),
+            key=HbusMasterState.PROGRESS.index,
+        )
+
+    @property
+    def rxBytes(self):
+        """Get number of bytes received on all busses."""
+        return sum(x.rxBytes for x in self.ports.values())
 
-        system_start()
+    @property
+    def txBytes(self):
+        """Get number of bytes sent on all busses."""
+        return sum(x.txBytes for x in self.ports.values())
 
     def _load_configuration(self, conf_file):
 
@@ -253,6 +445,60 @@ class HbusMaster:
 
         self.conf_param = conf_file
 
+        if "rx_timeout" in self.conf_param:
+            self.hbusSerialRxTimeout = int(self.conf_param["rx_timeout"])
+
+        if "scan_max_outstanding" in self.conf_param:
+            self.scanScheduler.max_outstanding = int(
+                self.conf_param["scan_max_outstanding"]
+            )
+
+        if "ping_max_outstanding" in self.conf_param:
+            self.livenessMonitor.max_outstanding = int(
+                self.conf_param["ping_max_outstanding"]
+            )
+
+        if "ping_spread" in self.conf_param:
+            self.pingSpread = float(self.conf_param["ping_spread"])
+
+        if "value_max_age" in self.conf_param:
+            self.valueMaxAge = int(self.conf_param["value_max_age"])
+
+        if "write_min_interval" in self.conf_param:
+            self.writeMinInterval = int(self.conf_param["write_min_interval"])
+
+        if "polling" in self.conf_param:
+            self._load_polling_configuration(self.conf_param["polling"])
+
+        if "queue_limits" in self.conf_param:
+            priorities = {
+                v: k for k, v in HbusCommandPriority.NAMES.items()
+            }
+            for name, limit in self.conf_param["queue_limits"].items():
+                if name not in priorities:
+                    self.logger.warning("unknown command class: %s", name)
+                    continue
+                self.queueLimits[priorities[name]] = limit
+
+        if "signature_cache_size" in self.conf_param:
+            self.signer.cache_size = int(
+                self.conf_param["signature_cache_size"]
+            )
+
+        if "crypto_pool_size" in self.conf_param:
+            self.signer.pool_size = int(self.conf_param["crypto_pool_size"])
+
+        if "capture" in self.conf_param:
+            self.capture = HbusCaptureWriter(self.conf_param["capture"])
+            reactor.addSystemEventTrigger(
+                "after", "shutdown", self.capture.close
+            )  # @UndefinedVariable
+
+        if "descriptor_cache" in self.conf_param:
+            self.descriptorCache = HbusDescriptorCache(
+                self.conf_param["descriptor_cache"]
+            )
+
         # process some configuration params
         if "staticSlaveList" in self.conf_param:
             for addr in self.conf_param["staticSlaveList"]:
@@ -265,6 +511,39 @@ class HbusMaster:
                     HbusDeviceAddress(int(addr["busNum"]), int(addr["devNum"]))
                 )
 
+    def _load_polling_configuration(self, polling):
+        """Load object polling configuration.
+
+        @param polling dictionary with optional keys interval (default
+        interval), level_intervals (intervals by object level), objects
+        (intervals by "uid:object number", uid in hexadecimal),
+        max_outstanding and latency_threshold; times in ms
+        """
+        self.pollInterval = int(polling.get("interval", 0))
+
+        for level, interval in polling.get("level_intervals", {}).items():
+            self.pollLevelIntervals[int(level)] = int(interval)
+
+        for obj, interval in polling.get("objects", {}).items():
+            try:
+                uid, number = obj.split(":")
+                key = (int(uid, 16), int(number))
+            except ValueError:
+                self.logger.warning("invalid polled object: %s", obj)
+                continue
+
+            self.pollObjectIntervals[key] = int(interval)
+
+        if "max_outstanding" in polling:
+            self.pollingScheduler.max_outstanding = int(
+                polling["max_outstanding"]
+            )
+
+        if "latency_threshold" in polling:
+            self.pollingScheduler.latency_threshold = int(
+                polling["latency_threshold"]
+            )
+
     def search_and_load_plugins(self):
         """Search and load plugins using plugin manager."""
         self.logger.debug("scanning plugins")
@@ -285,35 +564,90 @@ class HbusMaster:
         event = HbusMasterEvent(HbusMasterEventType.eventOperational)
         self.pluginManager.m_evt_broadcast(event)
 
+    @property
+    def detectedSlaveList(self):
+        """Get real devices indexed by global address id."""
+        return self.registry.devices
+
+    @property
+    def virtualDeviceList(self):
+        """Get virtual devices indexed by global address id."""
+        return self.registry.virtual_devices
+
+    def get_metrics(self):
+        """Get master metrics.
+
+        @return dictionary of bus traffic counters, queue depths and
+        statistics of master subsystems, times in ms
+        """
+        return {
+            "rx_bytes": self.rxBytes,
+            "tx_bytes": self.txBytes,
+            "bus": self.metrics.get_statistics(),
+            "queues": {
+                "outgoing": sum(
+                    len(x.outgoingCommands) for x in self.ports.values()
+                ),
+                "pending_answers": len(self.expectedResponseQueue),
+                "pending_answers_max": self.expectedResponseQueue.max_depth,
+                "pending_reads": len(self.pendingReads),
+                "pending_writes": len(self.pendingWrites),
+                "pending_signed_writes": len(self.pendingSignedWrites),
+            },
+            "busses": self.get_bus_statistics(),
+            "writes": self.get_write_statistics(),
+            "polling": self.pollingScheduler.get_statistics(),
+            "signing": self.signer.get_statistics(),
+        }
+
+    def get_bus_statistics(self):
+        """Get statistics of each bus.
+
+        @return dictionary of HbusBusPort statistics by bus number
+        """
+        return {str(x.bus): x.get_statistics() for x in self.ports.values()}
+
     def get_information_data(self):
         """Get master information."""
-        busses = list(
-            set(
-                [
-                    slave.hbusSlaveAddress.bus_number
-                    for slave in list(self.detectedSlaveList.values())
-                    if slave.basicInformationRetrieved
-                ]
-            )
-        )
+        busses = []
+        for bus in self.registry.busses:
+            if bus == VIRTUAL_BUS:
+                continue
 
-        if len(self.virtualDeviceList) > 0:
+            for slave in self.registry.on_bus(bus):
+                if slave.basicInformationRetrieved:
+                    busses.append(bus)
+                    break
+
+        if len(self.registry.virtual_devices) > 0:
             busses.append(VIRTUAL_BUS)
 
-        return HbusMasterInformationData(len(self.detectedSlaveList), busses)
+        return HbusMasterInformationData(len(self.registry), busses)
+
+    def serial_create(self, port):
+        """Create serial port.
 
-    def serial_create(self, fake=False):
-        """Create serial port."""
+        @param port HbusBusPort object, its serial attribute is set to the
+        connection
+        """
         raise NotImplementedError
 
-    def serial_connected(self):
-        """Connect serial port callback."""
-        # reset all devices
-        self.logger.debug("Connected. Resetting all devices now")
+    def serial_connected(self, port=None):
+        """Connect serial port callback.
 
-        address = HbusDeviceAddress(
-            self.hbusMasterAddr.bus_number, HBUS_BROADCAST_ADDRESS
+        @param port HbusBusPort object, main bus if None
+        """
+        if port is None:
+            port = self.mainPort
+
+        # reset all devices
+        self.logger.debug(
+            "Connected. Resetting all devices on bus %d", port.bus
         )
+        port.connected = True
+        port.resetting = True
+
+        address = HbusDeviceAddress(port.bus, HBUS_BROADCAST_ADDRESS)
 
         size = HBUS_SIGNATURE_SIZE + 1
 
@@ -321,366 +655,151 @@ class HbusMaster:
 
         msg = struct.pack(
             "cccccc",
-            bytes([self.hbusMasterAddr.bus_number]),
-            bytes([self.hbusMasterAddr.dev_number]),
+            bytes([port.address.bus_number]),
+            bytes([port.address.dev_number]),
             bytes([address.bus_number]),
             bytes([address.dev_number]),
             bytes([HBUSCOMMAND_SOFTRESET.cmd_byte]),
             bytes([size]),
         )
 
-        sig = hbussd.hbus.crypto.RabinWilliamsSign(
-            msg,
-            HBUS_ASYMMETRIC_KEYS.privatep,
-            HBUS_ASYMMETRIC_KEYS.privateq,
-            HBUS_SIGNATURE_SIZE,
-        )
+        def send_reset(sig):
+            myParamList.extend(sig)
 
-        myParamList.extend(sig.getByteString())
+            self._push_command(
+                HBUSCOMMAND_SOFTRESET, address, params=myParamList
+            )
+            port.resetting = False
 
-        self._push_command(HBUSCOMMAND_SOFTRESET, address, params=myParamList)
+            # each bus is searched as soon as its own devices are reset
+            self.logger.debug(
+                "Waiting for device RESET to complete on bus %d", port.bus
+            )
 
-        self.logger.debug("Waiting for device RESET to complete...")
+            # signal.alarm(1)
+            self.clock.callLater(1, self._alarm, port)
 
-        # signal.alarm(1)
-        reactor.callLater(1, self._alarm)  # @UndefinedVariable
+        # signed off the reactor thread, unless cached from a previous connect
+        d = self.signer.sign_deferred(msg)
+        d.addCallback(send_reset)
 
         # self.detectSlaves()
-        self._rx_enter_idle()
-
-    def serial_write(self, string):
-        """Write to serial port."""
-        raise NotImplementedError
+        port.enter_idle()
 
-    def _serial_timeout(self):
-        """Flag timeout in communication."""
-        self.logger.warning("Packet receive timeout")
-        self.logger.debug("packet dump: %s", self.communicationBuffer)
+    def serial_write(self, string, port):
+        """Write to serial port.
 
-        self._rx_enter_idle()
-
-    def _rx_enter_idle(self):
-        """Enter idle state in RX state machine."""
-        self.communicationBuffer = []
-
-        self.hbusRxState = HbusRXState.SBID
-
-        if len(self.outgoingCommands) > 0:
-            d = self.outgoingCommands.pop()
-            d.callback(None)
-
-    def _rx_new_data(self, data):
-        """Receive new data."""
-        for d in data:
-
-            self.rxBytes += 1
-
-            if self.hbusRxState == HbusRXState.SBID:
-
-                self.communicationBuffer.append(d)
-
-                self.hbusRxState = HbusRXState.SDID
-
-                self.RXTimeout = reactor.callLater(
-                    0.2, self._serial_timeout
-                )  # @UndefinedVariable
-
-            elif self.hbusRxState == HbusRXState.SDID:
-
-                self.RXTimeout.cancel()
-
-                # check address
-                if (d > 32) and (d != 255):
-                    self._rx_enter_idle()
-
-                    self.logger.debug("Invalid address in received packet")
-                    return
-
-                self.communicationBuffer.append(d)
-
-                self.hbusRxState = HbusRXState.TBID
-
-                self.RXTimeout = reactor.callLater(
-                    0.2, self._serial_timeout
-                )  # @UndefinedVariable
-
-            elif self.hbusRxState == HbusRXState.TBID:
-
-                self.RXTimeout.cancel()
-
-                self.communicationBuffer.append(d)
-
-                self.hbusRxState = HbusRXState.TDID
-
-                self.RXTimeout = reactor.callLater(
-                    0.2, self._serial_timeout
-                )  # @UndefinedVariable
-
-            elif self.hbusRxState == HbusRXState.TDID:
-
-                self.RXTimeout.cancel()
-
-                # check address
-                if (d > 32) and (d != 255):
-                    self._rx_enter_idle()
-
-                    self.logger.debug("Invalid address in received packet")
-                    return
-
-                self.communicationBuffer.append(d)
-
-                self.hbusRxState = HbusRXState.CMD
-
-                self.RXTimeout = reactor.callLater(
-                    0.2, self._serial_timeout
-                )  # @UndefinedVariable
-
-            elif self.hbusRxState == HbusRXState.CMD:
-
-                self.RXTimeout.cancel()
-
-                self.communicationBuffer.append(d)
-
-                if (
-                    d == HBUSCOMMAND_ACK.cmd_byte
-                    or d == HBUSCOMMAND_SEARCH.cmd_byte
-                    or d == HBUSCOMMAND_BUSLOCK.cmd_byte
-                    or d == HBUSCOMMAND_BUSUNLOCK.cmd_byte
-                    or d == HBUSCOMMAND_SOFTRESET.cmd_byte
-                ):
-                    self.hbusRxState = HbusRXState.STP
-                else:
-                    self.hbusRxState = HbusRXState.ADDR
-
-                self.RXTimeout = reactor.callLater(
-                    0.2, self._serial_timeout
-                )  # @UndefinedVariable
-
-            elif self.hbusRxState == HbusRXState.ADDR:
-
-                self.RXTimeout.cancel()
-
-                self.communicationBuffer.append(d)
-
-                if (
-                    self.communicationBuffer[4] == HBUSCOMMAND_GETCH.cmd_byte
-                    or self.communicationBuffer[4]
-                    == HBUSCOMMAND_QUERY.cmd_byte
-                    or self.communicationBuffer[4]
-                    == HBUSCOMMAND_QUERY_EP.cmd_byte
-                    or self.communicationBuffer[4]
-                    == HBUSCOMMAND_QUERY_INT.cmd_byte
-                ):
-                    self.hbusRxState = HbusRXState.STP
-                else:
-                    self.hbusRxState = HbusRXState.PSZ
-
-                self.RXTimeout = reactor.callLater(
-                    0.2, self._serial_timeout
-                )  # @UndefinedVariable
-
-            elif self.hbusRxState == HbusRXState.PSZ:
-
-                self.RXTimeout.cancel()
-
-                if (
-                    self.communicationBuffer[4] != HBUSCOMMAND_STREAMW.cmd_byte
-                    and self.communicationBuffer[4]
-                    != HBUSCOMMAND_STREAMR.cmd_byte
-                ):
-                    if d > 64:
-                        d = chr(64)
-
-                self.communicationBuffer.append(d)
-                self.lastPacketParamSize = d
-
-                if (
-                    self.communicationBuffer[4] == HBUSCOMMAND_STREAMW.cmd_byte
-                    or self.communicationBuffer[4]
-                    == HBUSCOMMAND_STREAMR.cmd_byte
-                ):
-                    self.hbusRxState = HbusRXState.STP
-                else:
-                    if d > 0:
-                        self.hbusRxState = HbusRXState.PRM
-                    else:
-                        self.hbusRxState = HbusRXState.STP
-
-                self.RXTimeout = reactor.callLater(
-                    0.2, self._serial_timeout
-                )  # @UndefinedVariable
-
-            elif self.hbusRxState == HbusRXState.PRM:
-
-                self.RXTimeout.cancel()
-
-                if len(self.communicationBuffer) <= (
-                    6 + self.lastPacketParamSize
-                ):
-                    self.communicationBuffer.append(d)
-                else:
-
-                    # self.hbusRxState = HbusRXState.STP
-                    if d == 0xFF:
-                        self.communicationBuffer.append(d)
-
-                        dataToParse = self.communicationBuffer
-
-                        self._rx_enter_idle()
-
-                        self._parse_received_data(dataToParse)
-
-                        return
-
-                    else:
-                        self.logger.debug(
-                            "malformed packet, termination error"
-                        )
-                        self.logger.debug(
-                            "packet dump: %s"
-                            % [hex(ord(x)) for x in self.communicationBuffer]
-                        )
-
-                        self._rx_enter_idle()
-
-                        return
-
-                self.RXTimeout = reactor.callLater(
-                    0.2, self._serial_timeout
-                )  # @UndefinedVariable
-
-            elif self.hbusRxState == HbusRXState.STP:
-
-                self.RXTimeout.cancel()
-
-                self.communicationBuffer.append(d)
-
-                if d == 0xFF:
-
-                    dataToParse = self.communicationBuffer
-
-                    self._rx_enter_idle()
-
-                    self._parse_received_data(dataToParse)
-
-                    return
-
-                else:
-                    self.logger.debug("malformed packet, termination error")
-                    self.logger.debug(
-                        "packet dump: %s"
-                        % [hex(ord(x)) for x in self.communicationBuffer]
-                    )
+        @param string data
+        @param port HbusBusPort object
+        """
+        raise NotImplementedError
 
-                    self._rx_enter_idle()
-                    return
+    def serial_new_data(self, data, port=None):
+        """Handle data received from serial port.
 
-            else:
-                self.logger.error("Fatal error receiving HBUSOP")
-                raise IOError("Fatal error receiving")
+        @param data received bytes
+        @param port HbusBusPort object, main bus if None
+        """
+        if port is None:
+            port = self.mainPort
 
-                self._rx_enter_idle()
+        if self.capture is not None:
+            self.capture.record(CAPTURE_RX, data, port.bus)
 
-                return
+        port.new_data(data)
 
-    @classmethod
+    @staticmethod
     def find_command(cmdbyte):
         """Find HBUS command definition."""
-        for c in HBUS_COMMANDLIST:
-            if c.cmd_byte == cmdbyte:
-                return c
-
-        return None
+        try:
+            return HBUS_COMMANDTABLE[cmdbyte]
+        except IndexError:
+            return None
 
-    def get_new_address(self, uid):
+    def get_new_address(self, uid, port=None):
         """Get address for new slave.
 
         @param uid slave's UID
+        @param port HbusBusPort object of the slave's bus, main bus if None
         """
-        UIDList = [
-            x.hbusSlaveUniqueDeviceInfo
-            for x in list(self.detectedSlaveList.values())
-        ]
-        addressList = [
-            x.hbusSlaveAddress for x in list(self.detectedSlaveList.values())
-        ]
-
-        AddressByUID = dict(list(zip(UIDList, addressList)))
+        if port is None:
+            port = self.mainPort
 
         # see if already registered at some point
-        if uid in list(AddressByUID.keys()):
-            return AddressByUID[uid].dev_number
+        slave = self.registry.find_by_uid(uid, virtual=False)
+        if (
+            slave is not None
+            and slave.hbusSlaveAddress.bus_number == port.bus
+        ):
             self.logger.debug("Re-integrating device with UID %s", hex(uid))
+            return slave.hbusSlaveAddress.dev_number
         else:
-            return self.registeredSlaveCount + 1
+            return port.registeredSlaveCount + 1
 
     def get_new_virtual_address(self, uid):
         """Get address for new virtual slave."""
-        uidList = [
-            x.hbusSlaveUniqueDeviceInfo
-            for x in list(self.virtualDeviceList.values())
-        ]
-        addressList = [
-            x.hbusSlaveAddress for x in list(self.virtualDeviceList.values())
-        ]
-        addressByUid = dict(list(zip(uidList, addressList)))
-
-        if uid in list(addressByUid.keys()):
-            return addressByUid[uid].dev_number
+        slave = self.registry.find_by_uid(uid, virtual=True)
+        if slave is not None:
+            return slave.hbusSlaveAddress.dev_number
         else:
             self.virtualSlaveCount += 1
             return self.virtualSlaveCount
 
-    def _set_slave_capabilities(self, params):
-        """Set slave capabilities."""
-        self.logger.debug("enumerating new device")
-        self.nextSlaveCapabilities = params[3]
-        (self.nextSlaveUID,) = struct.unpack("I", bytes(params[4:8]))
+    def _set_slave_capabilities(self, data):
+        """Set slave capabilities.
+
+        @param data tuple of HbusBusPort object and answer parameters
+        """
+        port, params = data
+        self.logger.debug("enumerating new device on bus %d", port.bus)
+        port.nextSlaveCapabilities = params[3]
+        (port.nextSlaveUID,) = struct.unpack("I", bytes(params[4:8]))
 
         # get new address
-        nextAddress = self.get_new_address(self.nextSlaveUID)
+        nextAddress = HbusDeviceAddress(
+            port.bus, self.get_new_address(port.nextSlaveUID, port)
+        )
 
-        if self.nextSlaveCapabilities & HbusDeviceCapabilities.AUTHSUP:
+        if port.nextSlaveCapabilities & HbusDeviceCapabilities.AUTHSUP:
             self.logger.debug("New device has AUTH support")
 
-        myParamList = [chr(HBUS_PUBKEY_SIZE)]
-        myParamList.extend(HBUS_ASYMMETRIC_KEYS.pubKeyStr())
+        myParamList = [HBUS_PUBKEY_SIZE]
+        myParamList.extend(HBUS_ASYMMETRIC_KEYS.strpubkey)
 
         # registers slave address with next available address
-        if self.nextSlaveCapabilities & HbusDeviceCapabilities.AUTHSUP:
+        if port.nextSlaveCapabilities & HbusDeviceCapabilities.AUTHSUP:
             self._push_command(
                 HBUSCOMMAND_KEYSET,
-                HbusDeviceAddress(self.hbusMasterAddr.bus_number, nextAddress),
+                nextAddress,
                 myParamList,
+                priority=HbusCommandPriority.ENUMERATION,
             )
         else:
             self._push_command(
                 HBUSCOMMAND_SEARCH,
-                HbusDeviceAddress(self.hbusMasterAddr.bus_number, nextAddress),
+                nextAddress,
+                priority=HbusCommandPriority.ENUMERATION,
             )
 
         # update BUSLOCK state
-        self.hbusBusLockedWith = HbusDeviceAddress(
-            self.hbusMasterAddr.bus_number, nextAddress
-        )
+        port.hbusBusLockedWith = nextAddress
 
         # sends BUSUNLOCK immediately
-        self._push_command(
-            HBUSCOMMAND_BUSUNLOCK,
-            HbusDeviceAddress(self.hbusMasterAddr.bus_number, nextAddress),
-        )
+        self._push_command(HBUSCOMMAND_BUSUNLOCK, nextAddress)
 
-        self.register_new_slave(
-            HbusDeviceAddress(self.hbusMasterAddr.bus_number, nextAddress)
-        )
+        self.register_new_slave(nextAddress)
 
-        if nextAddress == (self.registeredSlaveCount + 1):
-            self.registeredSlaveCount = self.registeredSlaveCount + 1
+        if nextAddress.dev_number == (port.registeredSlaveCount + 1):
+            port.registeredSlaveCount = port.registeredSlaveCount + 1
 
-        self.masterState = HbusMasterState.hbusMasterSearching
+        port.state = HbusMasterState.hbusMasterSearching
 
-    def _parse_received_data(self, data):
-        """Parse received data and verify correctness."""
+    def _parse_received_data(self, data, port):
+        """Parse received data and verify correctness.
+
+        @param data complete frame
+        @param port HbusBusPort object of the bus the frame was received on
+        """
         selectedR = None
 
         if len(data) < 7:
@@ -688,96 +807,88 @@ class HbusMaster:
             params = ()
         else:
             pSize = data[6]
-            params = data[7 : 7 + data[6]]
+            params = list(data[7 : 7 + data[6]])
 
         try:
             busOp = HbusOperation(
-                HbusInstruction(self.find_command(data[4]), pSize, params),
-                HbusDeviceAddress(data[2], data[3]),
-                HbusDeviceAddress(data[0], data[1]),
+                HbusInstruction(HBUS_COMMANDTABLE[data[4]], pSize, params),
+                hbus_address(data[2], data[3]),
+                hbus_address(data[0], data[1]),
             )
         except ValueError:
 
             self.logger.warning("Invalid packet was received")
+            self.metrics.frame_error("invalid_packet")
             return
 
         if busOp.source.dev_number == 0:
             self.logger.debug("Illegal packet ignored: reserved addres")
+            self.metrics.frame_error("reserved_address")
             return
 
+        self.metrics.frame_received(busOp.instruction.command)
+
         # very slow!!!
         # self.logger.debug(busOp)
         # print busOp
 
-        if busOp.destination == self.hbusMasterAddr:
+        if busOp.destination == port.address:
 
             if busOp.instruction.command == HBUSCOMMAND_BUSLOCK:
-                self.hbusBusState = HbusBusState.LOCKED_THIS
-                self.hbusBusLockedWith = busOp.source
-                self.nextSlaveCapabilities = None
-                self.nextSlaveUID = None
+                port.hbusBusState = HbusBusState.LOCKED_THIS
+                port.hbusBusLockedWith = busOp.source
+                port.nextSlaveCapabilities = None
+                port.nextSlaveUID = None
 
                 self.logger.debug(
                     "received BUSLOCK from {}".format(busOp.source)
                 )
-                # exception: buslock from (x,255)
+                # exception: buslock from (x,255), devices on other busses
+                # may be being addressed at the same time
                 if (
                     busOp.source.dev_number == HBUS_BROADCAST_ADDRESS
-                    and self.masterState
-                    in [
-                        HbusMasterState.hbusMasterSearching,
-                        HbusMasterState.hbusMasterChecking,
-                    ]
+                    and port.state in self._SEARCH_STATES
                 ):
 
                     self._push_command(
                         HBUSCOMMAND_GETCH,
-                        HbusDeviceAddress(
-                            self.hbusMasterAddr.bus_number,
-                            HBUS_BROADCAST_ADDRESS,
-                        ),
+                        HbusDeviceAddress(port.bus, HBUS_BROADCAST_ADDRESS),
                         params=[0],
                         callBack=self._set_slave_capabilities,
+                        callBackParams=port,
+                        priority=HbusCommandPriority.ENUMERATION,
                     )
 
-                    self.masterState = HbusMasterState.hbusMasterAddressing
+                    port.state = HbusMasterState.hbusMasterAddressing
 
             elif busOp.instruction.command == HBUSCOMMAND_BUSUNLOCK:
                 self.logger.debug(
                     "received BUSUNLOCK from {}".format(busOp.source)
                 )
-                self.hbusBusState = HbusBusState.FREE
-                self.hbusBusLockedWith = None
+                port.hbusBusState = HbusBusState.FREE
+                port.hbusBusLockedWith = None
 
                 self._bus_free()
 
             # Interrupts
             elif busOp.instruction.command == HBUSCOMMAND_INT:
                 self.logger.debug("received INT from {}".format(busOp.source))
-                self.masterState = HbusMasterState.hbusMasterInterrupted
+                port.state = HbusMasterState.hbusMasterInterrupted
 
                 # Process
                 # TODO: missing interrupt mechanisms for master special objects subsystem implementation
 
-            if len(self.expectedResponseQueue) > 0:
-
-                selectedR = None
-                for r in self.expectedResponseQueue:
-
-                    if r in self.removeQueue:
-                        continue
-
-                    if (
-                        r.source == busOp.source
-                        and r.command == busOp.instruction.command
-                    ):
-
-                        selectedR = r
-                        r.cancel_timeout_handler()
-                        self.removeQueue.append(r)
-                        break
+            selectedR = self.expectedResponseQueue.pop_match(
+                busOp.source, busOp.instruction.command
+            )
 
             if selectedR is not None:
+                selectedR.cancel_timeout_handler()
+                self.metrics.answer_received(
+                    selectedR.command,
+                    busOp.source,
+                    (self.clock.seconds() - selectedR.sent) * 1000,
+                )
                 if selectedR.actionParameters is not None:
                     selectedR.dCallback.callback(
                         (selectedR.actionParameters, busOp.instruction.params)
@@ -788,12 +899,12 @@ class HbusMaster:
 
             if busOp.instruction.command == HBUSCOMMAND_BUSLOCK:
 
-                self.hbusBusState = HbusBusState.LOCKED_OTHER
+                port.hbusBusState = HbusBusState.LOCKED_OTHER
 
             elif busOp.instruction.command == HBUSCOMMAND_BUSUNLOCK:
 
-                self.hbusBusState = HbusBusState.FREE
-                self.hbusBusLockedWith = None
+                port.hbusBusState = HbusBusState.FREE
+                port.hbusBusLockedWith = None
 
                 self._bus_free()
 
@@ -809,23 +920,45 @@ class HbusMaster:
         timeoutCallBackParams=None,
         immediate=False,
         deferredReturn=None,
+        priority=HbusCommandPriority.READ,
     ):
         """Push command into outgoing queue."""
         d = None
-        if self.hbusRxState != HbusRXState.SBID and immediate is False:
+        port = self._port_for(dest)
+        if port.busy and immediate is False:
             d = defer.Deferred()
             d.addCallback(
-                self._push_command,
-                command,
-                dest,
-                params,
-                callBack,
-                callBackParams,
-                timeout,
-                timeoutCallBack,
-                timeoutCallBackParams,
+                lambda _: self._push_command(
+                    command,
+                    dest,
+                    params,
+                    callBack,
+                    callBackParams,
+                    timeout,
+                    timeoutCallBack,
+                    timeoutCallBackParams,
+                    priority=priority,
+                )
             )
-            self.outgoingCommands.appendleft(d)
+
+            # bus lock state must not be lost
+            force = command in (HBUSCOMMAND_BUSLOCK, HBUSCOMMAND_BUSUNLOCK)
+            if port.outgoingCommands.push(d, dest, priority, force) is False:
+                self.logger.warning(
+                    "outgoing %s queue full, dropping command to %s",
+                    HbusCommandPriority.NAMES[priority],
+                    dest,
+                )
+                # fails like an unanswered command
+                d = None
+                if timeoutCallBack is not None:
+                    d = defer.Deferred()
+                    d.addErrback(timeoutCallBack)
+                    self.clock.callLater(
+                        0,
+                        d.errback,
+                        HBUSQueueFullException(timeoutCallBackParams),
+                    )
 
             return d
         else:
@@ -865,15 +998,17 @@ class HbusMaster:
 
     def _send_command(self, command, dest, params=(), block=False):
         """Send the actual complete command."""
+        port = self._port_for(dest)
+
         # warning: blocking
         if block:
-            while self.hbusRxState != 0:
+            while port.busy:
                 time.sleep(0.01)
 
         busOp = HbusOperation(
             HbusInstruction(command, len(params), params),
             dest,
-            self.hbusMasterAddr,
+            port.address,
         )
 
         # very slow!!
@@ -881,35 +1016,45 @@ class HbusMaster:
 
         if command == HBUSCOMMAND_BUSLOCK:
 
-            self.hbusBusState = HbusBusState.LOCKED_THIS
-            self.hbusBusLockedWith = dest
+            port.hbusBusState = HbusBusState.LOCKED_THIS
+            port.hbusBusLockedWith = dest
 
         elif command == HBUSCOMMAND_BUSUNLOCK:
 
             if (
-                self.hbusBusState == HbusBusState.LOCKED_THIS
-                and self.hbusBusLockedWith == dest
+                port.hbusBusState == HbusBusState.LOCKED_THIS
+                and port.hbusBusLockedWith == dest
             ):
 
-                self.hbusBusState = HbusBusState.FREE
-                self.hbusBusLockedWith = None
+                port.hbusBusState = HbusBusState.FREE
+                port.hbusBusLockedWith = None
                 self._bus_free()
 
             else:
 
                 self.logger.debug(
                     "BUSUNLOCK error: locked with %s, tried unlocking %s"
-                    % (self.hbusBusLockedWith, dest)
+                    % (port.hbusBusLockedWith, dest)
                 )
 
-        op_str = busOp.get_packed()
-        self.txBytes += len(op_str)
-        if self.masterState == HbusMasterState.hbusMasterScanning:
-            reactor.callFromThread(
-                self.serial_write, op_str
-            )  # @UndefinedVariable
-        else:
-            self.serial_write(op_str)
+        elif command == HBUSCOMMAND_SEARCH:
+
+            # ping round trip times are measured from here
+            self.livenessMonitor.ping_sent(dest)
+
+        self.metrics.frame_sent(command)
+        port.send(busOp)
+
+    def _port_write(self, data, port):
+        """Write packed frames to a bus.
+
+        @param data packed frames
+        @param port HbusBusPort object
+        """
+        if self.capture is not None:
+            self.capture.record(CAPTURE_TX, data, port.bus)
+
+        self.serial_write(data, port)
 
     def _expect_response(
         self,
@@ -935,12 +1080,13 @@ class HbusMaster:
             actionParameters,
             timeoutAction,
             timeoutActionParameters,
+            clock=self.clock,
         )
 
         # timeout handler
-        timeoutHandler = reactor.callLater(
+        timeoutHandler = self.clock.callLater(
             timeout / 1000, self._response_timeout, pending
-        )  # @UndefinedVariable
+        )
         pending.timeout_handler = timeoutHandler
 
         self.expectedResponseQueue.append(pending)
@@ -959,7 +1105,7 @@ class HbusMaster:
                 # doesn't know virtual bus number
                 addr = HbusDeviceAddress(VIRTUAL_BUS, address)
                 slaveInfo.hbusSlaveAddress = addr
-                self.virtualDeviceList[addr.global_id] = slaveInfo
+                self.registry.add(slaveInfo)
             else:
                 # not supported
                 raise UserWarning(
@@ -968,7 +1114,7 @@ class HbusMaster:
                 return
         else:
             addr = address
-            self.detectedSlaveList[address.global_id] = HbusDevice(address)
+            self.registry.add(HbusDevice(address))
 
         self.logger.info("New device registered at " + str(addr))
         self.logger.debug("New device UID is " + str(addr.global_id))
@@ -978,121 +1124,145 @@ class HbusMaster:
     def unregister_slave(self, address, virtual=False):
         """Unregister slave by address."""
         if virtual:
-            del self.virtualDeviceList[
-                hbusSlaveAddress(VIRTUAL_BUS, address).global_id
-            ]
-        else:
-            del self.detectedSlaveList[address.global_id]
+            address = HbusDeviceAddress(VIRTUAL_BUS, address)
+
+        self.registry.remove(address, virtual)
+        self.pollingScheduler.remove_device(address)
 
         self.logger.info("Device at " + str(address) + " removed")
 
-    def _slave_read_start(self):
-        """Start reading slave definition."""
-        try:
-            self.slaveReadDeferred.callback(None)
-        except defer.AlreadyCalledError:
-            pass
+    def _slave_read_end(self, callBackResult, port):
+        """Slave definition retrieval on a bus ended."""
+        self.logger.info(
+            "Device information retrieval on bus %d finished in %.2f s",
+            port.bus,
+            self.clock.seconds() - port.scanStarted,
+        )
 
-    def _slave_read_end(self, callBackResult):
-        """Slave definition retrieval ended."""
-        # self.logger.debug("Device information retrieval ended.")
+        self.operationalPending = True
+        self._bus_operational(port)
 
-        # self.slaveReadDeferred = None
+    def _bus_operational(self, port):
+        """Enter operational stage once every bus is done scanning.
 
-        self.masterState = HbusMasterState.hbusMasterOperational
-        # reactor.callInThread(self.processHiddenObjects)
-        self.logger.info("Device information retrieval finished.")
+        @param port HbusBusPort object of the bus that is done
+        """
+        port.state = HbusMasterState.hbusMasterOperational
+
+        if self.operationalPending is False:
+            return
+
+        for other in self.ports.values():
+            if other.state != HbusMasterState.hbusMasterOperational:
+                return
+
+        self.operationalPending = False
         self.logger.debug("tx: %d, rx %d bytes", self.txBytes, self.rxBytes)
+        self.logger.debug(
+            "pending responses: %d, max %d",
+            len(self.expectedResponseQueue),
+            self.expectedResponseQueue.max_depth,
+        )
 
+        self.schedule_polling()
         self.enter_operational()
 
-    def _slave_basic_read_end(self, *params):
-        """Slave basic definition retrieval ended."""
-        d = defer.Deferred()
-        d.addCallback(self._slave_read_ext)
+    def poll_interval(self, slave, number):
+        """Get polling interval of a device object.
 
-        if params[0].global_id == list(self.detectedSlaveList.keys())[-1]:
-            self.slaveReadDeferred.addCallback(self._slave_read_end)
+        @param slave device object
+        @param number object number
+        @return interval in ms, 0 if not polled
+        """
+        obj = slave.hbusSlaveObjects[number]
+        if obj.permissions == HbusObjectPermissions.WRITE:
+            return 0
 
-        reactor.callLater(0.1, d.callback, *params)  # @UndefinedVariable
+        key = (slave.hbusSlaveUniqueDeviceInfo, number)
+        if key in self.pollObjectIntervals:
+            return self.pollObjectIntervals[key]
 
-        return d
+        return self.pollLevelIntervals.get(obj.objectLevel, self.pollInterval)
 
-    def _slave_read_object_fail(self, params):
-        """Slave object read failed callback."""
-        self.logger.warning("Failure while analyzing device")
+    def schedule_polling(self):
+        """Poll objects of enumerated devices as configured."""
+        objects = []
+        for slave in self.registry.devices.values():
+            if slave.basicInformationRetrieved is False:
+                continue
 
-        self.slaveScanDeferred.errback(
-            IOError("Failure while analyzing device")
-        )
+            for number in slave.hbusSlaveObjects:
+                objects.append(
+                    (
+                        slave.hbusSlaveAddress,
+                        number,
+                        self.poll_interval(slave, number),
+                    )
+                )
 
-    def _slave_basic_read_fail(self, *params):
-        """Slave basic read has failed."""
-        (
-            failure,
-            address,
-        ) = params
+        self.pollingScheduler.schedule(objects)
+        if len(self.pollingScheduler) > 0:
+            self.logger.debug(
+                "polling %d objects", len(self.pollingScheduler)
+            )
 
-        # try again at enumeration end
-        if self.detectedSlaveList[address.global_id].scanRetryCount < 3:
-            self.slaveReadDeferred.addCallback(self._slave_read_basic, address)
-            self.detectedSlaveList[address.global_id].scanRetryCount += 1
-        else:
-            if address.global_id == list(self.detectedSlaveList.keys())[-1]:
-                self.slaveReadDeferred.addCallback(self._slave_read_end)
+    def invalidate_descriptor_cache(self, uid=None):
+        """Drop cached device descriptors.
 
-    def _slave_ext_read_end(self, *params):
-        """Slave extended information retrieval ended."""
-        result, address = params
+        Devices are scanned completely the next time they are enumerated.
+        @param uid device UID, drops all devices if None
+        @return number of devices dropped from cache
+        """
+        if self.descriptorCache is None:
+            return 0
 
-        self.detectedSlaveList[address.global_id].hbusSlaveHiddenObjects = None
+        count = self.descriptorCache.invalidate(uid)
+        self.descriptorCache.save()
 
-    def _slave_ext_read_fail(self, *params):
-        """Slave extended retrieval failed."""
-        (
-            failure,
-            address,
-        ) = params
+        self.logger.info("%d device descriptors dropped from cache", count)
 
-        # if self.detectedSlaveList[address.global_id].scanRetryCount < 3:
-        #    self.slaveHiddenDeferred.addCallback(self.readExtendedSlaveInformation,address)
-        #    self.detectedSlaveList[address.global_id].scanRetryCount += 1
+        return count
 
-    def _slave_read_ext(self, *params):
-        self.logger.debug("Invisible objects being processed now")
+    def _slave_read_object_fail(self, failure, address):
+        """Slave object read failed callback."""
+        self.logger.warning("Failure while analyzing device")
 
-        address = params[0]
+        slave = self.registry.get(address)
+        if slave is None:
+            return
 
-        if address is None:
-            address = params[1]
+        # start over, other devices are scanned in the meantime
+        if slave.scanRetryCount < 3:
+            slave.scanRetryCount += 1
+            self._slave_read_basic(address)
 
-        self.detectedSlaveList[address.global_id].scanRetryCount = 0
+    def _slave_ext_read_end(self, address):
+        """Slave extended information retrieval ended."""
+        slave = self.registry.get(address)
+        slave.hbusSlaveHiddenObjects = None
 
-        d = defer.Deferred()
+        # extended information is complete, build final codecs
+        for obj in slave.hbusSlaveObjects.values():
+            obj.compile_codec()
 
-        for obj in list(
-            self.detectedSlaveList[
-                address.global_id
-            ].hbusSlaveHiddenObjects.keys()
-        ):
-            d.addCallback(self._slave_hidden_object_read, address, obj)
-            d.addCallback(self._slave_process_hidden_obj, address, obj)
+    def _slave_ext_read_fail(self, failure, address):
+        """Slave extended retrieval failed."""
+        self.logger.debug("Failure reading invisible object of %s", address)
 
-        d.addCallback(self._slave_ext_read_end, address)
-        d.addErrback(self._slave_ext_read_fail, address)
-        self.slaveHiddenDeferred = d
+    def _slave_read_ext(self, address):
+        """Read invisible objects."""
+        self.logger.debug("Invisible objects being processed now")
 
-        # inicia
-        reactor.callLater(0.1, d.callback, None)  # @UndefinedVariable
+        slave = self.registry.get(address)
+        slave.scanRetryCount = 0
 
-        return d
+        for obj in list(slave.hbusSlaveHiddenObjects.keys()):
+            self._slave_hidden_object_read(address, obj)
 
-    def _slave_process_hidden_obj(self, deferredResult, address, objectNumber):
+    def _slave_process_hidden_obj(self, address, objectNumber):
         """Process hidden object."""
-        obj = self.detectedSlaveList[address.global_id].hbusSlaveHiddenObjects[
-            objectNumber
-        ]
-        slave = self.detectedSlaveList[address.global_id]
+        slave = self.registry.get(address)
+        obj = slave.hbusSlaveHiddenObjects[objectNumber]
 
         objFunction = obj.description.split(":")
         objList = objFunction[0].split(",")
@@ -1101,51 +1271,26 @@ class HbusMaster:
             x = re.match(r"([0-9]+)-([0-9]+)", objSel)
 
             if x is not None:
-                for rangeObj in range(int(x.group(1)), int(x.group(2)) + 1):
-
-                    if (
-                        slave.hbusSlaveObjects[rangeObj].objectExtendedInfo
-                        is None
-                    ):
-                        slave.hbusSlaveObjects[
-                            rangeObj
-                        ].objectExtendedInfo = {}
-
-                        slave.hbusSlaveObjects[rangeObj].objectExtendedInfo[
-                            objFunction[1]
-                        ] = obj.last_value
-
+                targets = range(int(x.group(1)), int(x.group(2)) + 1)
             else:
-                if (
-                    slave.hbusSlaveObjects[int(objSel)].objectExtendedInfo
-                    is None
-                ):
-                    slave.hbusSlaveObjects[int(objSel)].objectExtendedInfo = {}
+                targets = [int(objSel)]
 
-                    slave.hbusSlaveObjects[int(objSel)].objectExtendedInfo[
-                        objFunction[1]
-                    ] = obj.last_value
+            for target in targets:
+                target = slave.hbusSlaveObjects[target]
+                if target.objectExtendedInfo is None:
+                    target.objectExtendedInfo = {}
 
-    # TODO: this method is horrible
-    def _slave_read_basic(self, deferResult, address):
+                target.objectExtendedInfo[objFunction[1]] = obj.last_value
+                # rebuilt with new information when used
+                target.codec = None
+
+    def _slave_read_basic(self, address):
         """Read basic slave information."""
         self.logger.debug(
             "Initializing device analysis " + str(address.global_id)
         )
 
-        d = defer.Deferred()
-        d.addCallback(self._slave_basic_read_end)
-        d.addErrback(self._slave_basic_read_fail, address)
-        self.slaveScanDeferred = d
-
-        self.detectedSlaveList[address.global_id].readEndedCallback = d
-        self.detectedSlaveList[address.global_id].readEndedParams = address
-
-        # BUSLOCK
-        # self.sendCommand(HBUSCOMMAND_BUSLOCK,address)
-
-        # self.expectResponse(HBUSCOMMAND_QUERY_RESP,address,self.receiveSlaveInformation,actionParameters=("Q",address))
-        self._push_command(
+        self.scanScheduler.request(
             HBUSCOMMAND_QUERY,
             address,
             params=[0],
@@ -1154,89 +1299,85 @@ class HbusMaster:
             timeoutCallBack=self._slave_read_object_fail,
         )
 
-        return d
+    def _slave_basic_read_end(self, address):
+        """Slave basic definition retrieval ended."""
+        slave = self.registry.get(address)
+
+        self.logger.debug(
+            "Analysis of device " + str(address.global_id) + " finished"
+        )
+        slave.basicInformationRetrieved = True
+
+        if self.descriptorCache is not None:
+            # saved right away, enumeration may never finish
+            self.descriptorCache.store(slave)
+            self.descriptorCache.save()
+
+        slave.sortObjects()
+        for obj in slave.hbusSlaveObjects.values():
+            obj.compile_codec()
+
+        self._slave_read_ext(address)
 
     def _slave_receive(self, data):
         """Receive slave information."""
-        self.logger.debug("in receiveSlaveInformation; {}".format(data[0][0]))
-        if data[0][0] == "Q":
+        step, address = data[0]
+        slave = self.registry.get(address)
+
+        self.logger.debug("in receiveSlaveInformation; {}".format(step))
+        if step == "Q":
 
-            self.detectedSlaveList[
-                data[0][1].global_id
-            ].hbusSlaveDescription = bytes(data[1][4::]).decode("ascii")
+            slave.hbusSlaveDescription = bytes(data[1][4::]).decode("ascii")
 
             # read device's objects information
-            # self.expectResponse(HBUSCOMMAND_RESPONSE,data[0][1],self.receiveSlaveInformation,actionParameters=("V",data[0][1]))
-            self._push_command(
+            self.scanScheduler.request(
                 HBUSCOMMAND_GETCH,
-                data[0][1],
+                address,
                 params=[0],
                 callBack=self._slave_receive,
-                callBackParams=("V", data[0][1]),
+                callBackParams=("V", address),
                 timeoutCallBack=self._slave_read_object_fail,
             )
 
-        elif data[0][0] == "V":
+        elif step == "V":
 
-            self.detectedSlaveList[
-                data[0][1].global_id
-            ].hbusSlaveObjectCount = data[1][0]
-
-            self.detectedSlaveList[
-                data[0][1].global_id
-            ].hbusSlaveEndpointCount = data[1][1]
-
-            self.detectedSlaveList[
-                data[0][1].global_id
-            ].hbusSlaveInterruptCount = data[1][2]
-
-            self.detectedSlaveList[
-                data[0][1].global_id
-            ].hbusSlaveCapabilities = data[1][3]
+            slave.hbusSlaveObjectCount = data[1][0]
+            slave.hbusSlaveEndpointCount = data[1][1]
+            slave.hbusSlaveInterruptCount = data[1][2]
+            slave.hbusSlaveCapabilities = data[1][3]
 
             # capabilities
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveHasAUTH = (
+            slave.hbusSlaveHasAUTH = (
                 True if data[1][3] & HbusDeviceCapabilities.AUTHSUP else False
             )
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveHasCRYPTO = (
+            slave.hbusSlaveHasCRYPTO = (
                 True
                 if data[1][3] & HbusDeviceCapabilities.CRYPTOSUP
                 else False
             )
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveHasEP = (
+            slave.hbusSlaveHasEP = (
                 True if data[1][3] & HbusDeviceCapabilities.EPSUP else False
             )
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveHasINT = (
+            slave.hbusSlaveHasINT = (
                 True if data[1][3] & HbusDeviceCapabilities.INTSUP else False
             )
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveHasUCODE = (
+            slave.hbusSlaveHasUCODE = (
                 True if data[1][3] & HbusDeviceCapabilities.UCODESUP else False
             )
-            self.detectedSlaveList[
-                data[0][1].global_id
-            ].hbusSlaveHasREVAUTH = (
+            slave.hbusSlaveHasREVAUTH = (
                 True
                 if data[1][3] & HbusDeviceCapabilities.REVAUTHSUP
                 else False
             )
 
-            (
-                self.detectedSlaveList[
-                    data[0][1].global_id
-                ].hbusSlaveUniqueDeviceInfo,
-            ) = struct.unpack("I", bytes(data[1][4:8]))
-
-            # self.detectedSlaveList[data[0][1].global_id].basicInformationRetrieved = True
+            (uid,) = struct.unpack("I", bytes(data[1][4:8]))
+            self.registry.set_uid(slave, uid)
 
             self.logger.info(
                 "Device at "
-                + str(data[0][1])
+                + str(address)
                 + " identified as "
-                + str(
-                    self.detectedSlaveList[
-                        data[0][1].global_id
-                    ].hbusSlaveDescription
-                )
+                + str(slave.hbusSlaveDescription)
                 + "("
                 + str(data[1][0])
                 + ","
@@ -1244,378 +1385,225 @@ class HbusMaster:
                 + ","
                 + str(data[1][2])
                 + ") <"
-                + str(
-                    hex(
-                        self.detectedSlaveList[
-                            data[0][1].global_id
-                        ].hbusSlaveUniqueDeviceInfo
-                    )
-                )
+                + str(hex(slave.hbusSlaveUniqueDeviceInfo))
                 + ">"
             )
 
             self.logger.debug(
                 "Retrieving device's objects information "
-                + str(data[0][1].global_id)
+                + str(address.global_id)
             )
 
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveObjects = {}
+            if (
+                self.descriptorCache is not None
+                and self.descriptorCache.restore(slave)
+            ):
+                self.logger.debug(
+                    "Device descriptors loaded from cache "
+                    + str(address.global_id)
+                )
+                self._slave_basic_read_end(address)
+                return
+
+            slave.hbusSlaveObjects = {}
 
-            # self.expectResponse(HBUSCOMMAND_QUERY_RESP,data[0][1],self.receiveSlaveInformation,actionParameters=("O",data[0][1]))
-            self._push_command(
+            self.scanScheduler.request(
                 HBUSCOMMAND_QUERY,
-                data[0][1],
+                address,
                 params=[1],
                 callBack=self._slave_receive,
-                callBackParams=("O", data[0][1]),
+                callBackParams=("O", address),
                 timeoutCallBack=self._slave_read_object_fail,
             )
 
-        elif data[0][0] == "O":
+        elif step == "O":
 
-            currentObject = (
-                len(
-                    self.detectedSlaveList[
-                        data[0][1].global_id
-                    ].hbusSlaveObjects
-                )
-                + 1
-            )
+            currentObject = len(slave.hbusSlaveObjects) + 1
 
             self.logger.debug(
                 "Analysing object "
                 + str(currentObject)
                 + ", in device with ID "
-                + str(data[0][1].global_id)
+                + str(address.global_id)
             )
 
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveObjects[
-                currentObject
-            ] = HbusDeviceObject()
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveObjects[
-                currentObject
-            ].permissions = (data[1][0] & 0x03)
+            obj = HbusDeviceObject()
+            slave.hbusSlaveObjects[currentObject] = obj
+            obj.permissions = data[1][0] & 0x03
 
             if data[1][0] & 0x04:
-                self.detectedSlaveList[data[0][1].global_id].hbusSlaveObjects[
-                    currentObject
-                ].is_crypto = True
+                obj.is_crypto = True
 
             if data[1][0] & 0x08:
-                self.detectedSlaveList[data[0][1].global_id].hbusSlaveObjects[
-                    currentObject
-                ].hidden = True
+                obj.hidden = True
 
             if data[1][0] & 0x30 == 0:
-                self.detectedSlaveList[data[0][1].global_id].hbusSlaveObjects[
-                    currentObject
-                ].objectDataType = HbusObjDataType.dataTypeInt
+                obj.objectDataType = HbusObjDataType.dataTypeInt
             else:
-                self.detectedSlaveList[data[0][1].global_id].hbusSlaveObjects[
-                    currentObject
-                ].objectDataType = (data[1][0] & 0x30)
-
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveObjects[
-                currentObject
-            ].objectLevel = (data[1][0] & 0xC0) >> 6
+                obj.objectDataType = data[1][0] & 0x30
 
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveObjects[
-                currentObject
-            ].size = data[1][1]
+            obj.objectLevel = (data[1][0] & 0xC0) >> 6
+            obj.size = data[1][1]
+            obj.objectDataTypeInfo = data[1][2]
+            obj.description = "".join(bytes(data[1][4::]).decode("ascii"))
 
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveObjects[
-                currentObject
-            ].objectDataTypeInfo = data[1][2]
+            if currentObject + 1 < slave.hbusSlaveObjectCount:
 
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveObjects[
-                currentObject
-            ].description = "".join(bytes(data[1][4::]).decode("ascii"))
-
-            if (
-                currentObject + 1
-                < self.detectedSlaveList[
-                    data[0][1].global_id
-                ].hbusSlaveObjectCount
-            ):
-
-                # self.expectResponse(HBUSCOMMAND_QUERY_RESP,data[0][1],self.receiveSlaveInformation,actionParameters=("O",data[0][1]))
-                self._push_command(
+                self.scanScheduler.request(
                     HBUSCOMMAND_QUERY,
-                    data[0][1],
+                    address,
                     params=[currentObject + 1],
                     callBack=self._slave_receive,
-                    callBackParams=("O", data[0][1]),
+                    callBackParams=("O", address),
                     timeoutCallBack=self._slave_read_object_fail,
                 )
-            else:
 
-                # RECEIVES ENDPOINT INFO
-                if (
-                    self.detectedSlaveList[
-                        data[0][1].global_id
-                    ].hbusSlaveEndpointCount
-                    > 0
-                ):
+            # RECEIVES ENDPOINT INFO
+            elif slave.hbusSlaveEndpointCount > 0:
 
-                    self.logger.debug(
-                        "Retrieving device's endpoints information "
-                        + str(data[0][1].global_id)
-                    )
+                self.logger.debug(
+                    "Retrieving device's endpoints information "
+                    + str(address.global_id)
+                )
 
-                    # self.expectResponse(HBUSCOMMAND_QUERY_RESP,data[0][1],self.receiveSlaveInformation,actionParameters=("E",data[0][1]))
-                    self._push_command(
-                        HBUSCOMMAND_QUERY_EP,
-                        data[0][1],
-                        params=[0],
-                        callBack=self._slave_receive,
-                        callBackParams=("E", data[0][1]),
-                    )
+                self.scanScheduler.request(
+                    HBUSCOMMAND_QUERY_EP,
+                    address,
+                    params=[0],
+                    callBack=self._slave_receive,
+                    callBackParams=("E", address),
+                    timeoutCallBack=self._slave_read_object_fail,
+                )
 
-                elif (
-                    self.detectedSlaveList[
-                        data[0][1].global_id
-                    ].hbusSlaveInterruptCount
-                    > 0
-                ):
+            elif slave.hbusSlaveInterruptCount > 0:
 
-                    self.logger.debug(
-                        "Retrieving device's interrupts information "
-                        + str(data[0][1].global_id)
-                    )
+                self.logger.debug(
+                    "Retrieving device's interrupts information "
+                    + str(address.global_id)
+                )
 
-                    # self.expectResponse(HBUSCOMMAND_QUERY_RESP,data[0][1],self.receiveSlaveInformation,actionParameters=("I",data[0][1]))
-                    self._push_command(
-                        HBUSCOMMAND_QUERY_INT,
-                        data[0][1],
-                        params=[0],
-                        callBack=self._slave_receive,
-                        callBackParams=("I", data[0][1]),
-                        timeoutCallBack=self._slave_read_object_fail,
-                    )
+                self.scanScheduler.request(
+                    HBUSCOMMAND_QUERY_INT,
+                    address,
+                    params=[0],
+                    callBack=self._slave_receive,
+                    callBackParams=("I", address),
+                    timeoutCallBack=self._slave_read_object_fail,
+                )
 
-                else:
-                    # self.pushCommand(HBUSCOMMAND_BUSUNLOCK,data[0][1])
-                    self.logger.debug(
-                        "Analysis of device "
-                        + str(data[0][1].global_id)
-                        + " finished"
-                    )
-                    # self.processHiddenObjects(self.detectedSlaveList[data[0][1].global_id])
-                    self.detectedSlaveList[
-                        data[0][1].global_id
-                    ].basicInformationRetrieved = True
-
-                    self.detectedSlaveList[data[0][1].global_id].sortObjects()
-
-                    if (
-                        self.detectedSlaveList[
-                            data[0][1].global_id
-                        ].readEndedCallback
-                        is not None
-                    ):
-                        reactor.callLater(
-                            HBUS_SLAVE_QUERY_INTERVAL,
-                            self.detectedSlaveList[
-                                data[0][1].global_id
-                            ].readEndedCallback.callback,
-                            self.detectedSlaveList[
-                                data[0][1].global_id
-                            ].readEndedParams,
-                        )  # @UndefinedVariable
-
-        elif data[0][0] == "E":
+            else:
+                self._slave_basic_read_end(address)
+
+        elif step == "E":
 
             # ENDPOINTS
 
-            currentEndpoint = (
-                len(
-                    self.detectedSlaveList[
-                        data[0][1].global_id
-                    ].hbusSlaveEndpoints
-                )
-                + 1
-            )
+            currentEndpoint = len(slave.hbusSlaveEndpoints) + 1
 
             self.logger.debug(
                 "Analysing endpoint "
                 + str(currentEndpoint)
                 + ", device with ID "
-                + str(data[0][1].global_id)
+                + str(address.global_id)
             )
 
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveEndpoints[
-                currentEndpoint
-            ] = HbusEndpoint()
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveEndpoints[
-                currentEndpoint
-            ].endpointDirection = ord(data[1][0])
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveEndpoints[
-                currentEndpoint
-            ].endpointBlockSize = ord(data[1][1])
-
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveEndpoints[
-                currentEndpoint
-            ].endpointDescription = "".join(data[1][3::])
+            endpoint = HbusEndpoint()
+            slave.hbusSlaveEndpoints[currentEndpoint] = endpoint
+            endpoint.endpointDirection = ord(data[1][0])
+            endpoint.endpointBlockSize = ord(data[1][1])
+            endpoint.endpointDescription = "".join(data[1][3::])
 
-            if (
-                currentEndpoint + 1
-                < self.detectedSlaveList[
-                    data[0][1].global_id
-                ].hbusSlaveEndpointCount
-            ):
+            if currentEndpoint + 1 < slave.hbusSlaveEndpointCount:
 
-                # self.expectResponse(HBUSCOMMAND_QUERY_RESP,data[0][1],self.receiveSlaveInformation,actionParameters=("E",data[0][1]))
-                self._push_command(
+                self.scanScheduler.request(
                     HBUSCOMMAND_QUERY_EP,
-                    data[0][1],
+                    address,
                     params=[currentEndpoint + 1],
                     callBack=self._slave_receive,
-                    callBackParams=("E", data[0][1]),
+                    callBackParams=("E", address),
                     timeoutCallBack=self._slave_read_object_fail,
                 )
 
-            else:
+            # INTERRUPT INFO
+            elif slave.hbusSlaveInterruptCount > 0:
 
-                # INTERRUPT INFO
-                if (
-                    self.detectedSlaveList[
-                        data[0][1].global_id
-                    ].hbusSlaveInterruptCount
-                    > 0
-                ):
+                self.logger.debug(
+                    "Retrieving device's endpoints information "
+                    + str(address.global_id)
+                )
 
-                    self.logger.debug(
-                        "Retrieving device's endpoints information "
-                        + str(data[0][1].global_id)
-                    )
+                self.scanScheduler.request(
+                    HBUSCOMMAND_QUERY_INT,
+                    address,
+                    params=[0],
+                    callBack=self._slave_receive,
+                    callBackParams=("I", address),
+                    timeoutCallBack=self._slave_read_object_fail,
+                )
 
-                    # self.expectResponse(HBUSCOMMAND_QUERY_RESP,data[0][1],self.receiveSlaveInformation,actionParameters=("I",data[0][1]))
-                    self._push_command(
-                        HBUSCOMMAND_QUERY_INT,
-                        data[0][1],
-                        params=[0],
-                        callBack=self._slave_receive,
-                        callBackParams=("I", data[0][1]),
-                        timeoutCallBack=self._slave_read_object_fail,
-                    )
+            else:
+                self._slave_basic_read_end(address)
 
-                else:
-                    # self.sendCommand(HBUSCOMMAND_BUSUNLOCK,data[0][1])
-                    self.logger.debug(
-                        "Analysis of device "
-                        + str(data[0][1].global_id)
-                        + " finished"
-                    )
-                    self.detectedSlaveList[
-                        data[0][1].global_id
-                    ].basicInformationRetrieved = True
-
-                    self.detectedSlaveList[data[0][1].global_id].sortObjects()
-
-                    if (
-                        self.detectedSlaveList[
-                            data[0][1].global_id
-                        ].readEndedCallback
-                        is not None
-                    ):
-                        reactor.callLater(
-                            HBUS_SLAVE_QUERY_INTERVAL,
-                            self.detectedSlaveList[
-                                data[0][1].global_id
-                            ].readEndedCallback.callback,
-                            self.detectedSlaveList[
-                                data[0][1].global_id
-                            ].readEndedParams,
-                        )  # @UndefinedVariable
-
-        elif data[0][0] == "I":
+        elif step == "I":
 
             # INTERRUPTS
 
-            currentInterrupt = (
-                len(
-                    self.detectedSlaveList[
-                        data[0][1].global_id
-                    ].hbusSlaveInterrupts
-                )
-                + 1
-            )
+            currentInterrupt = len(slave.hbusSlaveInterrupts) + 1
 
             self.logger.debug(
                 "Analyzing interrupt "
                 + str(currentInterrupt)
                 + ", device ID "
-                + str(data[0][1].global_id)
+                + str(address.global_id)
             )
 
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveInterrupts[
-                currentInterrupt
-            ] = HbusInterrupt()
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveInterrupts[
-                currentInterrupt
-            ].interruptFlags = ord(data[1][0])
-
-            self.detectedSlaveList[data[0][1].global_id].hbusSlaveInterrupts[
-                currentInterrupt
-            ].interruptDescription = "".join(data[1][2::])
+            interrupt = HbusInterrupt()
+            slave.hbusSlaveInterrupts[currentInterrupt] = interrupt
+            interrupt.interruptFlags = ord(data[1][0])
+            interrupt.interruptDescription = "".join(data[1][2::])
 
-            if (
-                currentInterrupt + 1
-                < self.detectedSlaveList[
-                    data[0][1].global_id
-                ].hbusSlaveInterruptCount
-            ):
+            if currentInterrupt + 1 < slave.hbusSlaveInterruptCount:
 
-                # self.expectResponse(HBUSCOMMAND_QUERY_RESP,data[0][1],self.receiveSlaveInformation,actionParameters=("I",data[0][1]))
-                self._push_command(
+                self.scanScheduler.request(
                     HBUSCOMMAND_QUERY_INT,
-                    data[0][1],
+                    address,
                     params=[currentInterrupt + 1],
                     callBack=self._slave_receive,
-                    callBackParams=("I", data[0][1]),
+                    callBackParams=("I", address),
                     timeoutCallBack=self._slave_read_object_fail,
                 )
 
             else:
-                # self.sendCommand(HBUSCOMMAND_BUSUNLOCK,data[0][1])
-                self.logger.debug(
-                    "device analysis "
-                    + str(data[0][1].global_id)
-                    + " finished"
-                )
-                # self.processHiddenObjects(self.detectedSlaveList[data[0][1].global_id])
-                self.detectedSlaveList[
-                    data[0][1].global_id
-                ].basicInformationRetrieved = True
+                self._slave_basic_read_end(address)
 
-                self.detectedSlaveList[data[0][1].global_id].sortObjects()
-
-                if (
-                    self.detectedSlaveList[
-                        data[0][1].global_id
-                    ].readEndedCallback
-                    is not None
-                ):
-                    reactor.callLater(
-                        HBUS_SLAVE_QUERY_INTERVAL,
-                        self.detectedSlaveList[
-                            data[0][1].global_id
-                        ].readEndedCallback.callback,
-                        self.detectedSlaveList[
-                            data[0][1].global_id
-                        ].readEndedParams,
-                    )  # @UndefinedVariable
-
-        elif data[0][0] == "D":
+        elif step == "D":
 
             # info dump
             pass
 
     def slave_object_read(
-        self, address, number, callBack=None, timeoutCallback=None
+        self,
+        address,
+        number,
+        callBack=None,
+        timeoutCallback=None,
+        maxAge=None,
+        priority=HbusCommandPriority.READ,
     ):
-        """Read slave object."""
-        d = None
+        """Read slave object.
+
+        The last value received is used instead if it is recent enough, and
+        reads of an object already being read wait for the same answer.
+        @param address device address
+        @param number object number
+        @param callBack called with value read
+        @param timeoutCallback called with failure if the device does not
+        answer
+        @param maxAge maximum age of a cached value in ms, object or master
+        default if None
+        @param priority HbusCommandPriority class of the read command
+        """
+        obj = self.registry.get(address).hbusSlaveObjects[number]
 
         # see if this is a virtual device first
         if address.bus_number == VIRTUAL_BUS:
@@ -1623,31 +1611,13 @@ class HbusMaster:
             result = self.pluginManager.m_read_vdev_obj(
                 address.dev_number, number
             )
-            self.virtualDeviceList[address.global_id].hbusSlaveObjects[
-                number
-            ].last_value = result
+            obj.last_value = result
 
             if callBack is not None:
                 callBack(result)
             return
 
-        if (
-            self.detectedSlaveList[address.global_id]
-            .hbusSlaveObjects[number]
-            .permissions
-            != HbusObjectPermissions.WRITE
-        ):
-
-            d = self._push_command(
-                HBUSCOMMAND_GETCH,
-                address,
-                params=[chr(number)],
-                callBack=self._slave_obj_data_rx,
-                callBackParams=(address, number, callBack),
-                timeoutCallBack=timeoutCallback,
-            )
-
-        else:
+        if obj.permissions == HbusObjectPermissions.WRITE:
 
             self.logger.warning("Write-only object read attempted")
             self.logger.debug(
@@ -1657,40 +1627,112 @@ class HbusMaster:
             )
             raise IOError("cannot read write-only object")
 
-            if callBack is not None:
-                callBack(None)
+        if maxAge is None:
+            maxAge = obj.max_age
+        if maxAge is None:
+            maxAge = self.valueMaxAge
+
+        if obj.last_update is not None and maxAge > 0:
+            age = self.clock.seconds() - obj.last_update
+            if age * 1000 <= maxAge:
+                if callBack is not None:
+                    callBack(obj.last_value)
+                return
+
+        key = (address.global_id, number)
+        waiting = self.pendingReads.get(key)
+        if waiting is not None:
+            # already being read, share answer
+            waiting.append((callBack, timeoutCallback))
+            return
+
+        self.pendingReads[key] = [(callBack, timeoutCallback)]
+
+        return self._push_command(
+            HBUSCOMMAND_GETCH,
+            address,
+            params=[chr(number)],
+            callBack=self._slave_obj_data_rx,
+            callBackParams=(address, number),
+            timeoutCallBack=self._slave_obj_read_timeout,
+            timeoutCallBackParams=(address, number),
+            priority=priority,
+        )
+
+    def read_object(
+        self, address, number, max_age=None, priority=HbusCommandPriority.READ
+    ):
+        """Read device object.
+
+        Any number of reads may be in progress at the same time.
+        @param address device address
+        @param number object number
+        @param max_age maximum age of a cached value in ms, see
+        slave_object_read
+        @param priority HbusCommandPriority class of the read command
+        @return Deferred fired with the value read, or failed with
+        HBUSTimeoutException if the device did not answer, KeyError if
+        the object does not exist or IOError if it is write-only
+        """
+        slave = self.registry.get(address)
+        if slave is None or number not in slave.hbusSlaveObjects:
+            return defer.fail(KeyError((address, number)))
+
+        d = defer.Deferred()
+
+        try:
+            self.slave_object_read(
+                address,
+                number,
+                callBack=d.callback,
+                timeoutCallback=d.errback,
+                maxAge=max_age,
+                priority=priority,
+            )
+        except IOError:
+            return defer.fail()
 
         return d
 
-    def _slave_hidden_object_read(self, *params):
-        """Read hidden object."""
-        if isinstance(params[0], HbusDeviceAddress):
-            address = params[0]
-            number = params[1]
-        elif isinstance(params[1], HbusDeviceAddress):
-            address = params[1]
-            number = params[2]
-        else:
-            raise ValueError("")
+    def _poll_object(self, address, number):
+        """Read device object in background."""
+        return self.read_object(
+            address, number, priority=HbusCommandPriority.POLL
+        )
 
-        d = None
+    def read_objects(self, objects, max_age=None):
+        """Read several device objects.
 
-        if (
-            self.detectedSlaveList[address.global_id]
-            .hbusSlaveHiddenObjects[number]
-            .permissions
-            != HbusObjectPermissions.WRITE
+        Reads are issued at once, grouped by device so that consecutive
+        commands go to the same device.
+        @param objects list of (address, object number) tuples
+        @param max_age maximum age of cached values in ms
+        @return Deferred fired with a list of (success, value or failure)
+        tuples in request order, failures as in read_object
+        """
+        reads = [None] * len(objects)
+
+        for index in sorted(
+            range(len(objects)), key=lambda x: objects[x][0].global_id
         ):
+            address, number = objects[index]
+            reads[index] = self.read_object(address, number, max_age)
+
+        return defer.DeferredList(reads, consumeErrors=True)
 
-            # self.expectResponse(HBUSCOMMAND_RESPONSE,address,self.receiveSlaveObjectData,actionParameters=(address,number,callBack),timeoutAction=timeoutCallback)
-            # self.pushCommand(HBUSCOMMAND_GETCH,address,params=[chr(number)],callBack=self.receiveSlaveObjectData,callBackParams=(address,number,callBack))
-            d = self._push_command(
+    def _slave_hidden_object_read(self, address, number):
+        """Read hidden object."""
+        obj = self.registry.get(address).hbusSlaveHiddenObjects[number]
+
+        if obj.permissions != HbusObjectPermissions.WRITE:
+
+            self.scanScheduler.request(
                 HBUSCOMMAND_GETCH,
                 address,
-                params=[chr(number)],
+                params=[number],
                 callBack=self._slave_hidden_obj_data_rx,
                 callBackParams=(address, number, None),
-                timeoutCallBack=None,
+                timeoutCallBack=self._slave_ext_read_fail,
             )
 
         else:
@@ -1702,193 +1744,292 @@ class HbusMaster:
                 address,
             )
 
-            # if callBack is not None:
-            #    callBack(None)
-
-        return d
-
     def _slave_obj_data_rx(self, data):
         """Receive object data."""
-        self.detectedSlaveList[data[0][0].global_id].hbusSlaveObjects[
-            data[0][1]
-        ].last_value = data[1][:]
-        if data[0][2] is not None:
-            data[0][2](data[1])
+        (address, number), value = data
+
+        slave = self.registry.get(address)
+        if slave is not None and number in slave.hbusSlaveObjects:
+            obj = slave.hbusSlaveObjects[number]
+            obj.last_value = value[:]
+            obj.last_update = self.clock.seconds()
+
+        waiting = self.pendingReads.pop((address.global_id, number), [])
+        for callBack, _ in waiting:
+            if callBack is not None:
+                callBack(value)
+
+    def _slave_obj_read_timeout(self, failure):
+        """Handle object read timeout."""
+        if failure.check(HBUSTimeoutException) is None:
+            return failure
+
+        address, number = failure.value.args[0]
+
+        waiting = self.pendingReads.pop((address.global_id, number), [])
+        for _, timeoutCallback in waiting:
+            if timeoutCallback is not None:
+                timeoutCallback(failure)
 
     def _slave_hidden_obj_data_rx(self, data):
         """Receive hidden object data."""
-        self.detectedSlaveList[data[0][0].global_id].hbusSlaveHiddenObjects[
-            data[0][1]
-        ].last_value = data[1][:]
+        address, number, callBack = data[0]
+        hidden = self.registry.get(address).hbusSlaveHiddenObjects
+
+        hidden[number].last_value = data[1][:]
+        self._slave_process_hidden_obj(address, number)
 
-        if data[0][2] is not None:
-            data[0][2](data[1])
+        if number == max(hidden.keys()):
+            self._slave_ext_read_end(address)
+
+        if callBack is not None:
+            callBack(data[1])
 
     def _slave_object_write(self, address, number, value):
-        """Write slave object."""
+        """Write slave object.
+
+        Writes to an object are combined while waiting to be sent: a newer
+        value replaces the waiting one and a single SETCH is sent.
+        """
+        slave = self.registry.get(address)
+        obj = slave.hbusSlaveObjects[number]
+
         # check if is virtual bus
         if address.bus_number == VIRTUAL_BUS:
-            self.virtualDeviceList[address.global_id].hbusSlaveObjects[
-                number
-            ].last_value = value
+            obj.last_value = value
             self.pluginManager.m_write_vdev_obj(
                 address.dev_number, number, value
             )
             return True
 
-        if (
-            self.detectedSlaveList[address.global_id]
-            .hbusSlaveObjects[number]
-            .permissions
-            != HbusObjectPermissions.READ
-        ):
+        if obj.permissions != HbusObjectPermissions.READ:
 
-            self.detectedSlaveList[address.global_id].hbusSlaveObjects[
-                number
-            ].last_value = value
-            size = (
-                self.detectedSlaveList[address.global_id]
-                .hbusSlaveObjects[number]
-                .size
-            )
+            obj.last_value = value
+            # device value is unknown until read again
+            obj.last_update = None
+            self.writesRequested += 1
 
-            myParamList = [number, size]
-            if isinstance(value, list):
-                # truncate value passed to length
-                if len(value) > size:
-                    self.logger.warning(
-                        "writeSlaveObject: passed a value with incorrect length of {}, truncating".format(
-                            len(value)
-                        )
-                    )
-                    value = value[0:size]
-                myParamList.extend(value)
-            else:
-                # extend integer value up to object's size
-                byte_list = []
-                for i in range(0, size):
-                    byte_list.append((value & (0xFF) << (8 * i)) >> 8 * i)
-                myParamList.extend(byte_list)
+            key = (address.global_id, number)
+            write = self.pendingWrites.get(key)
+            if write is not None:
+                write[2] = value
+                self.writesCoalesced += 1
+                return True
 
-            if (
-                self.detectedSlaveList[address.global_id].hbusSlaveCapabilities
-                & HbusDeviceCapabilities.AUTHSUP
-            ):
+            self.pendingWrites[key] = [address, number, value]
+            self._schedule_object_write(key)
 
-                myParamList[1] += HBUS_SIGNATURE_SIZE + 1
-
-                msg = struct.pack(
-                    "ccccccc",
-                    chr(self.hbusMasterAddr.bus_number),
-                    chr(self.hbusMasterAddr.dev_number),
-                    chr(address.bus_number),
-                    chr(address.dev_number),
-                    chr(HBUSCOMMAND_SETCH.cmd_byte),
-                    chr(number),
-                    chr(myParamList[1]),
-                )
+        else:
+            self.logger.warning("attempted to write to a read-only object")
+            return False
+
+        return True
 
-                i = 0
-                while size > 0:
-                    struct.pack_into("c", msg, 7 + i, value[i])
+    def _schedule_object_write(self, key):
+        """Send object write when allowed.
 
-                    size -= 1
-                    i += 1
+        Waits for the minimum write interval of the object to elapse and
+        for the frame being received to end.
+        @param key (global id, object number) of the waiting write
+        """
+        address, number, value = self.pendingWrites[key]
+        slave = self.registry.get(address)
+        if slave is None:
+            del self.pendingWrites[key]
+            return
 
-                sig = hbus_crypto.hbusCrypto_RabinWilliamsSign(
-                    msg,
-                    HBUS_ASYMMETRIC_KEYS.privatep,
-                    HBUS_ASYMMETRIC_KEYS.privateq,
+        obj = slave.hbusSlaveObjects[number]
+        interval = obj.min_write_interval
+        if interval is None:
+            interval = self.writeMinInterval
+
+        if obj.last_write is not None and interval > 0:
+            now = self.clock.seconds()
+            wait = obj.last_write + interval / 1000 - now
+            if wait > 0:
+                self.writesDelayed += 1
+                self.clock.callLater(wait, self._schedule_object_write, key)
+                return
+
+        port = self._port_for(address)
+        if port.busy:
+            # payload is only built when released, so that it is the
+            # newest value
+            d = defer.Deferred()
+            d.addCallback(lambda _: self._send_object_write(key))
+            priority = HbusCommandPriority.WRITE
+            if not port.outgoingCommands.push(d, address, priority):
+                self.logger.warning(
+                    "outgoing write queue full, dropping write to %s",
+                    address,
                 )
+                del self.pendingWrites[key]
+            return
 
-                myParamList.extend(sig.getByteString())
+        self._send_object_write(key)
 
-            self._push_command(HBUSCOMMAND_SETCH, address, params=myParamList)
+    def _send_object_write(self, key):
+        """Send waiting object write.
 
-        else:
-            return False
-            self.logger.warning("attempted to write to a read-only object")
+        @param key (global id, object number) of the waiting write
+        """
+        address, number, value = self.pendingWrites.pop(key)
+        slave = self.registry.get(address)
+        if slave is None:
+            return
 
-        return True
+        obj = slave.hbusSlaveObjects[number]
+        obj.last_write = self.clock.seconds()
+        self.writesSent += 1
 
-    def slave_object_write_fmt(self, address, number, value):
-        """Write slave object with formatted data."""
-        # decode formatting and write data to object
-        if address.bus_number == VIRTUAL_BUS:
-            obj = self.virtualDeviceList[address.global_id].hbusSlaveObjects[
-                number
-            ]
+        size = obj.size
+
+        myParamList = [number, size]
+        if isinstance(value, list):
+            # truncate value passed to length
+            if len(value) > size:
+                self.logger.warning(
+                    "writeSlaveObject: passed a value with incorrect length of {}, truncating".format(
+                        len(value)
+                    )
+                )
+                value = value[0:size]
+            myParamList.extend(value)
         else:
-            obj = self.detectedSlaveList[address.global_id].hbusSlaveObjects[
-                number
-            ]
+            # extend integer value up to object's size
+            byte_list = []
+            for i in range(0, size):
+                byte_list.append((value & (0xFF) << (8 * i)) >> 8 * i)
+            myParamList.extend(byte_list)
 
-        data = HBUS_DTYPE_OPTIONS[obj.objectDataType][obj.objectDataTypeInfo](
-            data=value,
-            extinfo=obj.objectExtendedInfo,
-            decode=True,
-            size=obj.size,
-        )
+        if slave.hbusSlaveCapabilities & HbusDeviceCapabilities.AUTHSUP:
 
-        self._slave_object_write(address, number, data)
+            myParamList[1] += HBUS_SIGNATURE_SIZE + 1
 
-    def _slave_ping(
-        self, callback, address, successCallback=None, failureCallback=None
-    ):
-        """Ping slave."""
-        if successCallback is None:
-            successCallback = self._slave_pong
+            # signed message is the header followed by the value
+            source = self._port_for(address).address
+            msg = bytes(
+                [
+                    source.bus_number,
+                    source.dev_number,
+                    address.bus_number,
+                    address.dev_number,
+                    HBUSCOMMAND_SETCH.cmd_byte,
+                    number,
+                    myParamList[1],
+                ]
+                + myParamList[2:]
+            )
 
-        if failureCallback is None:
-            failureCallback = self._slave_pong_fail
+            # sent when signed, off the reactor thread
+            self._queue_signed_write(address, myParamList, msg)
+        else:
+            self._push_command(
+                HBUSCOMMAND_SETCH,
+                address,
+                params=myParamList,
+                priority=HbusCommandPriority.WRITE,
+            )
 
-        d = self._push_command(
-            HBUSCOMMAND_SEARCH,
-            address,
-            callBack=successCallback,
-            callBackParams=address,
-            timeout=3000,
-            timeoutCallBack=failureCallback,
-            timeoutCallBackParams=address,
+    def get_write_statistics(self):
+        """Get object write statistics.
+
+        @return dictionary with numbers of writes requested, sent, combined
+        with a newer one and delayed by a minimum write interval
+        """
+        return {
+            "requested": self.writesRequested,
+            "sent": self.writesSent,
+            "coalesced": self.writesCoalesced,
+            "delayed": self.writesDelayed,
+            "waiting": len(self.pendingWrites),
+        }
+
+    def _queue_signed_write(self, address, params, msg):
+        """Sign object write and send it when ready.
+
+        Writes are sent in the order they were requested, whatever order
+        their signatures are finished in.
+        @param address device address
+        @param params SETCH parameters, signature is appended to them
+        @param msg message bytes to be signed
+        """
+        write = [address, params, None]
+        self.pendingSignedWrites.append(write)
+
+        d = self.signer.sign_deferred(msg)
+        d.addCallbacks(
+            self._signed_write_ready,
+            self._signed_write_failed,
+            callbackArgs=(write,),
+            errbackArgs=(write,),
         )
 
-        return d
+    def _signed_write_ready(self, sig, write):
+        """Handle finished write signature."""
+        write[1].extend(sig)
+        write[2] = True
+        self._send_signed_writes()
+
+    def _signed_write_failed(self, failure, write):
+        """Handle write signature failure."""
+        self.logger.error(
+            "could not sign write to device %s: %s",
+            write[0],
+            failure.getErrorMessage(),
+        )
+        write[2] = False
+        self._send_signed_writes()
+
+    def _send_signed_writes(self):
+        """Send signed writes that are no longer waiting on earlier ones."""
+        while (
+            len(self.pendingSignedWrites) > 0
+            and self.pendingSignedWrites[0][2] is not None
+        ):
+            address, params, signed = self.pendingSignedWrites.popleft()
+            if signed:
+                self._push_command(
+                    HBUSCOMMAND_SETCH,
+                    address,
+                    params=params,
+                    priority=HbusCommandPriority.WRITE,
+                )
 
-    def _deferred_delay(self, time):
-        """Deferred delay."""
-        d = defer.Deferred()
-        d.addCallback(self._nop_callback)
+    def slave_object_write_fmt(self, address, number, value):
+        """Write slave object with formatted data."""
+        # decode formatting and write data to object
+        obj = self.registry.get(address).hbusSlaveObjects[number]
 
-        reactor.callLater(time, d.callback, None)  # @UndefinedVariable
+        codec = obj.codec
+        if codec is None:
+            codec = obj.compile_codec()
 
-        return d
+        data = codec.encode(value)
 
-    def _nop_callback(self, *params):
-        """Do nothing."""
+        return self._slave_object_write(address, number, data)
 
-    def _slave_pong(self, *params):
+    def _slave_pong(self, address):
         """Handle slave response to ping."""
-        address = params[0][0]
-
-        if address.global_id not in list(self.detectedSlaveList.keys()):
+        if address not in self.registry:
             if address in self.staticSlaveList:
                 self.logger.info("Device with static address present")
                 self.register_new_slave(address)
+            else:
+                return
 
-        if self.detectedSlaveList[address.global_id].pingRetryCount > 0:
-            self.detectedSlaveList[address.global_id].pingRetryCount = 0
-            self.detectedSlaveList[address.global_id].pingFailures += 1
-
-        return self._deferred_delay(0.1)
+        slave = self.registry.get(address)
+        if slave.pingRetryCount > 0:
+            slave.pingRetryCount = 0
+            slave.pingFailures += 1
 
-    def _slave_pong_fail(self, *params):
+    def _slave_pong_fail(self, address):
         """Handle slave ping failure."""
-        address = params[0].value.args[0]
-
-        if address.global_id in list(self.detectedSlaveList.keys()):
+        slave = self.registry.get(address)
+        if slave is not None:
 
-            if self.detectedSlaveList[address.global_id].pingRetryCount < 3:
-                self.detectedSlaveList[address.global_id].pingRetryCount += 1
+            if slave.pingRetryCount < 3:
+                slave.pingRetryCount += 1
             else:
                 self.logger.warning(
                     "Removing device from bus for unresponsiveness"
@@ -1898,130 +2039,128 @@ class HbusMaster:
             # this is a static device
             pass
 
-        return self._deferred_delay(0.1)
-
     def _slave_detect(self, callBack=None, allBusses=False):
-        """Detect active slaves."""
+        """Detect active slaves on all busses."""
+        self.detectSlavesEnded = callBack
+
+        for port in self.ports.values():
+            self._bus_detect(port)
+
+    def _bus_detect(self, port):
+        """Detect active slaves on a bus.
+
+        @param port HbusBusPort object
+        """
         self._push_command(
             HBUSCOMMAND_SEARCH,
-            HbusDeviceAddress(self.hbusMasterAddr.bus_number, 255),
+            HbusDeviceAddress(port.bus, HBUS_BROADCAST_ADDRESS),
+            priority=HbusCommandPriority.ENUMERATION,
         )
 
-        if self.masterState == HbusMasterState.hbusMasterOperational:
-            self.masterState = HbusMasterState.hbusMasterChecking
+        if port.state == HbusMasterState.hbusMasterOperational:
+            port.state = HbusMasterState.hbusMasterChecking
         else:
-            self.masterState = HbusMasterState.hbusMasterSearching
-            self.logger.info("Starting device search")
+            port.state = HbusMasterState.hbusMasterSearching
+            self.logger.info("Starting device search on bus %d", port.bus)
 
-        reactor.callLater(5, self._alarm)  # @UndefinedVariable
+        self.clock.callLater(5, self._alarm, port)
 
-        self.detectSlavesEnded = callBack
-
-    def slave_verify(self):
-        """Verify that detected slaves data has been retrieved."""
-        d = defer.Deferred()
+    def slave_verify(self, interval=None):
+        """Verify that detected slaves data has been retrieved.
 
+        @param interval polling interval in seconds, pings are spread over
+        part of it. If not given, all devices are pinged right away
+        """
         # enumerated devices
-        for slave in list(self.detectedSlaveList.values()):
+        addresses = [
+            slave.hbusSlaveAddress
+            for slave in list(self.registry.devices.values())
+            if slave.hbusSlaveAddress not in self.staticSlaveList
+        ]
 
-            if slave.hbusSlaveAddress in self.staticSlaveList:
-                continue
+        # static devices
+        addresses.extend(self.staticSlaveList)
 
-            d.addCallback(self._slave_ping, slave.hbusSlaveAddress)
+        window = 0
+        if interval is not None:
+            window = interval * self.pingSpread
 
-        # static devices
-        for address in self.staticSlaveList:
-            d.addCallback(self._slave_ping, address)
+        d = self.livenessMonitor.sweep(addresses, window)
 
         d.addCallback(self._slave_get_missing)
 
         # new devices
         d.addCallback(self._slave_detect)
 
-        # starts callback chain (deferred chain)
-        d.callback(None)
-
     def _slave_get_missing(self, callbackResult):
         """Get missing information from slaves."""
-        d = defer.Deferred()
-
-        for slave in list(self.detectedSlaveList.values()):
-            if slave.basicInformationRetrieved is False:
-                d.addCallback(self._slave_read_basic, slave.hbusSlaveAddress)
+        missing = [
+            slave.hbusSlaveAddress
+            for slave in list(self.registry.devices.values())
+            if slave.basicInformationRetrieved is False
+        ]
 
-        self.slaveReadDeferred = d
-        reactor.callLater(0.1, self._slave_read_start)  # @UndefinedVariable
+        return self.scanScheduler.scan(missing)
 
-        return d
+    def _alarm(self, port):
+        """Handle alarm of a bus.
 
-    def _alarm(self):
-        """Handle alarm."""
-        if self.masterState in [
+        @param port HbusBusPort object
+        """
+        if port.state in [
             HbusMasterState.hbusMasterSearching,
             HbusMasterState.hbusMasterChecking,
         ]:
 
-            if self.masterState == HbusMasterState.hbusMasterSearching:
+            if port.state == HbusMasterState.hbusMasterSearching:
                 self.logger.info(
-                    "Device search ended, "
-                    + str(self.registeredSlaveCount)
-                    + " found"
+                    "Device search on bus %d ended, %d found",
+                    port.bus,
+                    port.registeredSlaveCount,
                 )
+                self._slave_static_process(port)
 
-            if self.detectSlavesEnded is not None:
-                self.detectSlavesEnded()
-
-            self.logger.debug("Retrieving devices information...")
-
-            if self.masterState == HbusMasterState.hbusMasterSearching:
-                self._slave_static_process()
+            port.state = HbusMasterState.hbusMasterScanning
 
-            self.masterState = HbusMasterState.hbusMasterScanning
-
-            d = defer.Deferred()
-
-            i = 0
-            for slave in self.detectedSlaveList:
-
-                if self.detectedSlaveList[slave].basicInformationRetrieved:
-                    continue
+            if self.detectSlavesEnded is not None and not any(
+                x.state in self._SEARCH_STATES for x in self.ports.values()
+            ):
+                callBack = self.detectSlavesEnded
+                self.detectSlavesEnded = None
+                callBack()
 
-                d.addCallback(
-                    self._slave_read_basic,
-                    self.detectedSlaveList[slave].hbusSlaveAddress,
-                )
-                i += 1
+            self.logger.debug(
+                "Retrieving devices information on bus %d...", port.bus
+            )
 
-            if i > 0:
-                self.slaveReadDeferred = d
+            missing = [
+                slave.hbusSlaveAddress
+                for slave in list(self.registry.devices.values())
+                if slave.basicInformationRetrieved is False
+                and self._port_for(slave.hbusSlaveAddress) is port
+            ]
 
-                reactor.callLater(
-                    0.1, self._slave_read_start
-                )  # @UndefinedVariable
+            if len(missing) > 0:
+                # devices on the bus are scanned in parallel
+                port.scanStarted = self.clock.seconds()
+                d = self.scanScheduler.scan(missing)
+                d.addCallback(self._slave_read_end, port)
 
             else:
 
-                self.masterState = HbusMasterState.hbusMasterOperational
+                self._bus_operational(port)
 
-        elif self.masterState == HbusMasterState.hbusMasterStarting:
+        elif port.state == HbusMasterState.hbusMasterStarting:
 
-            self.masterState = HbusMasterState.hbusMasterIdle
+            port.state = HbusMasterState.hbusMasterIdle
 
-            self._slave_detect()
+            self._bus_detect(port)
 
     def find_device_by_uid(self, uid):
         """Find device by UID."""
-        for dev in self.detectedSlaveList:
-            if self.detectedSlaveList[dev].hbusSlaveUniqueDeviceInfo == int(
-                uid
-            ):
-                return self.detectedSlaveList[dev].hbusSlaveAddress
-
-        for dev in self.virtualDeviceList:
-            if self.virtualDeviceList[dev].hbusSlaveUniqueDeviceInfo == int(
-                uid
-            ):
-                return self.virtualDeviceList[dev].hbusSlaveAddress
+        slave = self.registry.find_by_uid(int(uid))
+        if slave is not None:
+            return slave.hbusSlaveAddress
 
         self.logger.debug("device with UID <" + str(int(uid)) + "> not found")
         return None
@@ -2030,18 +2169,24 @@ class HbusMaster:
         self.logger.warning("Response timed out")
         self.logger.debug("Response timed out: %s", response)
 
-        if self.hbusBusState == HbusBusState.LOCKED_THIS:
-            self._push_command(HBUSCOMMAND_BUSUNLOCK, self.hbusBusLockedWith)
+        port = self._port_for(response.source)
+        if port.hbusBusState == HbusBusState.LOCKED_THIS:
+            self._push_command(
+                HBUSCOMMAND_BUSUNLOCK,
+                port.hbusBusLockedWith,
+                priority=HbusCommandPriority.WRITE,
+            )
 
-        if self.masterState == HbusMasterState.hbusMasterScanning:
+        if port.state == HbusMasterState.hbusMasterScanning:
             self.hbusDeviceScanningTimeout = True
 
+        self.expectedResponseQueue.remove(response)
+        self.metrics.answer_timeout(response.command, response.source)
+
         response.dCallback.errback(
             HBUSTimeoutException(response.timeoutActionParameters)
         )
 
-        self.expectedResponseQueue.remove(response)
-
         # if response.timeoutAction is not None:
         #    response.timeoutAction(response.source)
 
@@ -2049,14 +2194,6 @@ class HbusMaster:
 
     def periodic_task(self):
         """Periodic task."""
-        for r in self.removeQueue:
-
-            if r in self.expectedResponseQueue:
-
-                self.expectedResponseQueue.remove(r)
-
-        del self.removeQueue[:]
-
         # if allBusses:
         #
         #    for b in range(0,32):
@@ -2073,11 +2210,14 @@ class HbusMaster:
         #        self.sendCommand(HBUSCOMMAND_SEARCH,HbusDeviceAddress(self.hbusMasterAddr.bus_number,d))
         #        self.expectResponse(HBUSCOMMAND_ACK,HbusDeviceAddress(self.hbusMasterAddr.bus_number,d),action=self.registerNewSlave,actionParameters=HbusDeviceAddress(self.hbusMasterAddr.bus_number,d),timeout=10000000)
 
-    def _slave_static_process(self):
-        """Process static slaves."""
+    def _slave_static_process(self, port):
+        """Process static slaves of a bus.
+
+        @param port HbusBusPort object
+        """
         for addr in self.staticSlaveList:
 
-            if addr.global_id in self.detectedSlaveList:
+            if addr in self.registry or self._port_for(addr) is not port:
                 continue
 
             self.logger.info("Device with static address in %s", str(addr))
@@ -0,0 +1,321 @@
+"""Master instrumentation."""
+
+import bisect
+
+from hbussd.hbus.framing import HbusFrameError
+from twisted.internet import reactor
+
+# Frame decoding error names
+FRAME_ERRORS = {
+    HbusFrameError.INVALID_ADDRESS: "invalid_address",
+    HbusFrameError.TERMINATION: "termination",
+}
+
+# Metric groups whose keys are label values, by group name
+_LABELS = {
+    "received": "command",
+    "sent": "command",
+    "latency_by_command": "command",
+    "latency_by_device": "device",
+    "timeouts_by_command": "command",
+    "timeouts_by_device": "device",
+    "malformed": "error",
+    "busses": "bus",
+    "command_queue": "class",
+}
+
+
+class HbusHistogram:
+    """Cumulative histogram of observed values."""
+
+    # Default bucket upper bounds, in ms
+    BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self, buckets=BUCKETS):
+        """Initialize.
+
+        @param buckets sorted bucket upper bounds
+        """
+        self.buckets = buckets
+        # values above the last bound are only in count
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Add observed value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def get_statistics(self):
+        """Get histogram.
+
+        @return dictionary with cumulative [bound, count] buckets, count
+        and sum of observed values
+        """
+        buckets = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            buckets.append([bound, total])
+
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class HbusMetrics:
+    """Bus traffic counters and latency histograms.
+
+    Counters are plain integers only updated from the reactor thread, so
+    they need no locking and each event costs a few dictionary updates.
+    Frame rates and reactor loop lag are sampled every sample_interval
+    seconds: lag is how late the sampling call runs.
+    """
+
+    def __init__(self, sample_interval=1.0, clock=reactor):
+        """Initialize.
+
+        @param sample_interval rate and lag sampling period in seconds
+        @param clock IReactorTime provider, the reactor by default
+        """
+        self.clock = clock
+        self.sample_interval = sample_interval
+
+        self.frames_rx = 0
+        self.frames_tx = 0
+        # command name -> number of frames
+        self.commands_rx = {}
+        self.commands_tx = {}
+
+        # answer command name -> HbusHistogram of answer latency in ms
+        self.command_latency = {}
+        # device address -> HbusHistogram of answer latency in ms
+        self.device_latency = {}
+        # answer command name -> number of timeouts
+        self.command_timeouts = {}
+        # device address -> number of timeouts
+        self.device_timeouts = {}
+
+        # error name -> number of discarded frames
+        self.malformed = {}
+
+        # frames per second in last sampling period
+        self.rx_rate = 0.0
+        self.tx_rate = 0.0
+        # reactor loop lag in ms
+        self.loop_lag = None
+        self.loop_lag_max = 0
+        self.loop_lag_histogram = HbusHistogram()
+
+        self._sampleCall = None
+        self._lastSample = None
+        self._lastRx = 0
+        self._lastTx = 0
+
+    def start(self):
+        """Start sampling."""
+        self._lastSample = self.clock.seconds()
+        self._sampleCall = self.clock.callLater(
+            self.sample_interval, self._sample
+        )
+
+    def stop(self):
+        """Stop sampling."""
+        if self._sampleCall is not None:
+            self._sampleCall.cancel()
+            self._sampleCall = None
+
+    def _sample(self):
+        """Sample frame rates and loop lag."""
+        now = self.clock.seconds()
+        elapsed = now - self._lastSample
+
+        lag = max(elapsed - self.sample_interval, 0) * 1000
+        self.loop_lag = lag
+        self.loop_lag_max = max(self.loop_lag_max, lag)
+        self.loop_lag_histogram.observe(lag)
+
+        if elapsed > 0:
+            self.rx_rate = (self.frames_rx - self._lastRx) / elapsed
+            self.tx_rate = (self.frames_tx - self._lastTx) / elapsed
+
+        self._lastSample = now
+        self._lastRx = self.frames_rx
+        self._lastTx = self.frames_tx
+
+        self._sampleCall = self.clock.callLater(
+            self.sample_interval, self._sample
+        )
+
+    def frame_received(self, command):
+        """Count received frame.
+
+        @param command HbusCommand object
+        """
+        self.frames_rx += 1
+        name = command.desc_str
+        self.commands_rx[name] = self.commands_rx.get(name, 0) + 1
+
+    def frame_sent(self, command):
+        """Count sent frame.
+
+        @param command HbusCommand object
+        """
+        self.frames_tx += 1
+        name = command.desc_str
+        self.commands_tx[name] = self.commands_tx.get(name, 0) + 1
+
+    def frame_error(self, error):
+        """Count discarded frame.
+
+        @param error error name or HbusFrameError message
+        """
+        error = FRAME_ERRORS.get(error, error)
+        self.malformed[error] = self.malformed.get(error, 0) + 1
+
+    def answer_received(self, command, source, latency):
+        """Record answer latency.
+
+        @param command answer HbusCommand object
+        @param source answering device address
+        @param latency time since the request in ms
+        """
+        name = command.desc_str
+        histogram = self.command_latency.get(name)
+        if histogram is None:
+            histogram = self.command_latency[name] = HbusHistogram()
+        histogram.observe(latency)
+
+        device = str(source)
+        histogram = self.device_latency.get(device)
+        if histogram is None:
+            histogram = self.device_latency[device] = HbusHistogram()
+        histogram.observe(latency)
+
+    def answer_timeout(self, command, source):
+        """Count unanswered request.
+
+        @param command expected answer HbusCommand object
+        @param source address of device that did not answer
+        """
+        name = command.desc_str
+        self.command_timeouts[name] = self.command_timeouts.get(name, 0) + 1
+        device = str(source)
+        self.device_timeouts[device] = self.device_timeouts.get(device, 0) + 1
+
+    def get_statistics(self):
+        """Get counters.
+
+        @return dictionary of counters and histograms, latencies in ms
+        """
+        return {
+            "frames": {
+                "received_total": self.frames_rx,
+                "sent_total": self.frames_tx,
+                "received_rate": self.rx_rate,
+                "sent_rate": self.tx_rate,
+            },
+            "received": dict(self.commands_rx),
+            "sent": dict(self.commands_tx),
+            "latency_by_command": {
+                k: v.get_statistics() for k, v in self.command_latency.items()
+            },
+            "latency_by_device": {
+                k: v.get_statistics() for k, v in self.device_latency.items()
+            },
+            "timeouts_by_command": dict(self.command_timeouts),
+            "timeouts_by_device": dict(self.device_timeouts),
+            "malformed": dict(self.malformed),
+            "loop_lag": {
+                "last": self.loop_lag,
+                "max": self.loop_lag_max,
+                "histogram": self.loop_lag_histogram.get_statistics(),
+            },
+        }
+
+
+def _escape(value):
+    """Escape label value."""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _format_labels(labels):
+    """Format label set."""
+    if not labels:
+        return ""
+
+    return (
+        "{"
+        + ",".join('{}="{}"'.format(k, _escape(v)) for k, v in labels)
+        + "}"
+    )
+
+
+def _walk(lines, types, name, labels, value, group):
+    """Format metric group.
+
+    @param lines output list of lines
+    @param types set of metric names whose type was declared
+    @param name metric name
+    @param labels tuple of (label, value) pairs
+    @param value number, histogram or dictionary of metrics
+    @param group key of value in its parent dictionary
+    """
+    if value is None or isinstance(value, str):
+        return
+
+    if isinstance(value, (bool, int, float)):
+        lines.append(
+            "{}{} {}".format(name, _format_labels(labels), float(value))
+        )
+        return
+
+    if "buckets" in value:
+        if name not in types:
+            types.add(name)
+            lines.append("# TYPE {} histogram".format(name))
+
+        for bound, count in value["buckets"] + [["+Inf", value["count"]]]:
+            lines.append(
+                "{}_bucket{} {}".format(
+                    name, _format_labels(labels + (("le", bound),)), count
+                )
+            )
+        lines.append(
+            "{}_sum{} {}".format(name, _format_labels(labels), value["sum"])
+        )
+        lines.append(
+            "{}_count{} {}".format(
+                name, _format_labels(labels), value["count"]
+            )
+        )
+        return
+
+    label = _LABELS.get(group)
+    for key, item in value.items():
+        if label is not None:
+            _walk(lines, types, name, labels + ((label, key),), item, None)
+        else:
+            _walk(lines, types, name + "_" + key, labels, item, key)
+
+
+def format_prometheus(metrics, prefix="hbussd"):
+    """Format metrics in the Prometheus text exposition format.
+
+    Keys of groups listed in _LABELS become label values, other nested
+    keys are joined into metric names.
+    @param metrics dictionary of metrics, see HbusMaster.get_metrics
+    @param prefix metric name prefix
+    @return text
+    """
+    lines = []
+    types = set()
+    for key, value in metrics.items():
+        _walk(lines, types, prefix + "_" + key, (), value, key)
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,273 @@
+"""Background object polling."""
+
+import heapq
+import logging
+
+from hbussd.hbus.exceptions import HBUSTimeoutException
+from twisted.internet import reactor
+
+
+class HbusPollingScheduler:
+    """Keep object values fresh by reading them periodically.
+
+    Polls are kept in a priority queue ordered by due time. Objects sharing
+    an interval are started at evenly spaced instants so that bus traffic
+    is spread over time, and at most max_outstanding polls await an answer
+    at the same time so on-demand reads are never starved. Objects whose
+    value was refreshed by another read are not polled again until their
+    interval has elapsed since that read.
+
+    When the response latency average exceeds latency_threshold, or polls
+    time out, all intervals are stretched by a backoff factor, which
+    decays again while the bus answers quickly.
+    """
+
+    # Latency average gain
+    LATENCY_ALPHA = 0.125
+    # Maximum backoff factor
+    MAX_BACKOFF = 8.0
+    # Backoff factor growth on slow responses and decay on fast ones
+    BACKOFF_STEP = 2.0
+    # Consecutive failures after which the interval of an object stops
+    # being doubled
+    MAX_FAILURES = 4
+
+    def __init__(self, read_object, find_device, clock=reactor):
+        """Initialize.
+
+        @param read_object callable reading an object, returns a Deferred
+        @param find_device callable returning a device object or None
+        @param clock IReactorTime provider, the reactor by default
+        """
+        self.clock = clock
+        self._read_object = read_object
+        self._find_device = find_device
+        self.logger = logging.getLogger("hbussd.polling")
+
+        # maximum number of unanswered polls
+        self.max_outstanding = 1
+        # response latency above which polling backs off, in ms
+        self.latency_threshold = 500
+
+        # (global id, object number) -> [address, number, interval, failures]
+        self._entries = {}
+        # heap of (due time, sequence, key)
+        self._queue = []
+        self._sequence = 0
+        # keys of polls awaiting an answer
+        self._busy = set()
+        self._pumpCall = None
+        # polls answered synchronously must not reenter the queue loop
+        self._pumping = False
+
+        # interval multiplier, 1 when the bus is responsive
+        self.backoff = 1.0
+        # smoothed poll response latency, in ms
+        self.latency = None
+
+        self.polls = 0
+        self.skipped = 0
+        self.timeouts = 0
+
+    def __len__(self):
+        """Get number of polled objects."""
+        return len(self._entries)
+
+    def _push(self, due, key):
+        """Queue poll."""
+        self._sequence += 1
+        heapq.heappush(self._queue, (due, self._sequence, key))
+
+    def schedule(self, objects):
+        """Poll objects.
+
+        Objects already being polled get their new interval on their next
+        poll, new objects are spread evenly over their interval.
+        @param objects list of (address, object number, interval in ms)
+        tuples, an interval of 0 stops polling the object
+        """
+        now = self.clock.seconds()
+
+        groups = {}
+        for address, number, interval in objects:
+            key = (address.global_id, number)
+            if interval <= 0:
+                self._entries.pop(key, None)
+                continue
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] = interval
+                continue
+
+            self._entries[key] = [address, number, interval, 0]
+            groups.setdefault(interval, []).append(key)
+
+        for interval, keys in groups.items():
+            spacing = interval / 1000 / len(keys)
+            for index, key in enumerate(keys):
+                self._push(now + index * spacing, key)
+
+        self._pump()
+
+    def remove_device(self, address):
+        """Stop polling objects of a device.
+
+        @param address device address
+        """
+        for key in [x for x in self._entries if x[0] == address.global_id]:
+            del self._entries[key]
+
+    def stop(self):
+        """Stop polling all objects."""
+        self._entries = {}
+        self._queue = []
+        if self._pumpCall is not None:
+            self._pumpCall.cancel()
+            self._pumpCall = None
+
+    def get_statistics(self):
+        """Get polling statistics.
+
+        @return dictionary of counters, latency in ms
+        """
+        return {
+            "objects": len(self._entries),
+            "outstanding": len(self._busy),
+            "polls": self.polls,
+            "skipped": self.skipped,
+            "timeouts": self.timeouts,
+            "backoff": self.backoff,
+            "latency": self.latency,
+        }
+
+    def _interval(self, entry):
+        """Get current interval of a poll in seconds."""
+        return entry[2] / 1000 * self.backoff * 2 ** entry[3]
+
+    def _scheduled_pump(self):
+        """Start polls when their time has come."""
+        self._pumpCall = None
+        self._pump()
+
+    def _pump(self):
+        """Start polls that are due."""
+        if self._pumping:
+            return
+
+        self._pumping = True
+        try:
+            self._start_due()
+        finally:
+            self._pumping = False
+
+    def _start_due(self):
+        """Start polls that are due and wait for the next one."""
+        now = self.clock.seconds()
+
+        while len(self._queue) > 0 and len(self._busy) < self.max_outstanding:
+            due, _, key = self._queue[0]
+            if due > now:
+                break
+
+            heapq.heappop(self._queue)
+
+            entry = self._entries.get(key)
+            if entry is None or key in self._busy:
+                # no longer polled, or queued twice
+                continue
+
+            address, number = entry[0], entry[1]
+            device = self._find_device(address)
+            if device is None or number not in device.hbusSlaveObjects:
+                del self._entries[key]
+                continue
+
+            # refreshed by some other read in the meantime
+            last_update = device.hbusSlaveObjects[number].last_update
+            interval = self._interval(entry)
+            if last_update is not None and now - last_update < interval:
+                self.skipped += 1
+                self._push(last_update + interval, key)
+                continue
+
+            self.polls += 1
+            self._busy.add(key)
+            d = self._read_object(address, number)
+            d.addCallbacks(
+                self._response,
+                self._failed,
+                callbackArgs=(key, now),
+                errbackArgs=(key,),
+            )
+
+        if self._pumpCall is not None:
+            self._pumpCall.cancel()
+            self._pumpCall = None
+
+        if len(self._queue) > 0 and len(self._busy) < self.max_outstanding:
+            self._pumpCall = self.clock.callLater(
+                max(self._queue[0][0] - now, 0), self._scheduled_pump
+            )
+
+    def _update_latency(self, latency):
+        """Update latency average and backoff factor.
+
+        @param latency measured response latency in ms
+        """
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.LATENCY_ALPHA * (latency - self.latency)
+
+        if self.latency > self.latency_threshold:
+            self._back_off()
+        elif self.backoff > 1.0:
+            self.backoff = max(self.backoff / self.BACKOFF_STEP, 1.0)
+
+    def _back_off(self):
+        """Stretch intervals."""
+        backoff = min(self.backoff * self.BACKOFF_STEP, self.MAX_BACKOFF)
+        if backoff != self.backoff:
+            self.logger.debug("bus is slow, polling backoff %.1fx", backoff)
+        self.backoff = backoff
+
+    def _reschedule(self, key):
+        """Queue next poll of an object."""
+        self._busy.discard(key)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            now = self.clock.seconds()
+            self._push(now + self._interval(entry), key)
+
+    def _response(self, data, key, start):
+        """Handle poll answer."""
+        now = self.clock.seconds()
+        self._update_latency((now - start) * 1000)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[3] = 0
+
+        self._reschedule(key)
+        self._pump()
+
+    def _failed(self, failure, key):
+        """Handle poll failure."""
+        entry = self._entries.get(key)
+
+        if failure.check(HBUSTimeoutException) is not None:
+            self.timeouts += 1
+            self._back_off()
+            if entry is not None:
+                entry[3] = min(entry[3] + 1, self.MAX_FAILURES)
+        else:
+            # device or object is gone, or cannot be read
+            self.logger.debug(
+                "stopped polling %s: %s", key, failure.getErrorMessage()
+            )
+            self._entries.pop(key, None)
+
+        self._reschedule(key)
+        self._pump()
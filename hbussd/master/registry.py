@@ -0,0 +1,143 @@
+"""Device registry."""
+
+
+class HbusDeviceRegistry:
+    """Known devices and lookup indexes.
+
+    Real and virtual devices are kept in separate maps keyed by the global
+    address identifier. Indexes by UID and by bus number are updated on
+    every registry change so lookups never walk the device lists.
+    """
+
+    def __init__(self):
+        """Initialize."""
+        # global id -> real device
+        self.devices = {}
+        # global id -> virtual device
+        self.virtual_devices = {}
+
+        # uid -> real device
+        self._by_uid = {}
+        # uid -> virtual device
+        self._virtual_by_uid = {}
+        # bus number -> {global id -> device}
+        self._by_bus = {}
+
+    def _maps(self, device):
+        """Get device map and UID index for a device kind."""
+        if device.hbusSlaveIsVirtual:
+            return self.virtual_devices, self._virtual_by_uid
+
+        return self.devices, self._by_uid
+
+    def __len__(self):
+        """Get number of real devices."""
+        return len(self.devices)
+
+    def __contains__(self, address):
+        """Check if a device is registered at an address."""
+        return (
+            address.global_id in self.devices
+            or address.global_id in self.virtual_devices
+        )
+
+    def add(self, device):
+        """Register a device at its address.
+
+        A device previously registered at the same address is replaced.
+        @param device HbusDevice object
+        """
+        self.remove(device.hbusSlaveAddress, device.hbusSlaveIsVirtual)
+
+        devices, by_uid = self._maps(device)
+        address = device.hbusSlaveAddress
+
+        devices[address.global_id] = device
+        self._by_bus.setdefault(address.bus_number, {})[
+            address.global_id
+        ] = device
+        if device.hbusSlaveUniqueDeviceInfo is not None:
+            by_uid[device.hbusSlaveUniqueDeviceInfo] = device
+
+    def remove(self, address, virtual=False):
+        """Unregister device.
+
+        @param address device address
+        @param virtual look for a virtual device
+        @return removed device or None
+        """
+        if virtual:
+            devices, by_uid = self.virtual_devices, self._virtual_by_uid
+        else:
+            devices, by_uid = self.devices, self._by_uid
+
+        device = devices.pop(address.global_id, None)
+        if device is None:
+            return None
+
+        bus = self._by_bus[address.bus_number]
+        del bus[address.global_id]
+        if len(bus) == 0:
+            del self._by_bus[address.bus_number]
+
+        uid = device.hbusSlaveUniqueDeviceInfo
+        if by_uid.get(uid) is device:
+            del by_uid[uid]
+
+        return device
+
+    def set_uid(self, device, uid):
+        """Update the UID of a registered device.
+
+        @param device HbusDevice object
+        @param uid new UID
+        """
+        _, by_uid = self._maps(device)
+
+        old = device.hbusSlaveUniqueDeviceInfo
+        if by_uid.get(old) is device:
+            del by_uid[old]
+
+        device.hbusSlaveUniqueDeviceInfo = uid
+        by_uid[uid] = device
+
+    def get(self, address):
+        """Find device by address.
+
+        @param address device address
+        @return device object or None
+        """
+        device = self.devices.get(address.global_id)
+        if device is None:
+            device = self.virtual_devices.get(address.global_id)
+
+        return device
+
+    def find_by_uid(self, uid, virtual=None):
+        """Find device by UID.
+
+        @param uid device UID
+        @param virtual True or False to restrict search to virtual or real
+        devices, None to search both
+        @return device object or None
+        """
+        device = None
+        if virtual is not True:
+            device = self._by_uid.get(uid)
+        if device is None and virtual is not False:
+            device = self._virtual_by_uid.get(uid)
+
+        return device
+
+    def on_bus(self, bus):
+        """Get devices on a bus.
+
+        @param bus bus number
+        @return list of device objects
+        """
+        return list(self._by_bus.get(bus, {}).values())
+
+    @property
+    def busses(self):
+        """Get numbers of busses with registered devices."""
+        return list(self._by_bus.keys())
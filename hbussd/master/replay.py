@@ -0,0 +1,195 @@
+"""Bus traffic replay."""
+
+import time
+from collections import defaultdict
+
+from hbussd.master.capture import CAPTURE_TX
+from hbussd.master.master import HbusMaster
+
+
+class HbusReplayMaster(HbusMaster):
+    """Master attached to a replay driver instead of a serial port.
+
+    Must be built with a twisted.internet.task.Clock as its clock, which
+    the driver advances.
+    """
+
+    driver = None
+
+    def serial_create(self, port):
+        """Initialize serial port, replay has none."""
+        pass
+
+    def serial_write(self, string, port):
+        """Write to serial port."""
+        self.driver.master_write(string, port)
+
+    def enter_operational(self):
+        """Enter operational stage."""
+        super().enter_operational()
+        self.driver.master_operational()
+
+
+class HbusReplayDriver:
+    """Feed recorded bus traffic into a master.
+
+    The master runs on a simulated clock that the driver advances to the
+    captured time of each piece of received data, running master timers
+    due in between, so a capture always replays the same way whatever the
+    host load. Nothing sleeps and the reactor is not needed.
+
+    Traffic is replayed on the bus it was captured on, which must be
+    configured in the master. Data a device sent after the master wrote
+    something is only fed once the master has written as many bytes to
+    that bus, however it grouped them into writes. Until then, master
+    timers due before the data's captured time are run. The master does
+    not write everything the capture did: requests made by clients are not
+    replayed, and its behavior may have changed since the capture was
+    made. If it has still not written when no timer is left before the
+    data's time, the data is fed anyway and counted as a stall.
+    """
+
+    def __init__(self, master, records, settle_time=10.0):
+        """Initialize.
+
+        @param master HbusReplayMaster object
+        @param records capture records, see read_capture
+        @param settle_time clock seconds for which timers are run after the
+        last record while the master is not operational
+        """
+        self.master = master
+        master.driver = self
+        self.clock = master.clock
+        self.records = records
+        self.settle_time = settle_time
+
+        self._start = None
+        # bus -> bytes written by the master preceding the next record
+        self._expectedBytes = defaultdict(int)
+        # bus -> bytes written by the master
+        self._writtenBytes = defaultdict(int)
+        # bus -> written bytes given up on after stalls
+        self._missingBytes = defaultdict(int)
+
+        self.writes = 0
+        self.rx_bytes = 0
+        self.tx_bytes = 0
+        self.stalls = 0
+        # time spent in master receive processing, in seconds
+        self.processing_time = 0.0
+        # clock time from start to operational stage, in seconds
+        self.enumeration_time = None
+
+    def run(self):
+        """Replay capture.
+
+        @return replay statistics, see get_statistics
+        """
+        ports = self.master.ports
+        for bus in {x[1] for x in self.records}:
+            if bus not in ports:
+                raise ValueError("bus {} not configured".format(bus))
+
+        self._start = self.clock.seconds()
+        for port in ports.values():
+            self.master.serial_connected(port)
+
+        for offset, bus, direction, data in self.records:
+            if direction == CAPTURE_TX:
+                self._expectedBytes[bus] += len(data)
+                continue
+
+            due = self._start + offset
+            if self._run_until(due, lambda: self._written(bus)) is False:
+                self.stalls += 1
+                self._missingBytes[bus] = (
+                    self._expectedBytes[bus] - self._writtenBytes[bus]
+                )
+            self._advance_to(due)
+
+            self.rx_bytes += len(data)
+            start = time.perf_counter()
+            self.master.serial_new_data(data, ports[bus])
+            self.processing_time += time.perf_counter() - start
+
+        self._run_until(
+            self.clock.seconds() + self.settle_time,
+            lambda: self.enumeration_time is not None,
+        )
+
+        return self.get_statistics()
+
+    def stop(self):
+        """Cancel master timers still pending."""
+        for call in self.clock.getDelayedCalls():
+            call.cancel()
+
+    def master_write(self, data, port):
+        """Handle data written by the master.
+
+        @param data written bytes
+        @param port HbusBusPort object
+        """
+        self.writes += 1
+        self.tx_bytes += len(data)
+        self._writtenBytes[port.bus] += len(data)
+
+    def master_operational(self):
+        """Handle master entering operational stage."""
+        if self.enumeration_time is None:
+            self.enumeration_time = self.clock.seconds() - self._start
+
+    def _written(self, bus):
+        """Check if the master wrote what preceded the next record.
+
+        @param bus bus number of the record
+        """
+        written = self._writtenBytes[bus] + self._missingBytes[bus]
+        return written >= self._expectedBytes[bus]
+
+    def _advance_to(self, when):
+        """Advance clock, running timers due until then."""
+        self.clock.advance(max(when - self.clock.seconds(), 0))
+
+    def _run_until(self, limit, done):
+        """Run timers due up to a clock time until a condition holds.
+
+        @param limit clock time
+        @param done callable returning True when the condition holds
+        @return condition value
+        """
+        while done() is False:
+            due = [
+                x.getTime()
+                for x in self.clock.getDelayedCalls()
+                if x.getTime() <= limit
+            ]
+            if len(due) == 0:
+                return False
+            self._advance_to(min(due))
+
+        return True
+
+    def get_statistics(self):
+        """Get replay statistics.
+
+        @return dictionary with byte counts, number of master writes and
+        stalls, processing time in seconds, received frames per second of
+        processing time, and enumeration and elapsed clock time in seconds
+        """
+        frames = self.master.metrics.frames_rx
+        return {
+            "rx_bytes": self.rx_bytes,
+            "tx_bytes": self.tx_bytes,
+            "writes": self.writes,
+            "stalls": self.stalls,
+            "frames": frames,
+            "processing_time": self.processing_time,
+            "frames_per_second": (
+                frames / self.processing_time
+                if self.processing_time > 0
+                else None
+            ),
+            "enumeration_time": self.enumeration_time,
+            "elapsed": self.clock.seconds() - self._start,
+        }
@@ -24,7 +24,7 @@ class GenericSerializer:
         if not attr.startswith("_"):
             self._dict[attr] = value
         else:
-            setattr(self, attr, value)
+            super().__setattr__(attr, value)
 
     @property
     def serializable(self):
@@ -58,7 +58,7 @@ class HbusSlaveSerializer(GenericSerializer):
     # Generates device information dictionary
     # @return dictionary for serialization
     def getDict(self):
-        return self.__dict__
+        return self.serializable
 
 
 # hbusSlaveInformation object type preserializer
@@ -0,0 +1,196 @@
+"""Message signing service."""
+
+import threading
+import time
+from collections import OrderedDict
+
+from hbussd.hbus.constants import HBUS_SIGNATURE_SIZE
+from hbussd.hbus.crypto import RabinWilliamsKey, RabinWilliamsSign
+from twisted.internet import defer, reactor, threads
+from twisted.python.threadpool import ThreadPool
+
+
+class HbusSigningService:
+    """Rabin-Williams signatures for a key set.
+
+    Key constants are computed once. Signatures are cached by message
+    bytes, least recently used first out, so constant messages such as the
+    broadcast SOFTRESET are only signed once. Signing is CPU bound:
+    sign_deferred computes signatures that are not cached in a dedicated
+    thread pool so the reactor never blocks on it, and keeps track of how
+    long requests wait for a free worker.
+    """
+
+    # Queue latency average gain
+    LATENCY_ALPHA = 0.125
+
+    def __init__(self, keyset, size=HBUS_SIGNATURE_SIZE, cache_size=64):
+        """Initialize.
+
+        @param keyset HbusKeySet object
+        @param size signature size in bytes
+        @param cache_size maximum number of cached signatures, 0 disables
+        """
+        self.key = RabinWilliamsKey(keyset.privatep, keyset.privateq)
+        self.size = size
+        self.cache_size = cache_size
+
+        # message bytes -> signature bytes
+        self._cache = OrderedDict()
+        # cache is shared with worker threads
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        # number of worker threads, started on first use, 0 signs in the
+        # calling thread
+        self.pool_size = 1
+        self._pool = None
+
+        # signatures waiting for or being computed by workers
+        self.pending = 0
+        # time spent waiting for a worker, in ms
+        self.queue_latency = None
+        self.queue_latency_average = None
+        self.queue_latency_max = 0
+
+    def _cached(self, msg):
+        """Get signature from cache.
+
+        @param msg message bytes
+        @return signature bytes or None
+        """
+        with self._lock:
+            sig = self._cache.get(msg)
+            if sig is None:
+                self.misses += 1
+                return None
+
+            self._cache.move_to_end(msg)
+            self.hits += 1
+
+        return list(sig)
+
+    def _store(self, msg, sig):
+        """Add signature to cache, evicting the oldest one if full."""
+        if self.cache_size <= 0:
+            return
+
+        with self._lock:
+            self._cache[msg] = sig
+            self._cache.move_to_end(msg)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _sign(self, msg):
+        """Compute signature, bypassing cache."""
+        sig = RabinWilliamsSign(
+            msg, self.key.p, self.key.q, self.size, key=self.key
+        ).getByteString()
+
+        self._store(msg, sig)
+
+        return list(sig)
+
+    def _pooled_sign(self, msg, queued):
+        """Compute signature in a worker thread.
+
+        @param msg message bytes
+        @param queued time at which signature was requested
+        """
+        latency = (time.monotonic() - queued) * 1000
+
+        with self._lock:
+            self.queue_latency = latency
+            self.queue_latency_max = max(self.queue_latency_max, latency)
+            if self.queue_latency_average is None:
+                self.queue_latency_average = latency
+            else:
+                self.queue_latency_average += self.LATENCY_ALPHA * (
+                    latency - self.queue_latency_average
+                )
+
+        return self._sign(msg)
+
+    def _signed(self, result):
+        """Account for finished worker request."""
+        self.pending -= 1
+        return result
+
+    def _get_pool(self):
+        """Get worker thread pool, starting it if needed."""
+        if self._pool is None:
+            self._pool = ThreadPool(1, self.pool_size, "hbussd-crypto")
+            self._pool.start()
+            reactor.addSystemEventTrigger(
+                "after", "shutdown", self._pool.stop
+            )  # @UndefinedVariable
+
+        return self._pool
+
+    def sign(self, msg):
+        """Sign message in the calling thread.
+
+        @param msg message bytes
+        @return signature bytes as a list, followed by the e/f/r byte
+        """
+        msg = bytes(msg)
+
+        sig = self._cached(msg)
+        if sig is not None:
+            return sig
+
+        return self._sign(msg)
+
+    def sign_deferred(self, msg):
+        """Sign message in a worker thread.
+
+        Must be called from the reactor thread.
+        @param msg message bytes
+        @return Deferred fired with signature bytes, immediately when cached
+        or signed without workers
+        """
+        msg = bytes(msg)
+
+        sig = self._cached(msg)
+        if sig is not None:
+            return defer.succeed(sig)
+
+        if self.pool_size <= 0:
+            return defer.succeed(self._sign(msg))
+
+        self.pending += 1
+        d = threads.deferToThreadPool(
+            reactor,
+            self._get_pool(),
+            self._pooled_sign,
+            msg,
+            time.monotonic(),
+        )
+        d.addBoth(self._signed)
+
+        return d
+
+    def get_statistics(self):
+        """Get signing statistics.
+
+        @return dictionary with cache and worker queue statistics, latencies
+        in ms
+        """
+        with self._lock:
+            return {
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "cached": len(self._cache),
+                "pool_size": self.pool_size,
+                "pending": self.pending,
+                "queue_latency": self.queue_latency,
+                "queue_latency_average": self.queue_latency_average,
+                "queue_latency_max": self.queue_latency_max,
+            }
+
+    def clear(self):
+        """Drop cached signatures."""
+        with self._lock:
+            self._cache.clear()
@@ -22,6 +22,7 @@ from bottle import (
 )
 
 from hbussd.master.master import *
+from twisted.internet import reactor, threads
 
 
 class AttachToTwisted(ServerAdapter):
@@ -42,8 +43,8 @@ class AttachToTwisted(ServerAdapter):
 class HBUSWEB:
     """HBUS Web server class"""
 
-    # wait for asynchronous operations
-    wait = False
+    # maximum time to wait for the bus in request handlers, in seconds
+    busTimeout = 5
 
     # TODO: decouple master object
     def __init__(self, port, hbusMaster):
@@ -73,13 +74,33 @@ class HBUSWEB:
         # get logger
         self.logger = logging.getLogger("hbussd.hbusweb")
 
+    def _read_object(self, address, number):
+        """Reads an object value from a server thread
+        Blocks until the master finishes reading, without spinning
+        @param address device address
+        @param number object number
+        @return True if the value was read"""
+
+        def read():
+            d = self.hbusMaster.read_object(address, number)
+            d.addTimeout(self.busTimeout, reactor)
+            return d
+
+        try:
+            threads.blockingCallFromThread(reactor, read)
+        except Exception as ex:
+            self.logger.debug("error reading device object: {}".format(ex))
+            return False
+
+        return True
+
     def index(self):
         """Generates main page template
         @return template HTML"""
 
         return template(
             "hbus_index",
-            slaves=list(self.hbusMaster.detectedSlaveList.values()),
+            slaves=list(self.hbusMaster.registry.devices.values()),
             masterStatus=self.hbusMaster.get_information_data(),
             re=re,
         )
@@ -96,40 +117,14 @@ class HBUSWEB:
         @param obj object number
         @return requested data"""
 
-        self.wait = False
-
-        def waitForSlaveRead(dummy):
-
-            self.wait = False
-
         m = re.match(r"0x([0-9A-Fa-f]+)L?", uid)
         devUID = m.group(1)
 
-        addr = self.hbusMaster.find_device_by_uid(int(devUID, 16))
-
-        if addr is None:
-            s = None
-        else:
-            if addr.bus_number == 254:
-                s = self.hbusMaster.virtualDeviceList[addr.global_id]
-            else:
-                s = self.hbusMaster.detectedSlaveList[addr.global_id]
+        s = self.hbusMaster.registry.find_by_uid(int(devUID, 16))
+        addr = s.hbusSlaveAddress if s is not None else None
 
-        if obj is not None:
-            try:
-                self.wait = True
-                self.hbusMaster.slave_object_read(
-                    addr,
-                    int(obj),
-                    callBack=waitForSlaveRead,
-                    timeoutCallback=waitForSlaveRead,
-                )
-
-                while self.wait:
-                    pass
-            except Exception as ex:
-                self.logger.debug("error reading device object: {}".format(ex))
-                raise
+        if obj is not None and addr is not None:
+            self._read_object(addr, int(obj))
 
         if s is not None:
             try:
@@ -154,49 +149,22 @@ class HBUSWEB:
 
         getN = 0
 
-        self.wait = False
-
-        def waitForSlaveRead(dummy):
-
-            self.wait = False
-
         if addr is not None:
             devAddr = string.split(addr, ":")
             device = HbusDeviceAddress(int(devAddr[0]), int(devAddr[1]))
 
-            s = self.hbusMaster.detectedSlaveList[device.global_id]
+            s = self.hbusMaster.registry.get(device)
         elif uid is not None:
             m = re.match(r"0x([0-9A-Fa-f]+)L?", uid)
             devUID = m.group(1)
 
-            addr = self.hbusMaster.find_device_by_uid(int(devUID, 16))
-
-            if addr is None:
-                s = None
-            else:
-                if addr.bus_number == 254:
-                    s = self.hbusMaster.virtualDeviceList[addr.global_id]
-                else:
-                    s = self.hbusMaster.detectedSlaveList[addr.global_id]
-
-            if obj is not None:
-
-                try:
-                    self.wait = True
-                    self.hbusMaster.slave_object_read(
-                        addr,
-                        int(obj),
-                        callBack=waitForSlaveRead,
-                        timeoutCallback=waitForSlaveRead,
-                    )
+            s = self.hbusMaster.registry.find_by_uid(int(devUID, 16))
+            addr = s.hbusSlaveAddress if s is not None else None
 
+            if obj is not None and addr is not None:
+                if self._read_object(addr, int(obj)):
                     getN = int(obj)
 
-                    while self.wait:
-                        pass
-                except:
-                    pass
-
             if s is None:
 
                 # TODO: retur error template, device not available
@@ -250,6 +218,21 @@ class HBUSWEB:
         response.content_type = "application/json"
         return dumps(rv)
 
+    def metrics(self):
+        """Exports master metrics in Prometheus text format
+        @return metrics text"""
+
+        from bottle import response
+
+        from hbussd.master.metrics import format_prometheus
+
+        text = threads.blockingCallFromThread(
+            reactor, lambda: format_prometheus(self.hbusMaster.get_metrics())
+        )
+
+        response.content_type = "text/plain; version=0.0.4"
+        return text
+
     def slaveWriteObject(self, uid=None, obj=None):
         """Writes value to device object
         @param uid device UID
@@ -260,15 +243,8 @@ class HBUSWEB:
             m = re.match(r"0x([0-9A-Fa-f]+)L?", uid)
             devUID = m.group(1)
 
-            addr = self.hbusMaster.find_device_by_uid(int(devUID, 16))
-
-            if addr is None:
-                s = None
-            else:
-                if addr.bus_number == 254:
-                    s = self.hbusMaster.virtualDeviceList[addr.global_id]
-                else:
-                    s = self.hbusMaster.detectedSlaveList[addr.global_id]
+            s = self.hbusMaster.registry.find_by_uid(int(devUID, 16))
+            addr = s.hbusSlaveAddress if s is not None else None
 
             if s is None:
 
@@ -296,20 +272,17 @@ class HBUSWEB:
             m = re.match(r"0x([0-9A-Fa-f]+)L?", uid)
             devUID = m.group(1)
 
-            addr = self.hbusMaster.find_device_by_uid(int(devUID, 16))
-
-            if addr is None:
-                s = None
-            else:
-                if addr.bus_number == 254:
-                    s = self.hbusMaster.virtualDeviceList[addr.global_id]
-                else:
-                    s = self.hbusMaster.detectedSlaveList[addr.global_id]
+            s = self.hbusMaster.registry.find_by_uid(int(devUID, 16))
+            addr = s.hbusSlaveAddress if s is not None else None
 
             if obj is not None:
                 # try:
-                self.hbusMaster.slave_object_write_fmt(
-                    addr, int(obj), newObjValue
+                threads.blockingCallFromThread(
+                    reactor,
+                    self.hbusMaster.slave_object_write_fmt,
+                    addr,
+                    int(obj),
+                    newObjValue,
                 )
 
                 # except:
@@ -336,16 +309,13 @@ class HBUSWEB:
         @return template HTML"""
 
         if int(busNumber) == 255:
-            slaveList = list(self.hbusMaster.detectedSlaveList.values())
-            slaveList.extend(list(self.hbusMaster.virtualDeviceList.values()))
-        elif int(busNumber) == 254:
-            # virtual device bus
-            slaveList = list(self.hbusMaster.virtualDeviceList.values())
+            slaveList = list(self.hbusMaster.registry.devices.values())
+            slaveList.extend(
+                list(self.hbusMaster.registry.virtual_devices.values())
+            )
         else:
-            slaveList = []
-            for slave in list(self.hbusMaster.detectedSlaveList.values()):
-                if slave.hbusSlaveAddress.bus_number == int(busNumber):
-                    slaveList.append(slave)
+            # virtual devices are on bus 254
+            slaveList = self.hbusMaster.registry.on_bus(int(busNumber))
         return template(
             "hbus_slave_by_bus",
             slaveList=slaveList,
@@ -399,6 +369,7 @@ class HBUSWEB:
         route("/slave-uid/<uid>/set-<obj>", method="POST")(self.slaveInfoSet)
         route("/slave-uid/<uid>/objdata-<obj>")(self.readSlaveObject)
         route("/busses")(self.busList)
+        route("/metrics")(self.metrics)
 
         # list of devices by bus number
         route("/bus/<busNumber>")(self.slavesByBus)
@@ -152,7 +152,7 @@ class HbusPluginManager:
         if request_uid is not None:
             if not isinstance(request_uid, int):
                 raise TypeError("UID must be an integer")
-            if self.__master.find_device_by_uid(request_uid) is not None:
+            if self.__master.registry.find_by_uid(request_uid) is not None:
                 # UID taken cannot use
                 self.logger.warning(
                     f"cannot assign requested UID {hex(request_uid)} "
@@ -192,7 +192,7 @@ class HbusPluginManager:
             self.logger.debug("device not found")
             return
 
-        self.__master.unregisterSlave(devaddr, virtual=True)
+        self.__master.unregister_slave(devaddr, virtual=True)
 
     def p_interrupt(self, pluginid, interrupt):
         """Interruption from plugin.